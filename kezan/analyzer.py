@@ -1,12 +1,99 @@
 """Módulo para analizar items de subasta."""
 
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
 from kezan.blizzard_api import fetch_auction_data
-from kezan.formatter import format_for_ai
+from kezan.formatter import format_page_for_ai
 from kezan.logger import get_logger
-from kezan import cache
+from kezan.snapshot import Snapshot
 
 logger = get_logger(__name__)
 
+
+@dataclass(frozen=True, eq=False)
+class MarginTable:
+    """Márgenes de todas las filas con precio de un snapshot.
+
+    Las columnas están ordenadas por margen descendente (orden estable
+    respecto al snapshot), así que las filas con ``margin >= m`` forman
+    siempre un prefijo cuya longitud se obtiene por búsqueda binaria.
+    """
+
+    margins: np.ndarray
+    item_ids: np.ndarray
+    unit_prices: np.ndarray
+    avg_prices: np.ndarray
+    version: str = ""
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Snapshot) -> "MarginTable":
+        """Calcula y ordena los márgenes de un snapshot (una vez)."""
+        prices = snapshot.unit_price
+        valid = np.flatnonzero(np.isfinite(prices) & (prices > 0))
+        unit_prices = prices[valid]
+        avg_prices = unit_prices * 1.5  # Simulación de beneficio
+        margins = (avg_prices - unit_prices) / avg_prices
+        order = np.argsort(-margins, kind="stable")
+        return cls(
+            margins=margins[order],
+            item_ids=snapshot.item_id[valid][order],
+            unit_prices=unit_prices[order],
+            avg_prices=avg_prices[order],
+            version=snapshot.version,
+        )
+
+    def __len__(self) -> int:
+        return int(self.margins.shape[0])
+
+    def count_at_least(self, min_margin: float) -> int:
+        """Número de filas con margen ``>= min_margin`` (O(log n))."""
+        # ``-margins`` es ascendente: searchsorted por la derecha incluye empates
+        return int(np.searchsorted(-self.margins, -min_margin, side="right"))
+
+    def top(self, limit: int, min_margin: float) -> List[Dict]:
+        """Las ``limit`` filas de mayor margen que superan ``min_margin``."""
+        end = min(self.count_at_least(min_margin), max(limit, 0))
+        return [
+            {
+                "id": int(self.item_ids[k]),
+                "ah_price": float(self.unit_prices[k]),
+                "avg_sell_price": float(self.avg_prices[k]),
+                "margin": round(float(self.margins[k]), 2),
+            }
+            for k in range(end)
+        ]
+
+
+# Tabla del último snapshot servido y el objeto del que se construyó
+_table: Optional[MarginTable] = None
+_table_source = None
+
+
+def margin_table(data) -> MarginTable:
+    """Tabla de márgenes de ``data`` (payload o Snapshot), reutilizada por versión.
+
+    Se recalcula sólo cuando llega un snapshot distinto: el mismo objeto
+    (p. ej. servido desde la caché o tras un 304) o un ``Snapshot`` con la
+    misma ``version`` reutilizan la tabla existente.
+    """
+    global _table, _table_source
+    if _table is not None:
+        if data is _table_source:
+            return _table
+        version = data.version if isinstance(data, Snapshot) else ""
+        if version and version == _table.version:
+            return _table
+    snapshot = data if isinstance(data, Snapshot) else Snapshot.from_payload(data)
+    table = MarginTable.from_snapshot(snapshot)
+    _table, _table_source = table, data
+    logger.debug("Tabla de márgenes recalculada (%d filas)", len(table))
+    return table
+
+
 async def get_top_items(limit: int = 5, min_margin: float = 0.3):
     """Obtiene los items de subasta con mayor margen.
 
@@ -14,42 +101,23 @@ async def get_top_items(limit: int = 5, min_margin: float = 0.3):
     - limit (int): número máximo de items a devolver.
     - min_margin (float): margen mínimo requerido para incluir un item.
 
+    Los datos de subasta pueden llegar como payload JSON o como
+    :class:`~kezan.snapshot.Snapshot`. La tabla de márgenes se construye una
+    vez por snapshot (:func:`margin_table`, en un hilo) y cada consulta es una búsqueda
+    binaria más un slice, sea cual sea ``limit``/``min_margin``; los nombres
+    de la página se resuelven en una sola llamada.
+
     Retorna:
     - dict: diccionario con los items principales o un mensaje de error.
     """
-    cache_key = f"top_items_{limit}_{min_margin}"
-    cached = cache.get(cache_key)
-    if cached:
-        return cached
-
     try:
         data = await fetch_auction_data()
     except RuntimeError as e:
         return {"error": str(e)}
 
-    if not data:
+    if data is None or (isinstance(data, dict) and not data):
         return {"error": "No se pudieron obtener los datos de subasta."}
 
-    auctions = data.get("auctions", [])
-    items = []
-    for entry in auctions:
-        item_id = entry.get("item", {}).get("id")
-        if not item_id:
-            logger.warning("Entrada sin item ID: %s", entry)
-            continue
-
-        buyout = entry.get("buyout") or 0
-        unit_price = buyout / entry.get("quantity", 1)
-        avg_price = unit_price * 1.5  # Simulación de beneficio
-        margin = (avg_price - unit_price) / avg_price
-
-        if margin >= min_margin:
-            items.append({
-                "name": f"ItemID {item_id}",
-                "ah_price": unit_price,
-                "avg_sell_price": avg_price,
-                "margin": round(margin, 2),
-            })
-    result = format_for_ai(items[:limit])
-    cache.set(cache_key, result, ttl=300)
-    return result
+    # Parsear el payload y construir la tabla no debe ocupar el bucle de eventos
+    table = await asyncio.to_thread(margin_table, data)
+    return await format_page_for_ai(table.top(limit, min_margin))
@@ -1,11 +1,20 @@
 """Rutas de la API de Kezan Protocol."""
 
-from fastapi import APIRouter, Body, Query
+import asyncio
+from contextlib import aclosing
+
+from fastapi import APIRouter, Body, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from kezan import llm_cache
 from kezan.analyzer import get_top_items
-from kezan.llm_interface import analyze_items_with_llm, analyze_recipes_with_llm
+from kezan.llm_interface import (
+    analyze_items_with_llm_async,
+    analyze_recipes_with_llm_async,
+    stream_items_with_llm,
+)
 from kezan.recipes import load_recipes
 from kezan.crafting_analyzer import analyze_recipes
-from kezan.simulator import run_backtest
+from kezan.simulator import load_history, run_backtest
 
 router = APIRouter(prefix="/api", tags=["Kezan Protocol"])
 
@@ -23,13 +32,36 @@ async def consejo(limit: int = 5, min_margin: float = 0.3):
         return summary
     items = summary.get("items", [])
     try:
-        recommendation = analyze_items_with_llm(items)
+        recommendation = await analyze_items_with_llm_async(items)
         return {"recomendacion": recommendation, "items": items}
     except RuntimeError as exc:
         # Return the items even if the LLM is not available
         return {"error": str(exc), "items": items}
 
 
+@router.get("/consejo/stream")
+async def consejo_stream(limit: int = 5, min_margin: float = 0.3):
+    """Igual que ``/consejo`` pero envía la recomendación según se genera.
+
+    Responde ``text/plain`` por fragmentos; si el modelo falla a mitad se
+    añade una línea ``[error] ...`` al final.
+    """
+    summary = await get_top_items(limit=limit, min_margin=min_margin)
+    if isinstance(summary, dict) and summary.get("error"):
+        return summary
+    items = summary.get("items", [])
+
+    async def body():
+        try:
+            async with aclosing(stream_items_with_llm(items)) as chunks:
+                async for chunk in chunks:
+                    yield chunk
+        except RuntimeError as exc:
+            yield f"\n[error] {exc}\n"
+
+    return StreamingResponse(body(), media_type="text/plain; charset=utf-8")
+
+
 @router.get("/crafteables")
 async def crafteables(profesion: str, min_profit: float = 0.0, limit: int = 5):
     """Devuelve recetas rentables para una profesión."""
@@ -45,19 +77,46 @@ async def crafteables(profesion: str, min_profit: float = 0.0, limit: int = 5):
     analyses = analyze_recipes(recipes, _price_lookup)
     profitable = [a for a in analyses if a["profit"] >= min_profit][:limit]
     try:
-        advice = analyze_recipes_with_llm(profitable)
+        advice = await analyze_recipes_with_llm_async(profitable)
         return {"recomendacion": advice, "recetas": profitable}
     except RuntimeError as exc:
         return {"error": str(exc), "recetas": profitable}
 
 
+@router.get("/llm-cache")
+async def llm_cache_stats():
+    """Aciertos, fallos y tasa de acierto de la caché de respuestas del LLM."""
+    return llm_cache.stats()
+
+
+def _int_field(strategy: dict, name: str) -> int:
+    """Lee ``strategy[name]`` como entero no negativo o responde 400."""
+    value = strategy[name]
+    try:
+        if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+            raise ValueError(value)
+        number = int(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"{name} debe ser un entero") from None
+    if number < 0:
+        raise HTTPException(status_code=400, detail=f"{name} debe ser >= 0")
+    return number
+
+
 @router.post("/simulate")
 async def simulate(strategy: dict = Body(..., description="Estrategia o regla DSL a simular")):
     """Ejecuta un backtest mínimo y devuelve métricas prototipo.
 
-    Nota: placeholder inicial hasta integrar históricos reales.
+    Nota: placeholder inicial hasta integrar históricos reales. Si la
+    estrategia indica ``item_id`` se usa su serie del archivo local de precios.
+    ``item_id`` y ``scope`` deben ser enteros no negativos; si no, responde 400.
     """
-    res = run_backtest(strategy=strategy, history=None)
+    history = None
+    if isinstance(strategy, dict) and strategy.get("item_id") is not None:
+        item_id = _int_field(strategy, "item_id")
+        scope = _int_field(strategy, "scope") if strategy.get("scope") is not None else None
+        history = await asyncio.to_thread(load_history, item_id, scope=scope)
+    res = run_backtest(strategy=strategy, history=history)
     return {
         "roi": res.roi,
         "volatility": res.volatility,
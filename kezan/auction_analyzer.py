@@ -1,36 +1,123 @@
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 import asyncio
+import math
 from datetime import datetime
-from kezan.llm_interface import LLMInterface
+from kezan import llm_cache, processing
+from kezan.llm_interface import LLMInterface, llm_slot
 from kezan.blizzard_api import BlizzardAPI
 from kezan.profile_manager import ProfileManager, GameVersion
 from kezan.realtime_monitor import RealTimeAuctionMonitor, RealTimeMarketAnalyzer
+from kezan.rolling_stats import RollingStats
+from kezan.snapshot import Snapshot, SnapshotDiff, diff_snapshots, lot_unit_price
+
+# Segundos máximos de inferencia por item (sin contar la espera en cola)
+LLM_ITEM_TIMEOUT = 60.0
 
 class AuctionAnalyzer:
     def __init__(self):
         self.llm = LLMInterface()
         self.blizzard_api = BlizzardAPI()
         self.profile_manager = ProfileManager()
-        self.realtime_monitor = RealTimeAuctionMonitor()
+        # Estadísticas 7d/30d del detector de gangas, persistentes
+        self.rolling_stats = RollingStats()
+        # El monitor alimenta también el archivo de precios horarios y las estadísticas
+        self.realtime_monitor = RealTimeAuctionMonitor(archive_prices=True, rolling_stats=self.rolling_stats)
         self.realtime_analyzer = RealTimeMarketAnalyzer(self.realtime_monitor)
+        # Último snapshot visto por cada consumidor y reino, para calcular diffs
+        self._previous: Dict[Tuple[str, str], Snapshot] = {}
+        # Gangas del último escaneo completo por reino
+        self.bargains: Dict[str, List[Dict]] = {}
+
+    def _diff(self, purpose: str, realm: str, current_data) -> Optional[SnapshotDiff]:
+        """Diff de ``current_data`` respecto al último snapshot de ``purpose``.
+
+        Retorna ``None`` si no hay base con la que comparar (primera pasada o
+        datos en forma de lista), en cuyo caso se analiza todo.
+        """
+        if not isinstance(current_data, Snapshot):
+            return None
+        key = (purpose, realm)
+        previous = self._previous.get(key)
+        self._previous[key] = current_data
+        if previous is None:
+            return None
+        return diff_snapshots(previous, current_data)
 
     async def analyze_watched_items(self, 
                                   game_version: GameVersion,
                                   realm: str,
-                                  use_realtime: bool = True) -> List[Dict]:
+                                  use_realtime: bool = True,
+                                  changed_only: bool = False,
+                                  timeout: float = LLM_ITEM_TIMEOUT,
+                                  batched: bool = True) -> List[Dict]:
         """
         Analiza los items observados para un perfil específico.
+
+        Con ``changed_only`` sólo se consulta al LLM por los items cuyo libro
+        de órdenes cambió desde el snapshot anterior. Los resultados siguen
+        el orden de la lista de observados (ver :meth:`iter_watched_analyses`
+        para recibirlos según terminan y el significado de ``batched``).
         """
         profile = self.profile_manager.get_profile(game_version)
+        order = {item_id: k for k, item_id in enumerate(profile.preferences.watched_items)}
+        results = [
+            result async for result in self.iter_watched_analyses(
+                game_version, realm, use_realtime, changed_only, timeout, profile=profile, batched=batched
+            )
+        ]
+        return sorted(results, key=lambda r: order.get(r['item_id'], len(order)))
+
+    async def iter_watched_analyses(self,
+                                    game_version: GameVersion,
+                                    realm: str,
+                                    use_realtime: bool = True,
+                                    changed_only: bool = False,
+                                    timeout: float = LLM_ITEM_TIMEOUT,
+                                    profile=None,
+                                    batched: bool = True) -> AsyncIterator[Dict]:
+        """
+        Analiza los items observados en paralelo y emite cada resultado al terminar.
+
+        Las llamadas al LLM se reparten entre los huecos de
+        :func:`~kezan.llm_interface.llm_slot` (``LLM_PARALLEL``); ``timeout``
+        limita cada inferencia una vez obtiene hueco. Un item que lo supera se
+        emite con ``reason == 'timeout'`` sin detener al resto. Todos los items
+        comparten un mismo snapshot.
+
+        Con ``batched`` (y un LLM que lo soporte) los items se agrupan en
+        prompts de hasta ``LLM_BATCH_TOKENS`` tokens
+        (:meth:`~kezan.llm_interface.LLMInterface.plan_market_batches`) y cada
+        grupo ocupa un solo hueco; los items de un grupo se emiten juntos y
+        los que el LLM no devuelve llevan el análisis de ``FallbackStrategy``.
+        """
+        profile = profile or self.profile_manager.get_profile(game_version)
         watched_items = profile.preferences.watched_items
-        
-        results = []
 
         # Iniciar monitoreo en tiempo real si no está activo
         if use_realtime and not self.realtime_monitor.is_monitoring:
             asyncio.create_task(self.realtime_monitor.start_monitoring(self.blizzard_api, realm))
-        
+
+        current_data = None
+        diff = None
+        if use_realtime:
+            # Diff contra lo que vio este consumidor la vez anterior, no contra
+            # el último tick del monitor (puede haber habido varios o ninguno)
+            view = getattr(self.realtime_monitor, 'view', None)
+            snapshot = getattr(view, 'snapshot', None)
+            diff = self._diff('watched:realtime', realm, snapshot)
+            version = getattr(view, 'version', None)
+        else:
+            # Un único snapshot para todos los items observados
+            current_data = await self.blizzard_api.get_auctions(realm)
+            if current_data is None:
+                return
+            diff = self._diff('watched', realm, current_data)
+            version = getattr(current_data, 'version', None)
+
+        jobs = []
         for item_id in watched_items:
+            if changed_only and diff is not None and item_id not in diff:
+                continue
             if use_realtime:
                 # Obtener datos en tiempo real
                 current_price_data = self.realtime_monitor.get_current_price(item_id)
@@ -38,31 +125,64 @@ class AuctionAnalyzer:
                     continue
                 item_data = [current_price_data]
             else:
-                # Obtener datos de la API directamente
-                current_data = await self.blizzard_api.get_auctions(realm)
-                item_data = [
-                    auction for auction in current_data 
-                    if auction['item']['id'] == item_id
-                ]
+                item_data = _auctions_for_item(current_data, item_id)
                 if not item_data:
                     continue
+            jobs.append((item_id, item_data, profile.auction_history.get(item_id, [])))
 
-            # Obtener historial del item
-            history = profile.auction_history.get(item_id, [])
-            
-            # Analizar oportunidad con LLM
-            analysis = await self.llm.analyze_market_opportunity(
-                item_data=item_data[0],
-                historical_prices=history
-            )
-            
-            results.append({
-                'item_id': item_id,
-                'current_data': item_data,
-                'analysis': analysis
-            })
+        # Las respuestas del LLM se cachean por versión de snapshot; las tareas
+        # heredan el contexto en el que se crean
+        plan = getattr(self.llm, 'plan_market_batches', None) if batched else None
+        lots = {item_id: item_data for item_id, item_data, _ in jobs}
+        cached: Dict[int, Dict] = {}
+        with llm_cache.snapshot_version(version):
+            if plan is not None:
+                cached, batches = plan(
+                    {item_id: item_data[0] for item_id, item_data in lots.items()},
+                    {item_id: history for item_id, _, history in jobs},
+                )
+                stats = {item_id: _lot_stats(item_data) for item_id, item_data in lots.items()}
+                tasks = [asyncio.ensure_future(self._analyze_batch(batch, stats, timeout)) for batch in batches]
+            else:
+                tasks = [asyncio.ensure_future(self._analyze_item(*job, timeout)) for job in jobs]
+        try:
+            for item_id, analysis in cached.items():
+                yield {'item_id': item_id, 'current_data': lots[item_id], 'analysis': analysis}
+            for finished in asyncio.as_completed(tasks):
+                result = await finished
+                if plan is None:
+                    yield result
+                    continue
+                for item_id, analysis in result.items():
+                    yield {'item_id': item_id, 'current_data': lots[item_id], 'analysis': analysis}
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _analyze_item(self, item_id: int, item_data: List[Dict],
+                            history: List[Dict], timeout: float) -> Dict:
+        """Analiza un item con el LLM dentro de un hueco de inferencia."""
+        async with llm_slot():
+            try:
+                analysis = await asyncio.wait_for(
+                    self.llm.analyze_market_opportunity(
+                        item_data=item_data[0],
+                        historical_prices=history
+                    ),
+                    timeout,
+                )
+            except asyncio.TimeoutError:
+                analysis = {'analysis': '', 'opportunity': False, 'reason': 'timeout'}
+        return {
+            'item_id': item_id,
+            'current_data': item_data,
+            'analysis': analysis
+        }
 
-        return results
+    async def _analyze_batch(self, batch, stats: Dict[int, Optional[Dict]], timeout: float) -> Dict[int, Dict]:
+        """Analiza un grupo de items con un único prompt dentro de un hueco."""
+        async with llm_slot():
+            return await self.llm.run_market_batch(batch, stats, timeout)
 
     async def full_scan(self,
                        game_version: GameVersion,
@@ -70,25 +190,66 @@ class AuctionAnalyzer:
                        scan_interval: int = 300) -> None:
         """
         Realiza un escaneo completo de la casa de subastas.
-        
+
+        Agregados y gangas de cada snapshot nuevo se calculan en el pool de
+        :mod:`kezan.processing` con las estadísticas móviles previas a esa hora
+        (que después ingieren el snapshot en un hilo); las gangas se guardan en
+        ``self.bargains[realm]`` y en el historial junto a las oportunidades del
+        LLM.
+
         Args:
             game_version: Versión del juego
             realm: Reino a escanear
             scan_interval: Intervalo entre escaneos en segundos
         """
+        last_version = None
         while True:
             try:
                 profile = self.profile_manager.get_profile(game_version)
                 current_data = await self.blizzard_api.get_auctions(realm)
 
+                # Snapshot idéntico al anterior (304): nada nuevo que analizar
+                version = getattr(current_data, 'version', None)
+                if version and version == last_version:
+                    await asyncio.sleep(scan_interval)
+                    continue
+                last_version = version
+
+                bargains: List[Dict] = []
+                if isinstance(current_data, Snapshot) and len(current_data):
+                    processed = await processing.analyze_snapshot(current_data, self.rolling_stats.table())
+                    bargains = self.bargains[realm] = processed.bargains
+                    await asyncio.to_thread(self.rolling_stats.record, current_data)
+
+                # Sólo los items cuyo libro cambió desde el escaneo anterior
+                diff = self._diff('scan', realm, current_data)
+                if diff is not None:
+                    if not diff:
+                        await asyncio.sleep(scan_interval)
+                        continue
+                    current_data = current_data.subset(diff.changed_items)
+                if isinstance(current_data, Snapshot):
+                    current_data = current_data.to_auctions()
+
                 # Analizar datos con LLM
                 opportunities = await self.llm.scan_auction_house(
                     current_data=current_data,
                     profile_preferences=profile.preferences.__dict__,
                     game_version=game_version.value
                 )
+                # Gangas del detector (la mejor por item) que el LLM no señaló
+                opportunities = list(opportunities)
+                seen = {opp['item_id'] for opp in opportunities}
+                for bargain in bargains:
+                    if bargain['item_id'] not in seen:
+                        seen.add(bargain['item_id'])
+                        opportunities.append({
+                            'item_id': bargain['item_id'],
+                            'price': bargain['price_u'],
+                            'quantity': bargain['qty_sugerida'],
+                        })
 
-                # Actualizar historial para items relevantes
+                # Actualizar historial para items relevantes (una escritura por escaneo)
                 for opp in opportunities:
                     item_id = opp['item_id']
                     self.profile_manager.update_auction_history(
@@ -98,8 +259,11 @@ class AuctionAnalyzer:
                             'price': opp['price'],
                             'quantity': opp['quantity'],
                             'timestamp': datetime.utcnow().isoformat()
-                        }
+                        },
+                        flush=False,
                     )
+                if opportunities:
+                    self.profile_manager.flush_history()
 
                 # Esperar hasta el próximo escaneo
                 await asyncio.sleep(scan_interval)
@@ -126,8 +290,8 @@ class AuctionAnalyzer:
                     'price_history': history[-10:]  # últimos 10 registros
                 })
 
-        # Obtener estrategia sugerida
-        strategy = self.llm.suggest_search_strategy(
+        # Obtener estrategia sugerida sin bloquear el bucle de eventos
+        strategy = await self.llm.suggest_search_strategy_async(
             item_history=market_trends,
             market_trends=market_trends,
             game_version=game_version.value
@@ -140,24 +304,38 @@ class AuctionAnalyzer:
 
     async def monitor_price_thresholds(self,
                                      game_version: GameVersion,
-                                     realm: str) -> List[Dict]:
+                                     realm: str,
+                                     changed_only: bool = False) -> List[Dict]:
         """
         Monitorea los umbrales de precio para items observados.
+
+        Si la API ofrece ``stream_auctions`` los umbrales se evalúan lote a
+        lote mientras se descarga el payload, sin conservar la lista completa.
+        Con ``changed_only`` se descarga el snapshot completo (el diff lo
+        necesita) y sólo se evalúan (y alertan) los items cuyo libro cambió
+        desde la llamada anterior.
         """
         profile = self.profile_manager.get_profile(game_version)
-        current_data = await self.blizzard_api.get_auctions(realm)
-        
+        thresholds = profile.preferences.price_thresholds
+
+        stream = getattr(self.blizzard_api, 'stream_auctions', None)
+        if stream is not None and not changed_only:
+            min_prices = await _stream_min_prices(stream(realm, item_ids=list(thresholds)))
+        else:
+            current_data = await self.blizzard_api.get_auctions(realm)
+            diff = self._diff('thresholds', realm, current_data) if changed_only else None
+            if diff is not None:
+                thresholds = {i: t for i, t in thresholds.items() if i in diff}
+            min_prices = {
+                item_id: _min_price_for_item(current_data, item_id)
+                for item_id in thresholds
+            }
+
         alerts = []
-        for item_id, threshold in profile.preferences.price_thresholds.items():
-            item_auctions = [
-                auction for auction in current_data 
-                if auction['item']['id'] == item_id
-            ]
-            
-            if not item_auctions:
+        for item_id, threshold in thresholds.items():
+            min_price = min_prices.get(item_id)
+            if min_price is None:
                 continue
-
-            min_price = min(auction['unit_price'] for auction in item_auctions)
             
             if min_price <= threshold:
                 alerts.append({
@@ -168,3 +346,65 @@ class AuctionAnalyzer:
                 })
 
         return alerts
+
+
+def _lot_stats(lots: List[Dict]) -> Optional[Dict]:
+    """Estadísticas de precio de los lotes de un item (formato de ``summary``)."""
+    prices = [lot['price'] if 'price' in lot else lot_unit_price(lot) for lot in lots]
+    prices = [float(p) for p in prices if p is not None and math.isfinite(p)]
+    if not prices:
+        return None
+    mean = sum(prices) / len(prices)
+    return {
+        'min_price': min(prices),
+        'max_price': max(prices),
+        'mean_price': mean,
+        'std_price': math.sqrt(sum((p - mean) ** 2 for p in prices) / len(prices)),
+        'total_listings': len(prices),
+    }
+
+
+def _auctions_for_item(current_data, item_id: int) -> List[Dict]:
+    """Subastas de un item tanto desde lista de la API como desde un Snapshot."""
+    if isinstance(current_data, Snapshot):
+        rows = current_data.rows(item_id)
+        return [
+            {
+                'item': {'id': item_id},
+                'unit_price': float(current_data.unit_price[i]),
+                'quantity': int(current_data.quantity[i]),
+            }
+            for i in range(rows.start, rows.stop)
+        ]
+    return [
+        auction for auction in current_data
+        if auction['item']['id'] == item_id
+    ]
+
+
+def _min_price_for_item(current_data, item_id: int) -> Optional[float]:
+    """Precio mínimo de un item; en un Snapshot es la primera fila del rango."""
+    if isinstance(current_data, Snapshot):
+        prices = current_data.prices(item_id)
+        if not prices.size or math.isnan(prices[0]):
+            return None
+        return float(prices[0])
+    prices = [
+        auction['unit_price'] for auction in current_data
+        if auction['item']['id'] == item_id
+    ]
+    return min(prices) if prices else None
+
+
+async def _stream_min_prices(lots) -> Dict[int, float]:
+    """Precio mínimo por item calculado sobre la marcha desde un stream de lotes."""
+    min_prices: Dict[int, float] = {}
+    async for lot in lots:
+        price = lot_unit_price(lot)
+        if math.isnan(price):
+            continue
+        item_id = lot['item']['id']
+        current = min_prices.get(item_id)
+        if current is None or price < current:
+            min_prices[item_id] = price
+    return min_prices
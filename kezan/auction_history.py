@@ -0,0 +1,230 @@
+"""Historial de subastas por perfil en ficheros de solo-anexado.
+
+Cada versión del juego tiene su fichero ``<versión>.jsonl`` (una línea por
+registro: ``{"item_id": ..., "record": {...}}``) separado del JSON de
+preferencias del perfil. Los registros nuevos se acumulan en memoria y
+:meth:`AuctionHistoryStore.flush` los anexa con una única escritura por
+fichero, de modo que un escaneo con muchas oportunidades cuesta una sola
+operación de disco.
+
+En memoria se conservan los últimos ``max_records`` registros por item;
+cuando el fichero acumula demasiadas líneas descartadas se compacta
+(reescritura atómica con fichero temporal + ``os.replace``).
+
+Todas las instancias de un proceso que apuntan a la misma carpeta comparten
+almacén (:meth:`AuctionHistoryStore.shared`). Si el fichero crece por otra
+vía (otro proceso) las líneas nuevas se incorporan en la siguiente lectura,
+y la compactación relee el fichero justo antes de reescribirlo.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple
+
+from kezan.logger import get_logger
+
+logger = get_logger(__name__)
+
+MAX_RECORDS = 100  # registros conservados por item
+COMPACT_RATIO = 4  # compactar cuando el fichero supera N veces lo conservado
+
+_stores: Dict[Path, "AuctionHistoryStore"] = {}
+_stores_lock = threading.Lock()
+
+
+class AuctionHistoryStore:
+    """Historial de subastas por versión e item con escrituras agrupadas.
+
+    Parámetros:
+    - directory (str | Path): carpeta de los ficheros ``.jsonl``.
+    - max_records (int): registros conservados por item.
+    """
+
+    def __init__(self, directory, max_records: int = MAX_RECORDS):
+        self.directory = Path(directory)
+        self.max_records = max_records
+        self._lock = threading.RLock()
+        self._series: Dict[str, Dict[int, Deque[dict]]] = {}
+        self._lines: Dict[str, int] = {}
+        self._pending: Dict[str, List[str]] = {}
+        # (inodo, bytes ya leídos) de cada fichero, para detectar cambios externos
+        self._read_upto: Dict[str, Tuple[int, int]] = {}
+
+    @classmethod
+    def shared(cls, directory, max_records: int = MAX_RECORDS) -> "AuctionHistoryStore":
+        """Almacén único del proceso para ``directory``.
+
+        Varias instancias de :class:`~kezan.profile_manager.ProfileManager`
+        sobre la misma carpeta ven así el mismo historial en memoria.
+        """
+        key = Path(directory).expanduser().resolve()
+        with _stores_lock:
+            store = _stores.get(key)
+            if store is None:
+                store = _stores[key] = cls(key, max_records)
+            return store
+
+    def _path(self, version: str) -> Path:
+        return self.directory / f"{version}.jsonl"
+
+    def _ingest(self, series: Dict[int, Deque[dict]], lines, path: Path) -> int:
+        count = 0
+        for line in lines:
+            if not line.strip():
+                continue
+            count += 1
+            try:
+                entry = json.loads(line)
+                item_id = int(entry["item_id"])
+            except (ValueError, KeyError, TypeError):
+                logger.warning("Línea de historial corrupta en %s; se ignora", path)
+                continue
+            series.setdefault(item_id, deque(maxlen=self.max_records)).append(entry.get("record"))
+        return count
+
+    def _load(self, version: str) -> Dict[int, Deque[dict]]:
+        """Serie en memoria de ``version``, al día con el fichero.
+
+        Si el fichero sólo creció se leen las líneas nuevas; si se reemplazó
+        o encogió (compactado por otro proceso) se relee entero. Los
+        registros pendientes de este almacén se conservan en ambos casos.
+        """
+        path = self._path(version)
+        try:
+            st = path.stat()
+            current: Optional[Tuple[int, int]] = (st.st_ino, st.st_size)
+        except FileNotFoundError:
+            current = None
+        series = self._series.get(version)
+        known = self._read_upto.get(version)
+        if series is not None and current == known:
+            return series
+        if series is not None and current is not None and known is not None \
+                and current[0] == known[0] and current[1] > known[1]:
+            with open(path, "rb") as fh:
+                fh.seek(known[1])
+                tail = fh.read()
+            end = tail.rfind(b"\n") + 1  # sólo líneas completas
+            self._lines[version] = self._lines.get(version, 0) + self._ingest(
+                series, tail[:end].decode("utf-8").splitlines(), path
+            )
+            self._read_upto[version] = (current[0], known[1] + end)
+            return series
+        if series is None and current is None:
+            self._series[version] = series = {}
+            self._lines[version] = 0
+            return series
+
+        series = {}
+        lines = 0
+        upto = (0, 0)
+        if current is not None:
+            with open(path, "rb") as fh:
+                data = fh.read()
+            end = data.rfind(b"\n") + 1
+            lines = self._ingest(series, data[:end].decode("utf-8").splitlines(), path)
+            upto = (current[0], end)
+        # Los pendientes aún no están en el fichero
+        self._ingest(series, self._pending.get(version, []), path)
+        self._series[version] = series
+        self._lines[version] = lines
+        self._read_upto[version] = upto
+        return series
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+    def get(self, version: str, item_id: int) -> List[dict]:
+        """Registros de ``item_id`` (del más antiguo al más reciente)."""
+        with self._lock:
+            return list(self._load(version).get(int(item_id), ()))
+
+    def item_ids(self, version: str) -> List[int]:
+        """Items con historial en ``version``."""
+        with self._lock:
+            return list(self._load(version))
+
+    def all(self, version: str) -> Dict[int, List[dict]]:
+        """Historial completo de una versión."""
+        with self._lock:
+            return {item_id: list(records) for item_id, records in self._load(version).items()}
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+    def append(self, version: str, item_id: int, record: dict) -> None:
+        """Añade un registro en memoria; se persiste en el próximo :meth:`flush`."""
+        item_id = int(item_id)
+        line = json.dumps({"item_id": item_id, "record": record}, ensure_ascii=False)
+        with self._lock:
+            series = self._load(version)
+            series.setdefault(item_id, deque(maxlen=self.max_records)).append(record)
+            self._pending.setdefault(version, []).append(line)
+
+    def import_history(self, version: str, history: Dict[int, List[dict]]) -> None:
+        """Incorpora un historial completo (p. ej. el antiguo del JSON del perfil)."""
+        with self._lock:
+            for item_id, records in history.items():
+                for record in records:
+                    self.append(version, item_id, record)
+
+    def flush(self) -> int:
+        """Escribe los registros pendientes (una escritura por fichero).
+
+        Retorna:
+        - int: registros escritos.
+        """
+        written = 0
+        with self._lock:
+            for version, lines in list(self._pending.items()):
+                if not lines:
+                    continue
+                self._load(version)  # incorporar antes lo que hayan escrito otros
+                data = ("\n".join(lines) + "\n").encode("utf-8")
+                self.directory.mkdir(parents=True, exist_ok=True)
+                path = self._path(version)
+                with open(path, "ab") as fh:
+                    start = fh.tell()
+                    fh.write(data)
+                ino, upto = self._read_upto.get(version, (0, 0))
+                st = path.stat()
+                if upto == start and ino in (0, st.st_ino):
+                    # Nadie escribió entre medias: lo nuestro ya está en memoria
+                    self._read_upto[version] = (st.st_ino, start + len(data))
+                self._lines[version] = self._lines.get(version, 0) + len(lines)
+                written += len(lines)
+                self._pending[version] = []
+                retained = sum(len(records) for records in self._series[version].values())
+                if self._lines[version] > COMPACT_RATIO * max(retained, self.max_records):
+                    self.compact(version)
+        return written
+
+    def compact(self, version: str) -> None:
+        """Reescribe el fichero con sólo los registros conservados.
+
+        Relee antes el fichero, de modo que no se pierden registros escritos
+        por otros procesos. Incluye también los pendientes de ``version``,
+        que dejan de estarlo.
+        """
+        with self._lock:
+            series = self._load(version)
+            path = self._path(version)
+            tmp = path.with_suffix(".tmp")
+            lines = [
+                json.dumps({"item_id": item_id, "record": record}, ensure_ascii=False)
+                for item_id, records in series.items()
+                for record in records
+            ]
+            data = "".join(line + "\n" for line in lines).encode("utf-8")
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp, path)
+            self._pending[version] = []
+            self._lines[version] = len(lines)
+            self._read_upto[version] = (path.stat().st_ino, len(data))
+        logger.debug("Historial '%s' compactado a %d registros", version, len(lines))
@@ -0,0 +1,89 @@
+"""Decodificador JSON incremental para el payload de subastas de Blizzard.
+
+La respuesta de ``/auctions`` es un objeto con un array ``auctions`` de miles
+de lotes. :class:`AuctionStreamDecoder` recibe los bytes a trozos (por ejemplo
+desde ``httpx.Response.aiter_bytes``) y devuelve cada lote en cuanto su objeto
+JSON está completo, sin construir nunca el árbol completo del documento. Así
+el filtrado puede empezar antes de que termine la descarga y la memoria pico
+queda acotada al lote en curso más el trozo recibido.
+"""
+from __future__ import annotations
+
+import codecs
+import json
+import re
+from typing import Dict, List
+
+_AUCTIONS_START = re.compile(r'"auctions"\s*:\s*\[')
+_WHITESPACE = " \t\r\n"
+
+_SEEK, _ARRAY, _DONE = range(3)
+
+
+class AuctionStreamDecoder:
+    """Extrae los lotes de ``auctions`` a medida que llegan los bytes."""
+
+    def __init__(self) -> None:
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._state = _SEEK
+        self.count = 0
+
+    @property
+    def done(self) -> bool:
+        """``True`` cuando se ha leído el cierre del array ``auctions``."""
+        return self._state == _DONE
+
+    def feed(self, chunk: bytes) -> List[Dict]:
+        """Añade un trozo de bytes y devuelve los lotes completados."""
+        if self._state == _DONE:
+            return []
+        self._buffer += self._utf8.decode(chunk)
+        lots: List[Dict] = []
+
+        if self._state == _SEEK:
+            match = _AUCTIONS_START.search(self._buffer, self._pos)
+            if not match:
+                # Conservar la cola por si la clave quedó partida entre trozos
+                self._buffer = self._buffer[-32:]
+                self._pos = 0
+                return lots
+            self._pos = match.end()
+            self._state = _ARRAY
+
+        buf = self._buffer
+        pos = self._pos
+        size = len(buf)
+        while True:
+            while pos < size and (buf[pos] in _WHITESPACE or buf[pos] == ","):
+                pos += 1
+            if pos >= size:
+                break
+            if buf[pos] == "]":
+                self._state = _DONE
+                pos += 1
+                break
+            try:
+                obj, end = self._decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                break  # objeto incompleto: esperar al siguiente trozo
+            lots.append(obj)
+            pos = end
+
+        # Descartar lo ya consumido para que el buffer no crezca
+        self._buffer = buf[pos:]
+        self._pos = 0
+        self.count += len(lots)
+        return lots
+
+    def close(self) -> None:
+        """Valida que el array se haya leído completo.
+
+        Lanza:
+        - ValueError: si el documento terminó antes de cerrar ``auctions``.
+        """
+        self._buffer += self._utf8.decode(b"", final=True)
+        if self._state != _DONE:
+            raise ValueError("Payload de subastas incompleto o sin clave 'auctions'")
@@ -6,7 +6,12 @@ final recommendation fields, and compliance with advisory-only UX.
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Dict, Iterable, List, Optional, Protocol
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Mapping, Optional, Protocol, Sequence, Union
+
+import numpy as np
+
+if TYPE_CHECKING:  # pragma: no cover
+    from kezan.snapshot import Snapshot
 
 
 @dataclass
@@ -75,6 +80,29 @@ def normalize_noncommodity_lot(realm_id: int, lot: Dict) -> Optional[Lot]:
     )
 
 
+def lots_from_snapshot(snapshot: "Snapshot", scope: str, is_commodity: bool) -> Iterator[Lot]:
+    """Genera lotes normalizados leyendo las columnas de un Snapshot.
+
+    Equivale a aplicar ``normalize_*_lot`` a cada subasta sin volver a recorrer
+    el JSON: ``unit_price`` del snapshot ya está normalizado por unidad. Los
+    lotes sin precio (``NaN``) se omiten, igual que los no-commodities sin
+    ``buyout``.
+    """
+    item_ids = snapshot.item_id.tolist()
+    quantities = snapshot.quantity.tolist()
+    prices = snapshot.unit_price.tolist()
+    for item_id, qty, price_u in zip(item_ids, quantities, prices):
+        if price_u != price_u:  # NaN
+            continue
+        yield Lot(
+            item_id=item_id,
+            quantity=qty if is_commodity else max(qty, 1),
+            scope=scope,
+            is_commodity=is_commodity,
+            price_u=price_u,
+        )
+
+
 def zscore(price_u: float, P50_7d: float, MAD_7d: float) -> float:
     eps = 1e-6
     denom = 1.4826 * max(MAD_7d, eps)
@@ -187,3 +215,136 @@ def detect_bargains(snapshot: Iterable[Lot], history: History, capital: float, c
         )
 
     return sorted(recs, key=lambda r: r["bargain_score"], reverse=True)
+
+
+STATS_FIELDS = ("P50_7d", "P50_30d", "MAD_7d", "vol_7d", "rot")
+
+
+def stats_columns(
+    history: History, scope: str, item_ids: Sequence[int], quality: Optional[int] = None
+) -> Dict[str, np.ndarray]:
+    """Construye columnas de :class:`Stats` alineadas con ``item_ids``.
+
+    Consulta ``history.get_stats`` una vez por item distinto (no por lote) y
+    expande el resultado con el índice inverso. Los items sin estadísticas
+    quedan con ``NaN`` y el detector por lotes los descarta.
+    """
+    uniq, inverse = np.unique(np.asarray(item_ids, dtype=np.int64), return_inverse=True)
+    table = np.full((uniq.size, len(STATS_FIELDS)), np.nan)
+    for k, item_id in enumerate(uniq.tolist()):
+        stats = history.get_stats((scope, item_id, quality))
+        if stats:
+            table[k] = [getattr(stats, f) for f in STATS_FIELDS]
+    return {f: table[inverse, j] for j, f in enumerate(STATS_FIELDS)}
+
+
+def detect_bargains_batch(
+    item_id: Sequence[int],
+    price_u: Sequence[float],
+    stats: Mapping[str, Sequence[float]],
+    capital: float,
+    cfg: Config,
+    scope: Union[str, Sequence[str]] = "",
+    is_commodity: Union[bool, Sequence[bool]] = True,
+) -> List[Dict]:
+    """Versión vectorizada de :func:`detect_bargains` sobre columnas.
+
+    Parámetros:
+    - item_id, price_u: columnas alineadas de los lotes (``NaN`` = sin precio).
+    - stats: columnas ``P50_7d``, ``P50_30d``, ``MAD_7d``, ``vol_7d`` y ``rot``
+      alineadas con los lotes (ver :func:`stats_columns`); ``NaN`` = sin histórico.
+    - scope, is_commodity: valor único o columna por lote.
+
+    Descuento, anomalía, liquidez, z-score, ``rule_score``, cantidad y objetivo
+    se calculan con operaciones de array; sólo se materializan diccionarios
+    para las recomendaciones supervivientes. El resultado coincide con el de
+    la ruta escalar para los mismos lotes y estadísticas.
+    """
+    item_id = np.asarray(item_id)
+    price = np.asarray(price_u, dtype=np.float64)
+    p50_7d = np.asarray(stats["P50_7d"], dtype=np.float64)
+    p50_30d = np.asarray(stats["P50_30d"], dtype=np.float64)
+    mad_7d = np.asarray(stats["MAD_7d"], dtype=np.float64)
+    vol_col = np.asarray(stats["vol_7d"])
+    rot_col = np.asarray(stats["rot"])
+    vol = vol_col.astype(np.float64)
+    rot = rot_col.astype(np.float64)
+    commodity = np.broadcast_to(np.asarray(is_commodity, dtype=bool), price.shape)
+
+    # Las comparaciones con NaN son falsas: lotes sin precio/histórico caen solos
+    with np.errstate(invalid="ignore", divide="ignore"):
+        discount = (price <= cfg.discount_p50_30d * p50_30d) & (price <= cfg.discount_p50_7d * p50_7d)
+        z = (price - p50_7d) / (1.4826 * np.maximum(mad_7d, 1e-6))
+        liquidity = np.where(commodity, vol >= cfg.min_vol_commodity, vol >= cfg.min_vol_noncommodity)
+        idx = np.flatnonzero((discount | (z <= cfg.z_threshold)) & liquidity)
+
+        # rule_score vectorizado (mismo orden de operaciones que la versión escalar)
+        rel7 = price[idx] / np.maximum(p50_7d[idx], 1e-6)
+        rel30 = price[idx] / np.maximum(p50_30d[idx], 1e-6)
+        base = 0.0 + np.maximum(0.0, 1.0 - rel7) * 0.5
+        base = base + np.maximum(0.0, 1.0 - rel30) * 0.35
+        base = base + np.minimum(1.0, rot[idx] / 1.0) * 0.15
+        score = np.maximum(0.0, np.minimum(1.0, base))
+        score = np.where(z[idx] <= -2.0, np.maximum(score, 0.7), score)
+
+        keep = score >= cfg.bargain_score_min
+        idx, score = idx[keep], score[keep]
+        qty = np.minimum(
+            np.floor_divide(capital * cfg.max_alloc_fraction, np.maximum(price[idx], 1)),
+            cfg.max_units_cap,
+        )
+        keep = qty > 0
+        idx, score, qty = idx[keep], score[keep], qty[keep].astype(np.int64)
+
+    target = p50_7d[idx] * 0.99
+    eta = np.where(rot[idx] >= 1.0, 36, np.where(rot[idx] >= 0.6, 48, 72))
+    scopes = scope if isinstance(scope, str) else None
+
+    recs: List[Dict] = []
+    for k, i in enumerate(idx.tolist()):
+        zi = float(z[i])
+        vol_i = vol_col[i].item()
+        rot_i = rot_col[i].item()
+        recs.append(
+            {
+                "item_id": item_id[i].item(),
+                "realm_or_region": scopes if scopes is not None else scope[i],
+                "is_commodity": bool(commodity[i]),
+                "price_u": float(price[i]),
+                "p50_7d": float(p50_7d[i]),
+                "p50_30d": float(p50_30d[i]),
+                "zscore_7d": round(zi, 2),
+                "vol_7d": vol_i,
+                "rot": rot_i,
+                "bargain_score": round(float(score[k]), 3),
+                "recommendation_type": "RECOMMEND_BUY",
+                "qty_sugerida": int(qty[k]),
+                "target_sell": float(target[k]),
+                "eta_h": int(eta[k]),
+                "reason": f"Descuento/anomalía; z={zi:.2f}, vol_7d={vol_i}, rot={rot_i}",
+            }
+        )
+
+    return sorted(recs, key=lambda r: r["bargain_score"], reverse=True)
+
+
+def detect_bargains_snapshot(
+    snapshot: "Snapshot",
+    history: History,
+    scope: str,
+    is_commodity: bool,
+    capital: float,
+    cfg: Config,
+    quality: Optional[int] = None,
+) -> List[Dict]:
+    """Detecta gangas sobre un Snapshot completo usando la ruta por lotes."""
+    stats = stats_columns(history, scope, snapshot.item_id, quality)
+    return detect_bargains_batch(
+        snapshot.item_id,
+        snapshot.unit_price,
+        stats,
+        capital,
+        cfg,
+        scope=scope,
+        is_commodity=is_commodity,
+    )
@@ -1,20 +1,93 @@
 """Funciones para interactuar con la API de Blizzard."""
 
+from contextlib import aclosing
+from dataclasses import dataclass, replace
+from typing import AsyncIterator, Dict, Iterable, Optional
+
 import httpx
 
-from kezan.config import API_CLIENT_ID, API_CLIENT_SECRET, REGION, REALM_ID
+from kezan.auction_stream import AuctionStreamDecoder
+from kezan.config import API_CLIENT_ID, API_CLIENT_SECRET, PROCESS_WORKERS, REGION, REALM_ID
 from kezan.logger import get_logger
-from kezan import cache
+from kezan.snapshot import REGION_SCOPE, Snapshot, SnapshotBuilder
+from kezan import cache, http_client, processing
 
 BLIZZ_TOKEN_URL = f"https://{REGION}.battle.net/oauth/token"
-BLIZZ_AUCTION_URL = (
-    f"https://{REGION}.api.blizzard.com/data/wow/connected-realm/{REALM_ID}/auctions"
+BLIZZ_REALM_AUCTION_URL = (
+    f"https://{REGION}.api.blizzard.com/data/wow/connected-realm/{{realm_id}}/auctions"
 )
+BLIZZ_AUCTION_URL = BLIZZ_REALM_AUCTION_URL.format(realm_id=REALM_ID)
+BLIZZ_COMMODITIES_URL = f"https://{REGION}.api.blizzard.com/data/wow/auctions/commodities"
+COMMODITIES = "commodities"
 NAMESPACE = f"dynamic-{REGION}"
+# Tamaño de trozo al leer la respuesta en streaming
+STREAM_CHUNK_SIZE = 64 * 1024
+# Vigencia de las subastas cacheadas y margen en que se sirven obsoletas
+AUCTION_TTL = 300
+AUCTION_STALE_TTL = 3600
 
 logger = get_logger(__name__)
 
 
+def auction_url(realm: str | int | None = None) -> str:
+    """URL de subastas de un reino conectado o del endpoint de commodities.
+
+    ``realm`` puede ser el ID numérico del reino conectado o ``"commodities"``;
+    cualquier otro valor (o ``None``) usa el reino configurado.
+    """
+    if realm is not None and str(realm) == COMMODITIES:
+        return BLIZZ_COMMODITIES_URL
+    if realm is not None and str(realm).isdigit():
+        return BLIZZ_REALM_AUCTION_URL.format(realm_id=realm)
+    return BLIZZ_AUCTION_URL
+
+
+def realm_scope(realm: str | int | None = None) -> int:
+    """Ámbito del snapshot: ID del reino conectado o región para commodities."""
+    if realm is not None and str(realm) == COMMODITIES:
+        return REGION_SCOPE
+    if realm is not None and str(realm).isdigit():
+        return int(realm)
+    return int(REALM_ID) if str(REALM_ID).isdigit() else REGION_SCOPE
+
+
+@dataclass
+class Validators:
+    """Validadores HTTP (``ETag``/``Last-Modified``) de un endpoint."""
+
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def version(self) -> str:
+        """Identificador de la versión servida (ETag o fecha)."""
+        return self.etag or self.last_modified or ""
+
+    def headers(self) -> Dict[str, str]:
+        """Cabeceras para una petición condicional."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def update(self, response: httpx.Response) -> None:
+        """Toma los validadores de una respuesta completa."""
+        self.etag = response.headers.get("ETag")
+        self.last_modified = response.headers.get("Last-Modified")
+
+
+class NotModified(Exception):
+    """El endpoint respondió 304: los datos no cambiaron desde la última descarga."""
+
+
+# Últimos validadores y datos completos por URL para peticiones condicionales
+_validators: Dict[str, Validators] = {}
+_last_payloads: Dict[str, dict] = {}
+_last_snapshots: Dict[str, Snapshot] = {}
+
+
 async def get_access_token() -> str | None:
     """Obtiene y almacena temporalmente un token OAuth2.
 
@@ -28,20 +101,21 @@ async def get_access_token() -> str | None:
     if cached:
         return cached
 
-    async with httpx.AsyncClient(timeout=10) as client:
-        try:
-            response = await client.post(
-                BLIZZ_TOKEN_URL,
-                data={"grant_type": "client_credentials"},
-                auth=(API_CLIENT_ID, API_CLIENT_SECRET),
-            )
-            response.raise_for_status()
-        except (httpx.RequestError, httpx.TimeoutException) as exc:
-            logger.error("Error al contactar con la API de Blizzard: %s", exc)
-            return None
-        except httpx.HTTPStatusError as exc:
-            logger.error("Respuesta inválida de la API de Blizzard: %s", exc)
-            return None
+    client = http_client.get_async_client(BLIZZ_TOKEN_URL)
+    try:
+        response = await client.post(
+            BLIZZ_TOKEN_URL,
+            data={"grant_type": "client_credentials"},
+            auth=(API_CLIENT_ID, API_CLIENT_SECRET),
+            timeout=10,
+        )
+        response.raise_for_status()
+    except (httpx.RequestError, httpx.TimeoutException) as exc:
+        logger.error("Error al contactar con la API de Blizzard: %s", exc)
+        return None
+    except httpx.HTTPStatusError as exc:
+        logger.error("Respuesta inválida de la API de Blizzard: %s", exc)
+        return None
 
     token = response.json().get("access_token")
     if token:
@@ -52,38 +126,225 @@ async def get_access_token() -> str | None:
 async def fetch_auction_data() -> dict | None:
     """Descarga los datos de subastas del reino configurado.
 
+    Las peticiones concurrentes comparten una única descarga y, caducado el
+    TTL, se sirve al instante la última copia mientras se refresca en segundo
+    plano (ver :func:`kezan.cache.get_or_fetch`).
+
     Retorna:
     - dict | None: datos de la API o ``None`` si hubo error.
     """
-    cached = cache.get("auction_data")
-    if cached:
-        return cached
+    return await cache.get_or_fetch(
+        "auction_data", _download_auction_data, ttl=AUCTION_TTL, stale_ttl=AUCTION_STALE_TTL
+    )
 
+
+async def _download_auction_data() -> dict | None:
     token = await get_access_token()
     if not token:
         return None
 
     headers = {"Authorization": f"Bearer {token}"}
     params = {"namespace": NAMESPACE, "locale": "en_US"}
+    previous = _last_payloads.get(BLIZZ_AUCTION_URL)
+    if previous is not None and BLIZZ_AUCTION_URL in _validators:
+        headers.update(_validators[BLIZZ_AUCTION_URL].headers())
 
-    async with httpx.AsyncClient(timeout=10) as client:
-        try:
-            response = await client.get(
-                BLIZZ_AUCTION_URL, headers=headers, params=params
-            )
+    client = http_client.get_async_client(BLIZZ_AUCTION_URL)
+    try:
+        response = await client.get(
+            BLIZZ_AUCTION_URL, headers=headers, params=params, timeout=10
+        )
+        if response.status_code != 304:
             response.raise_for_status()
-        except (httpx.RequestError, httpx.TimeoutException) as exc:
-            logger.error("Error al contactar con la API de Blizzard: %s", exc)
-            return None
-        except httpx.HTTPStatusError as exc:
-            logger.error("Respuesta inválida de la API de Blizzard: %s", exc)
-            return None
+    except (httpx.RequestError, httpx.TimeoutException) as exc:
+        logger.error("Error al contactar con la API de Blizzard: %s", exc)
+        return None
+    except httpx.HTTPStatusError as exc:
+        logger.error("Respuesta inválida de la API de Blizzard: %s", exc)
+        return None
 
-    data = response.json()
-    cache.set("auction_data", data, ttl=300)
+    if response.status_code == 304:
+        if previous is None:
+            logger.error("Respuesta 304 sin descarga previa de subastas")
+            return None
+        logger.info("Subastas sin cambios (304); se reutiliza la última descarga")
+        data = previous
+    else:
+        data = response.json()
+        validators = Validators()
+        validators.update(response)
+        _validators[BLIZZ_AUCTION_URL] = validators
+        _last_payloads[BLIZZ_AUCTION_URL] = data
     return data
 
 
+async def stream_auction_data(
+    item_ids: Optional[Iterable[int]] = None,
+    url: Optional[str] = None,
+    validators: Optional[Validators] = None,
+) -> AsyncIterator[dict]:
+    """Descarga las subastas en streaming y emite cada lote al decodificarse.
+
+    El cuerpo se lee a trozos y el array ``auctions`` se decodifica de forma
+    incremental, por lo que el consumidor puede filtrar mientras continúa la
+    descarga y nunca se materializa el JSON completo.
+
+    Parámetros:
+    - item_ids (Iterable[int] | None): si se indica, sólo se emiten esos items.
+    - url (str | None): endpoint de subastas; por defecto el reino configurado.
+    - validators (Validators | None): si se indica, la petición es condicional
+      y el objeto se actualiza con los validadores de la nueva respuesta.
+
+    Lanza:
+    - NotModified: si la petición condicional recibe un 304.
+    - RuntimeError: si no hay token o la descarga falla o queda incompleta.
+    """
+    wanted = set(item_ids) if item_ids is not None else None
+    decoder = AuctionStreamDecoder()
+    try:
+        async with aclosing(_stream_body(url or BLIZZ_AUCTION_URL, validators)) as chunks:
+            async for chunk in chunks:
+                for lot in decoder.feed(chunk):
+                    if wanted is None or (lot.get("item") or {}).get("id") in wanted:
+                        yield lot
+        decoder.close()
+    except ValueError as exc:
+        logger.error("Payload de subastas inválido: %s", exc)
+        raise RuntimeError("Payload de subastas inválido.") from exc
+
+
+async def _stream_body(url: str, validators: Optional[Validators] = None) -> AsyncIterator[bytes]:
+    """Cuerpo de la respuesta de subastas en trozos de :data:`STREAM_CHUNK_SIZE`.
+
+    Lanza ``NotModified`` en un 304 condicional y ``RuntimeError`` si no hay
+    token o la descarga falla.
+    """
+    token = await get_access_token()
+    if not token:
+        raise RuntimeError("No se pudo obtener el token de la API de Blizzard.")
+
+    headers = {"Authorization": f"Bearer {token}"}
+    if validators is not None:
+        headers.update(validators.headers())
+    params = {"namespace": NAMESPACE, "locale": "en_US"}
+
+    client = http_client.get_async_client(url)
+    try:
+        async with client.stream(
+            "GET", url, headers=headers, params=params, timeout=10
+        ) as response:
+            if response.status_code == 304:
+                raise NotModified(url)
+            response.raise_for_status()
+            if validators is not None:
+                validators.update(response)
+            async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+                yield chunk
+    except (httpx.RequestError, httpx.TimeoutException) as exc:
+        logger.error("Error al contactar con la API de Blizzard: %s", exc)
+        raise RuntimeError("Descarga de subastas interrumpida.") from exc
+    except httpx.HTTPStatusError as exc:
+        logger.error("Respuesta inválida de la API de Blizzard: %s", exc)
+        raise RuntimeError("Respuesta inválida de la API de Blizzard.") from exc
+
+
+async def fetch_auction_snapshot(
+    item_ids: Optional[Iterable[int]] = None,
+    url: Optional[str] = None,
+    scope: int = REGION_SCOPE,
+) -> Snapshot | None:
+    """Descarga las subastas directamente a un :class:`Snapshot`.
+
+    Con ``PROCESS_WORKERS = 0`` (o al filtrar por ``item_ids``) los lotes se
+    vuelcan a buffers columnares según llegan, de modo que la memoria pico no
+    incluye ni el cuerpo completo ni el árbol de objetos. Con el pool activo
+    las descargas completas se acumulan en un único buffer que se parsea en
+    un proceso hijo: la memoria pico incluye el cuerpo una vez, pero nunca el
+    árbol de objetos en este proceso ni el parseo en el bucle de eventos.
+
+    Las descargas completas (sin ``item_ids``) son condicionales: se envían
+    el ``ETag``/``Last-Modified`` de la última respuesta del endpoint y, si
+    Blizzard contesta 304, se devuelve el mismo snapshot anterior sin
+    descargar ni parsear nada. ``Snapshot.version`` identifica la versión,
+    así los consumidores pueden saltarse el reprocesado.
+
+    El snapshot del reino por defecto se cachea (``auction_snapshot``) con
+    stale-while-revalidate; las descargas completas concurrentes de un mismo
+    endpoint se agrupan en una sola.
+
+    Retorna:
+    - Snapshot | None: snapshot construido o ``None`` si hubo error.
+    """
+    target = url or BLIZZ_AUCTION_URL
+    if item_ids is not None:
+        return await _download_snapshot(item_ids, target, scope)
+
+    async def download():
+        return await _download_snapshot(None, target, scope)
+
+    if url is None:
+        return await cache.get_or_fetch(
+            "auction_snapshot", download, ttl=AUCTION_TTL, stale_ttl=AUCTION_STALE_TTL
+        )
+    return await cache.single_flight(f"auction_snapshot:{target}", download)
+
+
+async def _download_snapshot(
+    item_ids: Optional[Iterable[int]], target: str, scope: int
+) -> Snapshot | None:
+    previous = _last_snapshots.get(target) if item_ids is None else None
+    validators = None
+    if item_ids is None:
+        known = _validators.get(target)
+        validators = replace(known) if previous is not None and known else Validators()
+
+    try:
+        if item_ids is None and PROCESS_WORKERS > 0:
+            snapshot = await _process_snapshot(target, scope, validators)
+        else:
+            builder = SnapshotBuilder(scope=scope)
+            async for lot in stream_auction_data(item_ids=item_ids, url=target, validators=validators):
+                builder.append(lot)
+            if validators is not None:
+                builder.version = validators.version
+            snapshot = builder.build()
+    except NotModified:
+        logger.info("Subastas sin cambios en %s (304)", target)
+        snapshot = previous
+    except RuntimeError:
+        return None
+    else:
+        if validators is not None:
+            if validators.last_modified:
+                # Momento de publicación según Blizzard (lo usa RealmScanner)
+                snapshot = replace(snapshot, meta={**snapshot.meta, "last_modified": validators.last_modified})
+            _validators[target] = validators
+            _last_snapshots[target] = snapshot
+    return snapshot
+
+
+async def _process_snapshot(target: str, scope: int, validators: Validators) -> Snapshot:
+    """Descarga el cuerpo completo y lo parsea en el pool de procesado.
+
+    Con ``PROCESS_WORKERS > 0`` el parseo del volcado no ocupa el bucle de
+    eventos (ver :mod:`kezan.processing`); a cambio se retiene el cuerpo en
+    memoria hasta enviarlo al proceso hijo. El ``bytearray`` se envía tal
+    cual (``json.loads`` lo acepta), sin copiarlo a ``bytes``.
+    """
+    body = bytearray()
+    async for chunk in _stream_body(target, validators):
+        body += chunk
+    try:
+        # Sólo se necesita el snapshot: sin agregados ni anomalías
+        result = await processing.get_processor().process(
+            body, scope=scope, version=validators.version, aggregate=False
+        )
+    except ValueError as exc:
+        logger.error("Payload de subastas inválido: %s", exc)
+        raise RuntimeError("Payload de subastas inválido.") from exc
+    return result.snapshot
+
+
 class BlizzardAPI:
     def __init__(self):
         self.token_url = BLIZZ_TOKEN_URL
@@ -95,3 +356,18 @@ class BlizzardAPI:
 
     async def fetch_auction_data(self) -> dict | None:
         return await fetch_auction_data()
+
+    async def get_auctions(self, realm: str | int | None = None) -> Snapshot | None:
+        """Snapshot de subastas de un reino conectado o de ``"commodities"``.
+
+        Si el endpoint no cambió desde la última llamada (304) se devuelve el
+        mismo snapshot, con la misma ``version``.
+        """
+        return await fetch_auction_snapshot(url=auction_url(realm), scope=realm_scope(realm))
+
+    def stream_auctions(self, realm: str | int | None = None, item_ids: Optional[Iterable[int]] = None) -> AsyncIterator[dict]:
+        """Lotes del reino indicado emitidos a medida que se descargan."""
+        return stream_auction_data(item_ids=item_ids, url=auction_url(realm))
+
+    async def fetch_auction_snapshot(self, item_ids: Optional[Iterable[int]] = None) -> Snapshot | None:
+        return await fetch_auction_snapshot(item_ids=item_ids)
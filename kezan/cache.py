@@ -1,34 +1,254 @@
-"""Cache sencillo con TTL opcionalmente persistente en disco."""
+"""Caché en dos niveles con TTL: memoria (LRU acotada) y disco (SQLite).
 
+- Nivel 1: diccionario LRU en memoria limitado por número de entradas y por
+  bytes. El tamaño de cada valor se estima sin serializarlo (``nbytes`` de
+  arrays y snapshots, longitud de bytes y cadenas, muestreo en listas y
+  diccionarios). Al superar cualquiera de los dos límites se expulsan las
+  entradas menos usadas.
+- Nivel 2: tabla SQLite con una única conexión de larga duración. Los valores
+  se guardan serializados con ``pickle`` junto a su caducidad y tamaño; los
+  que superan ``MAX_DISK_VALUE_BYTES`` sólo viven en memoria (y no llegan a
+  serializarse si la estimación ya lo supera).
+
+Un hilo en segundo plano borra periódicamente las entradas caducadas de
+ambos niveles, de modo que las claves que nunca se vuelven a leer no se
+acumulan. :func:`stats` expone aciertos, fallos, expulsiones y bytes.
+
+Cada entrada puede conservarse ``stale_ttl`` segundos más allá de su TTL.
+:func:`get` sólo devuelve valores frescos, pero :func:`get_or_fetch` sirve
+el valor caducado al instante mientras lo refresca en segundo plano
+(*stale-while-revalidate*). Los fallos concurrentes de una misma clave se
+agrupan en una única descarga (:func:`single_flight`).
+"""
+
+import asyncio
+import atexit
+import itertools
 import os
-import shelve
+import pickle
+import sqlite3
+import sys
+import threading
 import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from kezan.logger import get_logger
+
+logger = get_logger(__name__)
 
 CACHE_DIR = Path(os.path.expanduser("~/.kezan"))
-CACHE_FILE = CACHE_DIR / "cache.db"
+CACHE_FILE = CACHE_DIR / "cache.sqlite3"
+
+MAX_MEMORY_ITEMS = 1024
+MAX_MEMORY_BYTES = 256 * 1024 * 1024
+MAX_DISK_VALUE_BYTES = 32 * 1024 * 1024
+SWEEP_INTERVAL = 300  # segundos entre barridos de entradas caducadas
+_SIZE_SAMPLE = 16  # elementos medidos por contenedor al estimar tamaños
+
+_SCHEMA_VERSION = 2
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS cache ("
+    "key TEXT PRIMARY KEY, value BLOB NOT NULL, fresh REAL NOT NULL, expires REAL NOT NULL, "
+    "size INTEGER NOT NULL)"
+)
+
+
+class _Entry:
+    __slots__ = ("value", "fresh", "expires", "size")
+
+    def __init__(self, value: Any, fresh: float, expires: float, size: int):
+        self.value = value
+        self.fresh = fresh  # fin del TTL
+        self.expires = expires  # fin del periodo servible como obsoleto
+        self.size = size
+
+
+@dataclass
+class CacheStats:
+    """Contadores acumulados de la caché."""
+
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    sets: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    stale_hits: int = 0
+    coalesced: int = 0
+    refreshes: int = 0
+
+
+_lock = threading.RLock()
+_memory: "OrderedDict[str, _Entry]" = OrderedDict()
+_memory_bytes = 0
+_counters = CacheStats()
+
+_db: Optional[sqlite3.Connection] = None
+_db_path: Optional[Path] = None
+_sweeper: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+# Descargas en curso por (bucle de eventos, clave)
+_inflight: Dict[Tuple[int, str], "asyncio.Task"] = {}
 
-_cache_memory: dict[str, tuple[Any, float]] = {}
 
+# ----------------------------------------------------------------------
+# Nivel persistente
+# ----------------------------------------------------------------------
+def _connection() -> sqlite3.Connection:
+    """Devuelve la conexión SQLite, abriéndola (una vez) si hace falta."""
+    global _db, _db_path
+    path = Path(CACHE_FILE)
+    if _db is not None and _db_path == path:
+        return _db
+    if _db is not None:
+        _db.close()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+    _db.execute("PRAGMA journal_mode=WAL")
+    _db.execute("PRAGMA synchronous=NORMAL")
+    if _db.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+        # Esquema antiguo: la caché es desechable, se recrea
+        _db.execute("DROP TABLE IF EXISTS cache")
+        _db.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+    _db.execute(_SCHEMA)
+    _db_path = path
+    _start_sweeper()
+    return _db
 
-def _open_db():
-    CACHE_DIR.mkdir(parents=True, exist_ok=True)
-    return shelve.open(str(CACHE_FILE))
 
+def _start_sweeper() -> None:
+    global _sweeper, _stop
+    if _sweeper is not None and _sweeper.is_alive() and not _stop.is_set():
+        return
+    # Cada hilo tiene su propio evento: si ``close()`` paró el anterior y aún
+    # no ha salido de su espera, termina solo sin afectar al nuevo
+    _stop = threading.Event()
+    _sweeper = threading.Thread(target=_sweep_loop, args=(_stop,), name="kezan-cache-sweeper", daemon=True)
+    _sweeper.start()
 
-def set(key: str, value: Any, ttl: int) -> None:
+
+def _sweep_loop(stop: threading.Event) -> None:
+    while not stop.wait(SWEEP_INTERVAL):
+        try:
+            sweep()
+        except sqlite3.Error as exc:  # pragma: no cover - disco no disponible
+            logger.warning("Barrido de caché fallido: %s", exc)
+
+
+# ----------------------------------------------------------------------
+# Nivel en memoria
+# ----------------------------------------------------------------------
+def _forget(key: str) -> None:
+    global _memory_bytes
+    entry = _memory.pop(key, None)
+    if entry is not None:
+        _memory_bytes -= entry.size
+
+
+def _remember(key: str, value: Any, fresh: float, expires: float, size: int) -> None:
+    global _memory_bytes
+    _forget(key)
+    if size > MAX_MEMORY_BYTES:
+        return
+    _memory[key] = _Entry(value, fresh, expires, size)
+    _memory_bytes += size
+    while _memory and (len(_memory) > MAX_MEMORY_ITEMS or _memory_bytes > MAX_MEMORY_BYTES):
+        _, old = _memory.popitem(last=False)
+        _memory_bytes -= old.size
+        _counters.evictions += 1
+
+
+def _estimate_size(value: Any, depth: int = 0) -> int:
+    """Tamaño aproximado de ``value`` en bytes, sin serializarlo.
+
+    Arrays NumPy y :class:`~kezan.snapshot.Snapshot` aportan ``nbytes``;
+    bytes y cadenas, su longitud. En listas, tuplas y diccionarios se mide una
+    muestra de elementos y se extrapola al total.
+    """
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, (list, tuple, dict)) and value and depth < 3:
+        items = value.items() if isinstance(value, dict) else value
+        sample = list(itertools.islice(items, _SIZE_SAMPLE))
+        per_item = sum(_estimate_size(item, depth + 1) for item in sample) / len(sample)
+        return sys.getsizeof(value) + int(per_item * len(value))
+    return sys.getsizeof(value)
+
+
+def _serialize(value: Any) -> Optional[bytes]:
+    """Serializa el valor para el nivel en disco; ``None`` si no se puede."""
+    try:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, TypeError, AttributeError) as exc:
+        logger.debug("Valor no serializable, sólo en memoria: %s", exc)
+        return None
+
+
+# ----------------------------------------------------------------------
+# API pública
+# ----------------------------------------------------------------------
+def set(key: str, value: Any, ttl: int, stale_ttl: int = 0) -> None:
     """Guarda un valor con tiempo de vida (segundos).
 
     Parámetros:
     - key (str): clave identificadora.
     - value (Any): valor a almacenar.
     - ttl (int): tiempo de expiración en segundos.
+    - stale_ttl (int): segundos adicionales durante los que el valor puede
+      servirse como obsoleto mientras se refresca.
     """
-    expires = time.time() + ttl
-    _cache_memory[key] = (value, expires)
-    with _open_db() as db:
-        db[key] = (value, expires)
+    fresh = time.time() + ttl
+    expires = fresh + max(stale_ttl, 0)
+    size = _estimate_size(value)
+    # Sólo se serializa lo que puede acabar en disco
+    blob = _serialize(value) if size <= MAX_DISK_VALUE_BYTES else None
+    with _lock:
+        _counters.sets += 1
+        _remember(key, value, fresh, expires, size)
+        db = _connection()
+        if blob is not None and len(blob) <= MAX_DISK_VALUE_BYTES:
+            db.execute(
+                "INSERT OR REPLACE INTO cache (key, value, fresh, expires, size) VALUES (?, ?, ?, ?, ?)",
+                (key, blob, fresh, expires, len(blob)),
+            )
+        else:
+            # Evitar que reaparezca una versión anterior persistida
+            db.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+
+def _lookup(key: str, now: float) -> Tuple[Optional[_Entry], bool]:
+    """Entrada servible (fresca u obsoleta) y si se leyó del disco."""
+    entry = _memory.get(key)
+    if entry is not None:
+        if entry.expires > now:
+            _memory.move_to_end(key)
+            return entry, False
+        _forget(key)
+
+    db = _connection()
+    row = db.execute("SELECT value, fresh, expires, size FROM cache WHERE key = ?", (key,)).fetchone()
+    if row is None:
+        return None, False
+    blob, fresh, expires, size = row
+    if expires <= now:
+        db.execute("DELETE FROM cache WHERE key = ?", (key,))
+        _counters.expirations += 1
+        return None, False
+    try:
+        value = pickle.loads(blob)
+    except Exception as exc:
+        logger.warning("Entrada de caché corrupta '%s': %s", key, exc)
+        db.execute("DELETE FROM cache WHERE key = ?", (key,))
+        return None, False
+    _remember(key, value, fresh, expires, size)
+    return _Entry(value, fresh, expires, size), True
 
 
 def get(key: str) -> Optional[Any]:
@@ -41,15 +261,157 @@ def get(key: str) -> Optional[Any]:
     - Any | None: valor almacenado o ``None`` si no existe o expiró.
     """
     now = time.time()
-    entry = _cache_memory.get(key)
-    if entry and entry[1] > now:
-        return entry[0]
-
-    with _open_db() as db:
-        if key in db:
-            value, expires = db[key]
-            if expires > now:
-                _cache_memory[key] = (value, expires)
-                return value
-            del db[key]
-    return None
+    with _lock:
+        entry, from_disk = _lookup(key, now)
+        if entry is None or entry.fresh <= now:
+            _counters.misses += 1
+            return None
+        if from_disk:
+            _counters.disk_hits += 1
+        else:
+            _counters.memory_hits += 1
+        return entry.value
+
+
+def get_stale(key: str) -> Optional[Any]:
+    """Recupera un valor aunque haya superado su TTL (dentro de ``stale_ttl``)."""
+    with _lock:
+        entry, _ = _lookup(key, time.time())
+        return None if entry is None else entry.value
+
+
+def delete(key: str) -> None:
+    """Elimina una clave de ambos niveles."""
+    with _lock:
+        _forget(key)
+        _connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+
+def clear() -> None:
+    """Vacía ambos niveles y reinicia los contadores."""
+    global _counters, _memory_bytes
+    with _lock:
+        _memory.clear()
+        _memory_bytes = 0
+        _connection().execute("DELETE FROM cache")
+        _counters = CacheStats()
+
+
+# ----------------------------------------------------------------------
+# Agrupación de descargas y stale-while-revalidate
+# ----------------------------------------------------------------------
+async def single_flight(key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+    """Ejecuta ``fetch`` una sola vez para todas las corrutinas concurrentes.
+
+    Las llamadas que llegan mientras hay una descarga en curso para ``key``
+    esperan su resultado (o su excepción) en lugar de lanzar otra.
+    """
+    task, created = _start_flight(key, fetch)
+    if not created:
+        _counters.coalesced += 1
+    return await asyncio.shield(task)
+
+
+def _start_flight(key: str, fetch: Callable[[], Awaitable[Any]]) -> Tuple["asyncio.Task", bool]:
+    """Tarea en curso para ``key`` o una nueva; indica si se creó ahora."""
+    loop = asyncio.get_running_loop()
+    flight = (id(loop), key)
+    task = _inflight.get(flight)
+    if task is not None and not task.done():
+        return task, False
+    task = loop.create_task(fetch())
+    _inflight[flight] = task
+
+    def _done(finished: "asyncio.Task") -> None:
+        if _inflight.get(flight) is finished:
+            del _inflight[flight]
+        if not finished.cancelled() and finished.exception() is not None:
+            logger.debug("Descarga de '%s' fallida: %s", key, finished.exception())
+
+    task.add_done_callback(_done)
+    return task, True
+
+
+async def get_or_fetch(
+    key: str,
+    fetch: Callable[[], Awaitable[Any]],
+    ttl: int,
+    stale_ttl: int = 0,
+) -> Any:
+    """Devuelve el valor cacheado o lo obtiene con ``fetch`` (una vez).
+
+    - Valor fresco: se devuelve directamente.
+    - Valor obsoleto (dentro de ``stale_ttl``): se devuelve al instante y se
+      lanza un refresco en segundo plano.
+    - Sin valor: las llamadas concurrentes esperan a una única ``fetch``.
+
+    Los resultados ``None`` no se almacenan.
+    """
+    value = get(key)
+    if value is not None:
+        return value
+
+    async def _fetch_and_store():
+        result = await fetch()
+        if result is not None:
+            if stale_ttl:
+                set(key, result, ttl, stale_ttl=stale_ttl)
+            else:
+                set(key, result, ttl)
+        return result
+
+    if stale_ttl:
+        stale = get_stale(key)
+        if stale is not None:
+            _counters.stale_hits += 1
+            _, created = _start_flight(key, _fetch_and_store)
+            _counters.refreshes += created
+            return stale
+    return await single_flight(key, _fetch_and_store)
+
+
+def sweep(now: Optional[float] = None) -> int:
+    """Borra las entradas caducadas de ambos niveles.
+
+    Retorna:
+    - int: número de entradas eliminadas.
+    """
+    now = time.time() if now is None else now
+    with _lock:
+        expired = [key for key, entry in _memory.items() if entry.expires <= now]
+        for key in expired:
+            _forget(key)
+        removed = _connection().execute("DELETE FROM cache WHERE expires <= ?", (now,)).rowcount
+        _counters.expirations += len(expired) + max(removed, 0)
+        return len(expired) + max(removed, 0)
+
+
+def stats() -> Dict[str, int]:
+    """Contadores de uso y ocupación de ambos niveles."""
+    with _lock:
+        disk_items, disk_bytes = _connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+        ).fetchone()
+        data = asdict(_counters)
+        data.update(
+            hits=_counters.memory_hits + _counters.disk_hits,
+            memory_items=len(_memory),
+            memory_bytes=_memory_bytes,
+            disk_items=disk_items,
+            disk_bytes=disk_bytes,
+        )
+        return data
+
+
+def close() -> None:
+    """Detiene el barrido y cierra la conexión persistente."""
+    global _db, _db_path
+    _stop.set()
+    with _lock:
+        if _db is not None:
+            _db.close()
+        _db = None
+        _db_path = None
+
+
+atexit.register(close)
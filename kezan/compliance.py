@@ -7,7 +7,7 @@ and never attempts client automation. Use the preamble in prompts and sanitize/v
 from __future__ import annotations
 
 import logging
-from typing import List
+from typing import AsyncIterable, AsyncIterator, List
 import re
 
 logger = logging.getLogger(__name__)
@@ -76,6 +76,22 @@ def sanitize_dsl_text(text: str) -> str:
     return replaced
 
 
+async def sanitize_dsl_stream(chunks: AsyncIterable[str]) -> AsyncIterator[str]:
+    """Apply :func:`sanitize_dsl_text` to streamed LLM output, one complete line at a time.
+
+    Tokens are buffered until a newline arrives so an action split across chunks
+    (``"BU"`` + ``"Y("``) is still rewritten; the trailing partial line is flushed at the end.
+    """
+    pending = ""
+    async for chunk in chunks:
+        pending += chunk
+        if "\n" in pending:
+            lines, _, pending = pending.rpartition("\n")
+            yield sanitize_dsl_text(lines + "\n")
+    if pending:
+        yield sanitize_dsl_text(pending)
+
+
 def detect_prohibited_actions(text: str) -> List[str]:
     """Return list of prohibited action tokens as standalone actions (e.g., BUY(, CRAFT().
 
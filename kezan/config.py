@@ -2,12 +2,20 @@
 Configuration module for Kezan Protocol.
 
 This module uses `python-dotenv` to load environment variables from a `.env` file.
-It exposes four configuration constants that can be overridden via environment variables:
+It exposes the following configuration constants, overridable via environment variables:
 
 - ``API_CLIENT_ID``: Blizzard API client ID.
 - ``API_CLIENT_SECRET``: Blizzard API client secret.
 - ``REGION``: Blizzard API region (e.g. "eu", "us").
 - ``REALM_ID``: Connected realm ID for auction data.
+- ``SCAN_REALMS``: Comma-separated connected realm IDs (and/or ``commodities``)
+  scanned by :class:`kezan.realm_scanner.RealmScanner`; defaults to ``REALM_ID``.
+- ``PROCESS_WORKERS``: worker processes used by :mod:`kezan.processing` to
+  parse, aggregate and scan full auction dumps for bargains (default ``1``);
+  ``0`` runs that work in a thread and keeps the streaming parser for
+  downloads.
+- ``BARGAIN_CAPITAL``: capital (copper) used to size bargain recommendations
+  computed for each new snapshot; ``0`` disables them.
 """
 
 import os
@@ -22,6 +30,14 @@ API_CLIENT_ID = os.getenv("BLIZZ_CLIENT_ID") or os.getenv("BLIZZARD_CLIENT_ID",
 API_CLIENT_SECRET = os.getenv("BLIZZ_CLIENT_SECRET") or os.getenv("BLIZZARD_CLIENT_SECRET", "")
 REGION = os.getenv("REGION", "eu")
 REALM_ID = os.getenv("REALM_ID", "1080")  # Ejemplo: Sanguino
+SCAN_REALMS = [
+    realm.strip() for realm in os.getenv("SCAN_REALMS", REALM_ID).split(",") if realm.strip()
+]
+
+# Procesos para parsear/agregar volcados completos (0 = parseo en streaming)
+PROCESS_WORKERS = int(os.getenv("PROCESS_WORKERS", "1") or 0)
+# Capital (cobre) con el que se dimensionan las gangas de cada snapshot
+BARGAIN_CAPITAL = float(os.getenv("BARGAIN_CAPITAL", "10000000") or 0)
 
 # Path where local LLM templates are stored
 LOCAL_MODELS_PATH = os.getenv(
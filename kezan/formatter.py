@@ -1,18 +1,22 @@
 """Ayudantes para preparar datos de items para modelos de lenguaje."""
 
-from kezan.item_resolver import resolve_item_name
+from typing import Dict, Optional
 
+from kezan.item_resolver import DEFAULT_LOCALE, resolve_item_name, resolve_item_names
 
-def format_for_ai(items: list) -> dict:
+
+def format_for_ai(items: list, names: Optional[Dict[int, str]] = None) -> dict:
     """Prepara datos de items para consumo por LLM.
 
     Garantiza nombres legibles utilizando un resolvedor que consulta la API de
-    Blizzard cuando es necesario.
+    Blizzard cuando es necesario. ``names`` permite pasar nombres ya
+    resueltos en bloque (ver :func:`format_page_for_ai`).
     """
+    names = names or {}
     return {
         "items": [
             {
-                "name": item.get("name") or resolve_item_name(item.get("id")),
+                "name": item.get("name") or names.get(item.get("id")) or resolve_item_name(item.get("id")),
                 "ah_price": round(item.get("ah_price", 0), 2),
                 "avg_sell_price": round(item.get("avg_sell_price", 0), 2),
                 "stack_size": item.get("stack_size", 1),
@@ -21,3 +25,10 @@ def format_for_ai(items: list) -> dict:
             for item in items
         ]
     }
+
+
+async def format_page_for_ai(items: list, locale: str = DEFAULT_LOCALE) -> dict:
+    """Como :func:`format_for_ai`, resolviendo los nombres de toda la página de una vez."""
+    pending = [item.get("id") for item in items if not item.get("name")]
+    names = await resolve_item_names(pending, locale) if pending else {}
+    return format_for_ai(items, names)
@@ -0,0 +1,286 @@
+"""Registro de clientes HTTP compartidos con pool de conexiones.
+
+Todas las llamadas salientes (API de Blizzard, LLM local, resolución de
+items) obtienen aquí su cliente en lugar de abrir uno nuevo por petición, de
+modo que las conexiones TCP/TLS se reutilizan (keep-alive) y, si ``h2`` está
+instalado, se multiplexan sobre HTTP/2.
+
+Hay un cliente por host (``esquema://host:puerto``) con sus propios límites
+de conexiones. Los clientes asíncronos quedan ligados al bucle de eventos que
+los creó y se registran por bucle (``WeakKeyDictionary``); cuando aparece un
+bucle nuevo, los clientes de bucles ya cerrados (por ejemplo entre llamadas a
+``asyncio.run``) se cierran en vez de abandonarse. :func:`pool_metrics` expone
+cuántas peticiones reutilizaron una conexión ya abierta y :func:`aclose_all`
+cierra todo al apagar la app, incluidos los clientes de otros bucles.
+"""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import importlib.util
+import threading
+import weakref
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, List, Optional
+
+import httpx
+
+from kezan.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_TIMEOUT = 10
+MAX_CONNECTIONS = 20
+MAX_KEEPALIVE_CONNECTIONS = 10
+KEEPALIVE_EXPIRY = 60.0
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_host_limits: Dict[str, httpx.Limits] = {}
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]" = (
+    weakref.WeakKeyDictionary()
+)
+_sync_clients: Dict[str, httpx.Client] = {}
+
+
+@dataclass
+class PoolMetrics:
+    """Contadores de uso del pool de un host."""
+
+    requests: int = 0
+    connections: int = 0
+    clients: int = 0
+
+    @property
+    def reused(self) -> int:
+        """Peticiones servidas sobre una conexión ya abierta."""
+        return max(self.requests - self.connections, 0)
+
+    def as_dict(self) -> Dict[str, float]:
+        data = asdict(self)
+        data["reused"] = self.reused
+        data["reuse_ratio"] = round(self.reused / self.requests, 4) if self.requests else 0.0
+        return data
+
+
+_metrics: Dict[str, PoolMetrics] = {}
+
+
+def host_key(url: str | httpx.URL) -> str:
+    """Normaliza una URL a la clave ``esquema://host:puerto`` de su pool."""
+    parsed = httpx.URL(url)
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    return f"{parsed.scheme}://{parsed.host}:{port}"
+
+
+def configure_host(
+    url: str,
+    max_connections: int = MAX_CONNECTIONS,
+    max_keepalive_connections: int = MAX_KEEPALIVE_CONNECTIONS,
+) -> None:
+    """Fija límites de conexiones propios para un host.
+
+    Se aplica a los clientes creados a partir de este momento.
+    """
+    _host_limits[host_key(url)] = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+def _limits(key: str) -> httpx.Limits:
+    return _host_limits.get(key) or httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+def _metrics_for(key: str) -> PoolMetrics:
+    metrics = _metrics.get(key)
+    if metrics is None:
+        metrics = _metrics[key] = PoolMetrics()
+    return metrics
+
+
+def _on_event(metrics: PoolMetrics, name: str) -> None:
+    # httpcore emite este evento sólo cuando abre una conexión nueva
+    if name == "connection.connect_tcp.complete":
+        metrics.connections += 1
+
+
+def _sync_hook(key: str):
+    metrics = _metrics_for(key)
+
+    def trace(name, info):
+        _on_event(metrics, name)
+
+    def hook(request: httpx.Request) -> None:
+        metrics.requests += 1
+        request.extensions.setdefault("trace", trace)
+
+    return hook
+
+
+def _async_hook(key: str):
+    metrics = _metrics_for(key)
+
+    async def trace(name, info):
+        _on_event(metrics, name)
+
+    async def hook(request: httpx.Request) -> None:
+        metrics.requests += 1
+        request.extensions.setdefault("trace", trace)
+
+    return hook
+
+
+def get_async_client(url: str) -> httpx.AsyncClient:
+    """Devuelve el cliente asíncrono compartido para el host de ``url``.
+
+    Debe llamarse desde una corrutina; el cliente no se cierra al terminar
+    la petición.
+    """
+    key = host_key(url)
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.get(loop)
+    if clients is None:
+        _release_closed_loops()
+        clients = _async_clients[loop] = {}
+        # Si el bucle se recolecta sin pasar por aclose_all, cerrar sus clientes
+        weakref.finalize(loop, _release, None, clients.values())
+    client = clients.get(key)
+    if client is not None and not client.is_closed:
+        return client
+    client = httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        limits=_limits(key),
+        timeout=DEFAULT_TIMEOUT,
+        event_hooks={"request": [_async_hook(key)]},
+    )
+    clients[key] = client
+    _metrics_for(key).clients += 1
+    logger.debug("Nuevo cliente HTTP para %s (http2=%s)", key, HTTP2_AVAILABLE)
+    return client
+
+
+async def _aclose_clients(clients: List[httpx.AsyncClient]) -> None:
+    for client in clients:
+        try:
+            await client.aclose()
+        except Exception as exc:  # pragma: no cover - cierre defensivo
+            logger.warning("Error al cerrar cliente HTTP: %s", exc)
+
+
+def _in_thread(fn, *args) -> concurrent.futures.Future:
+    future: concurrent.futures.Future = concurrent.futures.Future()
+
+    def run():
+        try:
+            future.set_result(fn(*args))
+        except BaseException as exc:  # pragma: no cover - se propaga al futuro
+            future.set_exception(exc)
+
+    threading.Thread(target=run, name="http-client-close", daemon=True).start()
+    return future
+
+
+def _release(
+    owner: Optional[asyncio.AbstractEventLoop], clients: Iterable[httpx.AsyncClient]
+) -> Optional[concurrent.futures.Future]:
+    """Cierra ``clients`` sin bloquear el bucle que llama.
+
+    Si su bucle ``owner`` sigue corriendo, el cierre se programa en él; si
+    está parado se ejecuta sobre ese bucle en un hilo aparte y, si ya se
+    cerró o se recolectó (``None``), en un bucle desechable (el cliente queda
+    marcado como cerrado y sus sockets se liberan al recolectarse).
+
+    Retorna:
+        Futuro concurrente del cierre, o ``None`` si no había nada que cerrar.
+    """
+    pending = [client for client in clients if not client.is_closed]
+    if not pending:
+        return None
+    if owner is not None and owner.is_running():
+        return asyncio.run_coroutine_threadsafe(_aclose_clients(pending), owner)
+    runner = asyncio.run if owner is None or owner.is_closed() else owner.run_until_complete
+    return _in_thread(runner, _aclose_clients(pending))
+
+
+def _release_closed_loops() -> None:
+    for owner in [loop for loop in list(_async_clients.keys()) if loop.is_closed()]:
+        clients = _async_clients.pop(owner, {})
+        _release(owner, clients.values())
+def get_client(url: str) -> httpx.Client:
+    """Devuelve el cliente síncrono compartido para el host de ``url``."""
+    key = host_key(url)
+    client = _sync_clients.get(key)
+    if client is None or client.is_closed:
+        client = httpx.Client(
+            http2=HTTP2_AVAILABLE,
+            limits=_limits(key),
+            timeout=DEFAULT_TIMEOUT,
+            event_hooks={"request": [_sync_hook(key)]},
+        )
+        _sync_clients[key] = client
+        _metrics_for(key).clients += 1
+    return client
+
+
+def pool_metrics() -> Dict[str, Dict[str, float]]:
+    """Métricas de reutilización del pool por host."""
+    return {key: metrics.as_dict() for key, metrics in _metrics.items()}
+
+
+def reset_metrics() -> None:
+    """Pone a cero los contadores (los clientes abiertos se conservan)."""
+    _metrics.clear()
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def close_all() -> None:
+    """Cierra los clientes síncronos y los asíncronos de cualquier bucle.
+
+    Espera (hasta ``DEFAULT_TIMEOUT``) a los cierres que no dependan del
+    bucle que llama; los de ese bucle quedan programados en él.
+    """
+    for client in _sync_clients.values():
+        client.close()
+    _sync_clients.clear()
+    current = _running_loop()
+    for owner, clients in list(_async_clients.items()):
+        future = _release(owner, clients.values())
+        if future is not None and owner is not current:
+            try:
+                future.result(timeout=DEFAULT_TIMEOUT)
+            except Exception as exc:  # pragma: no cover - cierre defensivo
+                logger.warning("Error al cerrar clientes HTTP: %s", exc)
+    _async_clients.clear()
+
+
+async def aclose_all() -> None:
+    """Cierra todos los clientes; pensado para el apagado de FastAPI.
+
+    Los clientes de este bucle se cierran directamente y los de otros bucles
+    sobre el suyo (ver :func:`_release`), esperando a que terminen.
+    """
+    loop = asyncio.get_running_loop()
+    owned = _async_clients.pop(loop, {})
+    await _aclose_clients([client for client in owned.values() if not client.is_closed])
+    futures = [_release(owner, clients.values()) for owner, clients in list(_async_clients.items())]
+    _async_clients.clear()
+    for future in futures:
+        if future is None:
+            continue
+        try:
+            await asyncio.wait_for(asyncio.wrap_future(future), DEFAULT_TIMEOUT)
+        except Exception as exc:  # pragma: no cover - cierre defensivo
+            logger.warning("Error al cerrar clientes HTTP: %s", exc)
+    close_all()
@@ -0,0 +1,272 @@
+"""Base de datos estática de items, importada offline y mapeada en memoria.
+
+Permite arrancar sin red: :func:`import_dump` convierte un volcado de items
+(JSON o CSV) en un almacén compacto por idioma bajo
+``~/.kezan/static_items/<locale>/``:
+
+- ``ids.npy``: IDs ordenados (búsqueda binaria).
+- ``offsets.npy``: desplazamientos en la tabla de cadenas; cada item ocupa
+  tres campos consecutivos (nombre, calidad, clase).
+- ``flags.npy``: bit 0 = apilable, bit 1 = commodity.
+- ``strings.bin``: cadenas UTF-8 concatenadas.
+
+Los ficheros se abren con ``mmap``, así que abrir el almacén no lee el
+volcado completo y varios procesos comparten las mismas páginas.
+``item_resolver`` lo consulta antes que la tabla SQLite y la API.
+
+Uso::
+
+    python -m kezan.item_db items.json --locale es_ES
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import mmap
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from kezan.logger import get_logger
+
+logger = get_logger(__name__)
+
+STATIC_DIR = Path(os.path.expanduser("~/.kezan")) / "static_items"
+FIELDS = 3  # nombre, calidad, clase
+STACKABLE = 1
+COMMODITY = 2
+
+# (nombre, calidad, clase, apilable, commodity)
+Record = Tuple[str, str, str, bool, bool]
+
+
+class StaticItemDB:
+    """Almacén de solo lectura con IDs ordenados y tabla de cadenas."""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.ids = np.load(self.directory / "ids.npy", mmap_mode="r")
+        self.offsets = np.load(self.directory / "offsets.npy", mmap_mode="r")
+        self.flags = np.load(self.directory / "flags.npy", mmap_mode="r")
+        self._file = open(self.directory / "strings.bin", "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._strings = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self) -> int:
+        return int(self.ids.shape[0])
+
+    def _string(self, k: int) -> str:
+        start, end = int(self.offsets[k]), int(self.offsets[k + 1])
+        return self._strings[start:end].decode("utf-8")
+
+    def _record(self, row: int) -> Record:
+        base = row * FIELDS
+        flags = int(self.flags[row])
+        return (
+            self._string(base),
+            self._string(base + 1),
+            self._string(base + 2),
+            bool(flags & STACKABLE),
+            bool(flags & COMMODITY),
+        )
+
+    def get(self, item_id: int) -> Optional[Record]:
+        """Ficha del item o ``None`` si no está en el volcado."""
+        return self.get_many([item_id]).get(int(item_id))
+
+    def get_many(self, item_ids: Iterable[int]) -> Dict[int, Record]:
+        """Fichas de los ``item_ids`` presentes (una búsqueda binaria vectorizada)."""
+        wanted = np.asarray(list(item_ids), dtype=np.int64)
+        if not wanted.size or not len(self):
+            return {}
+        rows = np.searchsorted(self.ids, wanted)
+        rows = np.minimum(rows, len(self) - 1)
+        hit = self.ids[rows] == wanted
+        return {int(i): self._record(int(r)) for i, r in zip(wanted[hit], rows[hit])}
+
+    def close(self) -> None:
+        """Libera el mapeo de la tabla de cadenas."""
+        if isinstance(self._strings, mmap.mmap):
+            self._strings.close()
+        self._file.close()
+
+
+# Almacén abierto por directorio junto a la marca de ``ids.npy`` con que se abrió
+_stores: Dict[Path, Tuple[Optional[Tuple[int, int]], Optional[StaticItemDB]]] = {}
+
+
+def store_dir(locale: str) -> Path:
+    """Directorio del almacén estático para ``locale``."""
+    return Path(STATIC_DIR) / locale
+
+
+def _stamp(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def get_store(locale: str) -> Optional[StaticItemDB]:
+    """Almacén de ``locale`` abierto una vez por proceso; ``None`` si no existe.
+
+    Se vuelve a abrir cuando cambia la marca (mtime, tamaño) de ``ids.npy``,
+    así que un almacén importado después de una consulta fallida (o por otro
+    proceso) se detecta sin reiniciar.
+    """
+    directory = store_dir(locale)
+    stamp = _stamp(directory / "ids.npy")
+    cached = _stores.get(directory)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    if cached is not None and cached[1] is not None:
+        cached[1].close()
+    store = None
+    if stamp is not None:
+        try:
+            store = StaticItemDB(directory)
+            logger.info("Base estática de items '%s' cargada (%d items)", locale, len(store))
+        except (OSError, ValueError) as exc:
+            logger.warning("Base estática de items '%s' ilegible: %s", locale, exc)
+    _stores[directory] = (stamp, store)
+    return store
+
+
+def close_stores() -> None:
+    """Cierra los almacenes abiertos (se reabrirán bajo demanda)."""
+    for _, store in _stores.values():
+        if store is not None:
+            store.close()
+    _stores.clear()
+
+
+# ----------------------------------------------------------------------
+# Importación
+# ----------------------------------------------------------------------
+def _text(value, locale: str, key: str = "") -> str:
+    """Extrae texto de valores planos, ``{"type"/"name": ...}`` o localizados."""
+    if isinstance(value, dict):
+        if key and key in value:
+            return _text(value[key], locale)
+        if locale in value:
+            return _text(value[locale], locale)
+        return ""
+    return "" if value is None else str(value)
+
+
+def _flag(value) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in {"1", "true", "yes", "si", "sí"}
+    return bool(value)
+
+
+def _parse_row(row: dict, locale: str) -> Optional[Tuple[int, Record]]:
+    try:
+        item_id = int(row.get("id") or row.get("item_id"))
+    except (TypeError, ValueError):
+        return None
+    name = _text(row.get("name"), locale)
+    if not name:
+        return None
+    stackable = _flag(row.get("stackable", row.get("is_stackable", False)))
+    commodity = _flag(row.get("commodity", row.get("is_commodity", stackable)))
+    return item_id, (
+        name,
+        _text(row.get("quality"), locale, "type"),
+        _text(row.get("item_class"), locale, "name"),
+        stackable,
+        commodity,
+    )
+
+
+def read_dump(path: Path, locale: str) -> Iterator[Tuple[int, Record]]:
+    """Lee un volcado JSON (lista de fichas o ``{id: nombre}``) o CSV con cabecera."""
+    path = Path(path)
+    if path.suffix.lower() == ".csv":
+        with open(path, newline="", encoding="utf-8") as fh:
+            rows: Iterable[dict] = list(csv.DictReader(fh))
+    else:
+        with open(path, encoding="utf-8") as fh:
+            data = json.load(fh)
+        if isinstance(data, dict) and "items" in data:
+            data = data["items"]
+        if isinstance(data, dict):
+            rows = ({"id": k, "name": v} for k, v in data.items())
+        else:
+            rows = data
+    for row in rows:
+        parsed = _parse_row(row, locale) if isinstance(row, dict) else None
+        if parsed is not None:
+            yield parsed
+
+
+def write_store(records: Dict[int, Record], directory: Path) -> None:
+    """Escribe el almacén de forma atómica (directorio temporal + renombrado)."""
+    directory = Path(directory)
+    tmp = directory.with_name(directory.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    ids = np.array(sorted(records), dtype=np.int64)
+    offsets: List[int] = [0]
+    flags = np.zeros(ids.size, dtype=np.uint8)
+    with open(tmp / "strings.bin", "wb") as fh:
+        for row, item_id in enumerate(ids.tolist()):
+            name, quality, item_class, stackable, commodity = records[item_id]
+            for field in (name, quality, item_class):
+                encoded = field.encode("utf-8")
+                fh.write(encoded)
+                offsets.append(offsets[-1] + len(encoded))
+            flags[row] = (STACKABLE if stackable else 0) | (COMMODITY if commodity else 0)
+    np.save(tmp / "ids.npy", ids)
+    np.save(tmp / "offsets.npy", np.array(offsets, dtype=np.int64))
+    np.save(tmp / "flags.npy", flags)
+
+    close_stores()  # liberar mapeos del almacén anterior antes de sustituirlo
+    old = directory.with_name(directory.name + ".old")
+    shutil.rmtree(old, ignore_errors=True)
+    if directory.exists():
+        directory.rename(old)
+    tmp.rename(directory)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def import_dump(path: Path, locale: str = "en_US") -> int:
+    """Importa un volcado de items al almacén estático de ``locale``.
+
+    Parámetros:
+    - path (Path): fichero JSON o CSV con al menos ``id`` y ``name``.
+    - locale (str): idioma de los nombres (también selecciona el texto en
+      volcados con nombres localizados ``{"es_ES": ...}``).
+
+    Retorna:
+    - int: número de items importados.
+    """
+    records = dict(read_dump(path, locale))
+    write_store(records, store_dir(locale))
+    logger.info("Importados %d items en la base estática '%s'", len(records), locale)
+    return len(records)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Punto de entrada de ``python -m kezan.item_db``."""
+    parser = argparse.ArgumentParser(description="Importa un volcado estático de items (JSON/CSV).")
+    parser.add_argument("dump", type=Path, help="fichero JSON o CSV con id y name")
+    parser.add_argument("--locale", default="en_US", help="idioma de los nombres (por defecto en_US)")
+    args = parser.parse_args(argv)
+    try:
+        count = import_dump(args.dump, args.locale)
+    except (OSError, ValueError, csv.Error) as exc:
+        logger.error("No se pudo importar el volcado: %s", exc)
+        return 1
+    print(f"{count} items importados en {store_dir(args.locale)}")
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())
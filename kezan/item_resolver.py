@@ -1,20 +1,191 @@
-"""Resuelve nombres legibles de items usando la API de Blizzard."""
+"""Resuelve nombres legibles de items usando la API de Blizzard.
+
+Los metadatos obtenidos (nombre, calidad, clase, si apila y si es commodity)
+se guardan en una tabla SQLite persistente (``~/.kezan/items.sqlite3``)
+indexada por ``(locale, item_id)``, de modo que cada item sólo se descarga
+una vez por idioma. :func:`resolve_items` resuelve una lista completa de IDs
+en una sola llamada: deduplica, consulta memoria y disco en bloque y descarga
+los que faltan en paralelo con concurrencia acotada. Si se importó un
+volcado estático (:mod:`kezan.item_db`), se consulta antes que nada.
+"""
 from __future__ import annotations
 
-from typing import Dict
+import asyncio
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import httpx
 
+from kezan import http_client, item_db
 from kezan.config import API_CLIENT_ID, API_CLIENT_SECRET, REGION
+from kezan.logger import get_logger
+
+logger = get_logger(__name__)
 
 _TOKEN_URL = f"https://{REGION}.battle.net/oauth/token"
 _ITEM_URL = f"https://{REGION}.api.blizzard.com/data/wow/item/{{item_id}}"
 _NAMESPACE = f"static-{REGION}"
 
+DEFAULT_LOCALE = "en_US"
+MAX_CONCURRENCY = 8  # descargas simultáneas de metadatos
+ITEMS_FILE = Path(os.path.expanduser("~/.kezan")) / "items.sqlite3"
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS items ("
+    "locale TEXT NOT NULL, item_id INTEGER NOT NULL, name TEXT NOT NULL, "
+    "quality TEXT, item_class TEXT, stackable INTEGER NOT NULL, commodity INTEGER NOT NULL, "
+    "PRIMARY KEY (locale, item_id))"
+)
+
 _token_cache: str | None = None
 _name_cache: Dict[int, str] = {}
 
 
+@dataclass(frozen=True)
+class ItemInfo:
+    """Metadatos estáticos de un item en un idioma."""
+
+    item_id: int
+    name: str
+    quality: str = ""
+    item_class: str = ""
+    stackable: bool = False
+    commodity: bool = False
+    locale: str = DEFAULT_LOCALE
+
+    @classmethod
+    def from_api(cls, item_id: int, data: dict, locale: str = DEFAULT_LOCALE) -> Optional["ItemInfo"]:
+        """Construye la ficha desde la respuesta de ``/data/wow/item``."""
+        name = data.get("name")
+        if not name:
+            return None
+        stackable = bool(data.get("is_stackable")) or int(data.get("max_count") or 0) > 1
+        return cls(
+            item_id=item_id,
+            name=name,
+            quality=(data.get("quality") or {}).get("type", ""),
+            item_class=(data.get("item_class") or {}).get("name", ""),
+            stackable=stackable,
+            # Los objetos apilables se venden en la casa de subastas regional
+            commodity=stackable,
+            locale=locale,
+        )
+
+
+# ----------------------------------------------------------------------
+# Tabla persistente de metadatos
+# ----------------------------------------------------------------------
+_db_lock = threading.RLock()
+_db: Optional[sqlite3.Connection] = None
+_db_path: Optional[Path] = None
+_items: Dict[Tuple[str, int], ItemInfo] = {}
+
+
+def _connection() -> sqlite3.Connection:
+    """Conexión a la tabla de metadatos, abierta una vez por fichero."""
+    global _db, _db_path
+    path = Path(ITEMS_FILE)
+    if _db is not None and _db_path == path:
+        return _db
+    if _db is not None:
+        _db.close()
+    _items.clear()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+    _db.execute("PRAGMA journal_mode=WAL")
+    _db.execute(_SCHEMA)
+    _db_path = path
+    return _db
+
+
+def load_items(item_ids: Iterable[int], locale: str = DEFAULT_LOCALE) -> Dict[int, ItemInfo]:
+    """Fichas conocidas para ``item_ids``; omite las ausentes.
+
+    Orden de consulta: memoria, base estática importada
+    (:mod:`kezan.item_db`) y tabla SQLite de items ya descargados.
+    """
+    found: Dict[int, ItemInfo] = {}
+    missing: List[int] = []
+    for item_id in item_ids:
+        info = _items.get((locale, item_id))
+        if info is None:
+            missing.append(item_id)
+        else:
+            found[item_id] = info
+    if not missing:
+        return found
+    store = item_db.get_store(locale)
+    if store is not None:
+        for item_id, record in store.get_many(missing).items():
+            info = ItemInfo(item_id, *record, locale=locale)
+            _items[(locale, item_id)] = info
+            found[item_id] = info
+        missing = [i for i in missing if i not in found]
+        if not missing:
+            return found
+    try:
+        with _db_lock:
+            db = _connection()
+            rows = []
+            for start in range(0, len(missing), 500):  # límite de parámetros de SQLite
+                chunk = missing[start:start + 500]
+                rows += db.execute(
+                    "SELECT item_id, name, quality, item_class, stackable, commodity FROM items "
+                    f"WHERE locale = ? AND item_id IN ({','.join('?' * len(chunk))})",
+                    (locale, *chunk),
+                ).fetchall()
+    except sqlite3.Error as exc:
+        logger.warning("No se pudo leer la tabla de items: %s", exc)
+        return found
+    for item_id, name, quality, item_class, stackable, commodity in rows:
+        info = ItemInfo(item_id, name, quality or "", item_class or "", bool(stackable), bool(commodity), locale)
+        _items[(locale, item_id)] = info
+        found[item_id] = info
+    return found
+
+
+def store_items(infos: Iterable[ItemInfo]) -> None:
+    """Guarda (o actualiza) fichas en memoria y en disco en una transacción."""
+    infos = list(infos)
+    if not infos:
+        return
+    for info in infos:
+        _items[(info.locale, info.item_id)] = info
+    try:
+        with _db_lock:
+            db = _connection()
+            with db:
+                db.executemany(
+                    "INSERT OR REPLACE INTO items "
+                    "(locale, item_id, name, quality, item_class, stackable, commodity) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (i.locale, i.item_id, i.name, i.quality, i.item_class, int(i.stackable), int(i.commodity))
+                        for i in infos
+                    ],
+                )
+    except sqlite3.Error as exc:
+        logger.warning("No se pudo guardar la tabla de items: %s", exc)
+
+
+def close() -> None:
+    """Cierra la conexión a la tabla de metadatos y vacía la memoria."""
+    global _db, _db_path
+    with _db_lock:
+        if _db is not None:
+            _db.close()
+        _db = None
+        _db_path = None
+        _items.clear()
+
+
+# ----------------------------------------------------------------------
+# API de Blizzard
+# ----------------------------------------------------------------------
 def _get_access_token() -> str:
     """Obtiene y cachea un token OAuth2 para la API de Blizzard."""
     global _token_cache
@@ -22,7 +193,7 @@ def _get_access_token() -> str:
         return _token_cache
     if not API_CLIENT_ID or not API_CLIENT_SECRET:
         raise RuntimeError("Las claves de la API de Blizzard no están configuradas.")
-    resp = httpx.post(
+    resp = http_client.get_client(_TOKEN_URL).post(
         _TOKEN_URL,
         data={"grant_type": "client_credentials"},
         auth=(API_CLIENT_ID, API_CLIENT_SECRET),
@@ -38,23 +209,93 @@ def _get_access_token() -> str:
 def resolve_item_name(item_id: int) -> str:
     """Devuelve el nombre legible del item indicado.
 
-    Si la solicitud falla, se devuelve "ItemID xxxx" como alternativa.
+    Consulta primero la tabla persistente; para varios items a la vez es
+    preferible :func:`resolve_item_names`. Si la solicitud falla, se
+    devuelve "ItemID xxxx" como alternativa.
     """
     if not item_id:
         return "ItemID unknown"
     if item_id in _name_cache:
         return _name_cache[item_id]
+    known = load_items([item_id]).get(item_id)
+    if known is not None:
+        _name_cache[item_id] = known.name
+        return known.name
     try:
         token = _get_access_token()
         headers = {"Authorization": f"Bearer {token}"}
-        params = {"namespace": _NAMESPACE, "locale": "en_US"}
+        params = {"namespace": _NAMESPACE, "locale": DEFAULT_LOCALE}
         url = _ITEM_URL.format(item_id=item_id)
-        resp = httpx.get(url, headers=headers, params=params, timeout=10)
+        resp = http_client.get_client(url).get(url, headers=headers, params=params, timeout=10)
         resp.raise_for_status()
-        name = resp.json().get("name")
-        if name:
-            _name_cache[item_id] = name
-            return name
+        info = ItemInfo.from_api(item_id, resp.json())
+        if info is not None:
+            store_items([info])
+            _name_cache[item_id] = info.name
+            return info.name
     except Exception:
         pass
     return f"ItemID {item_id}"
+
+
+async def _fetch_item(item_id: int, token: str, locale: str, limit: asyncio.Semaphore) -> Optional[ItemInfo]:
+    url = _ITEM_URL.format(item_id=item_id)
+    async with limit:
+        try:
+            resp = await http_client.get_async_client(url).get(
+                url,
+                headers={"Authorization": f"Bearer {token}"},
+                params={"namespace": _NAMESPACE, "locale": locale},
+                timeout=10,
+            )
+            resp.raise_for_status()
+            return ItemInfo.from_api(item_id, resp.json(), locale)
+        except (httpx.HTTPError, ValueError) as exc:
+            logger.debug("No se pudo resolver el item %s: %s", item_id, exc)
+            return None
+
+
+async def resolve_items(
+    item_ids: Iterable[int],
+    locale: str = DEFAULT_LOCALE,
+    concurrency: int = MAX_CONCURRENCY,
+) -> Dict[int, ItemInfo]:
+    """Resuelve los metadatos de varios items en una sola llamada.
+
+    Parámetros:
+    - item_ids (Iterable[int]): IDs a resolver; se ignoran duplicados y vacíos.
+    - locale (str): idioma de los nombres.
+    - concurrency (int): descargas simultáneas como máximo.
+
+    Retorna:
+    - dict: ``{item_id: ItemInfo}`` con los items resueltos; los que no se
+      pudieron obtener no aparecen.
+    """
+    wanted = list(dict.fromkeys(int(i) for i in item_ids if i))
+    found = load_items(wanted, locale)
+    missing = [i for i in wanted if i not in found]
+    if not missing:
+        return found
+    try:
+        token = _token_cache or await asyncio.to_thread(_get_access_token)
+    except (RuntimeError, httpx.HTTPError) as exc:
+        logger.warning("No se pueden descargar nombres de items: %s", exc)
+        return found
+
+    limit = asyncio.Semaphore(max(concurrency, 1))
+    fetched = await asyncio.gather(*(_fetch_item(i, token, locale, limit) for i in missing))
+    new = [info for info in fetched if info is not None]
+    store_items(new)
+    found.update((info.item_id, info) for info in new)
+    logger.debug("Items resueltos: %d en disco/memoria, %d descargados", len(wanted) - len(missing), len(new))
+    return found
+
+
+async def resolve_item_names(item_ids: Iterable[int], locale: str = DEFAULT_LOCALE) -> Dict[int, str]:
+    """Nombres legibles para ``item_ids``, con "ItemID xxxx" como alternativa."""
+    item_ids = list(item_ids)
+    infos = await resolve_items(item_ids, locale)
+    return {
+        item_id: infos[item_id].name if item_id in infos else (f"ItemID {item_id}" if item_id else "ItemID unknown")
+        for item_id in item_ids
+    }
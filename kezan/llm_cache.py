@@ -0,0 +1,274 @@
+"""Caché de respuestas del LLM direccionada por contenido.
+
+La inferencia local tarda segundos por llamada y muchos prompts se repiten
+byte a byte (mismo snapshot, mismo item observado, mismo tramo de
+historial). Cada respuesta se guarda bajo el SHA-256 de la petición
+canonicalizada: modelo, ``temperature``, ``top_p``, la versión del snapshot
+en curso y las entradas del prompt serializadas como JSON con claves
+ordenadas (los textos se normalizan colapsando espacios).
+
+La versión del snapshot se fija con :func:`snapshot_version` (un
+``ContextVar``, así que se hereda en las tareas creadas dentro del bloque):
+al llegar un snapshot nuevo las claves cambian y las respuestas anteriores
+dejan de servirse; además caducan a los ``LLM_CACHE_TTL`` segundos. Las
+entradas viven en memoria (LRU acotada) y en ``~/.kezan/llm_cache.sqlite3``.
+:func:`stats` expone aciertos, fallos y tasa de acierto.
+
+:func:`cached_call_async` es la variante para corrutinas: las peticiones
+idénticas simultáneas esperan a la primera en lugar de repetir la inferencia.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Tuple
+
+from kezan.logger import get_logger
+
+logger = get_logger(__name__)
+
+CACHE_FILE = Path(os.path.expanduser("~/.kezan")) / "llm_cache.sqlite3"
+DEFAULT_TTL = int(os.getenv("LLM_CACHE_TTL", "3600") or 0)  # 0 desactiva la caché
+MAX_MEMORY_ITEMS = 512
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS responses ("
+    "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+)
+
+_version: ContextVar[str] = ContextVar("kezan_llm_snapshot_version", default="")
+
+_lock = threading.RLock()
+_memory: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+_counters = {"hits": 0, "misses": 0, "stores": 0, "coalesced": 0}
+_db: Optional[sqlite3.Connection] = None
+_db_path: Optional[Path] = None
+_inflight: Dict[str, "asyncio.Future[Any]"] = {}
+
+
+@contextmanager
+def snapshot_version(version: Optional[str]) -> Iterator[None]:
+    """Asocia las llamadas al LLM del bloque con la versión de un snapshot."""
+    token = _version.set(version or "")
+    try:
+        yield
+    finally:
+        _version.reset(token)
+
+
+def canonical(value: Any) -> str:
+    """JSON canónico (claves ordenadas, sin espacios) de ``value``."""
+    if isinstance(value, str):
+        return json.dumps(" ".join(value.split()), ensure_ascii=False)
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def make_key(model: str, temperature: float, top_p: float, prompt: Any) -> str:
+    """Clave de caché de una petición.
+
+    Parámetros:
+    - model, temperature, top_p: parámetros de muestreo de la petición.
+    - prompt (Any): texto del prompt o, mejor, sus entradas estructuradas
+      (p. ej. ``{"task": ..., "item": ...}``) para que el orden de claves de
+      los diccionarios no afecte a la clave.
+
+    Retorna:
+    - str: SHA-256 hexadecimal; incluye la versión de snapshot en curso.
+    """
+    request = {
+        "model": model,
+        "temperature": float(temperature),
+        "top_p": float(top_p),
+        "snapshot": _version.get(),
+        "prompt": json.loads(canonical(prompt)),
+    }
+    return hashlib.sha256(canonical(request).encode("utf-8")).hexdigest()
+
+
+# ----------------------------------------------------------------------
+# Almacenamiento
+# ----------------------------------------------------------------------
+def _connection() -> sqlite3.Connection:
+    global _db, _db_path
+    path = Path(CACHE_FILE)
+    if _db is not None and _db_path == path:
+        return _db
+    if _db is not None:
+        _db.close()
+    _memory.clear()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+    _db.execute("PRAGMA journal_mode=WAL")
+    _db.execute(_SCHEMA)
+    _db_path = path
+    return _db
+
+
+def _remember(key: str, value: Any, expires: float) -> None:
+    _memory[key] = (value, expires)
+    _memory.move_to_end(key)
+    while len(_memory) > MAX_MEMORY_ITEMS:
+        _memory.popitem(last=False)
+
+
+def get(key: str) -> Optional[Any]:
+    """Respuesta cacheada para ``key`` o ``None`` si no existe o caducó."""
+    with _lock:
+        value = _lookup(key)
+        _counters["misses" if value is None else "hits"] += 1
+        return value
+
+
+def _lookup(key: str) -> Optional[Any]:
+    """Como :func:`get`, sin contar aciertos ni fallos."""
+    now = time.time()
+    with _lock:
+        entry = _memory.get(key)
+        if entry is None:
+            try:
+                row = _connection().execute(
+                    "SELECT value, expires FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error as exc:
+                logger.warning("No se pudo leer la caché del LLM: %s", exc)
+                row = None
+            if row is not None:
+                entry = (json.loads(row[0]), row[1])
+                _remember(key, *entry)
+        if entry is None or entry[1] <= now:
+            return None
+        _memory.move_to_end(key)
+        return entry[0]
+
+
+def put(key: str, value: Any, ttl: Optional[int] = None) -> None:
+    """Guarda una respuesta (texto o JSON serializable) durante ``ttl`` segundos."""
+    ttl = DEFAULT_TTL if ttl is None else ttl
+    if ttl <= 0:
+        return
+    expires = time.time() + ttl
+    with _lock:
+        _remember(key, value, expires)
+        _counters["stores"] += 1
+        try:
+            _connection().execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), expires),
+            )
+        except sqlite3.Error as exc:
+            logger.warning("No se pudo guardar en la caché del LLM: %s", exc)
+
+
+def cached_call(key: str, call: Callable[[], Any], ttl: Optional[int] = None) -> Any:
+    """Devuelve la respuesta cacheada o ejecuta ``call`` y guarda su resultado.
+
+    Si ``call`` lanza una excepción no se guarda nada.
+    """
+    value = get(key)
+    if value is None:
+        value = call()
+        put(key, value, ttl)
+    return value
+
+
+async def cached_call_async(key: str, call: Callable[[], Awaitable[Any]], ttl: Optional[int] = None) -> Any:
+    """Como :func:`cached_call` para corrutinas, con una sola inferencia por clave.
+
+    Si ya hay una llamada en curso con la misma ``key`` en este bucle se
+    espera su resultado (o su excepción) en lugar de lanzar otra; esas esperas
+    cuentan como aciertos y además en ``coalesced``.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        value = _lookup(key)
+        if value is not None:
+            _count("hits")
+            return value
+        pending = _inflight.get(key)
+        if pending is None or pending.get_loop() is not loop or pending.done():
+            break
+        try:
+            value = await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            if not pending.cancelled():
+                raise
+            # Se canceló la llamada que esperábamos, no ésta: reintentar
+        else:
+            _count("hits", "coalesced")
+            return value
+    _count("misses")
+    future = _inflight[key] = loop.create_future()
+    try:
+        value = await call()
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except BaseException as exc:
+        future.set_exception(exc)
+        future.exception()  # sin esperas pendientes no debe avisar como no recuperada
+        raise
+    else:
+        put(key, value, ttl)
+        future.set_result(value)
+        return value
+    finally:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+
+def _count(*names: str) -> None:
+    with _lock:
+        for name in names:
+            _counters[name] += 1
+
+
+def prune(now: Optional[float] = None) -> int:
+    """Borra las respuestas caducadas; retorna cuántas se eliminaron del disco."""
+    now = time.time() if now is None else now
+    with _lock:
+        for key in [k for k, (_, expires) in _memory.items() if expires <= now]:
+            del _memory[key]
+        return max(_connection().execute("DELETE FROM responses WHERE expires <= ?", (now,)).rowcount, 0)
+
+
+def clear() -> None:
+    """Vacía la caché y reinicia los contadores."""
+    with _lock:
+        _memory.clear()
+        _connection().execute("DELETE FROM responses")
+        for name in _counters:
+            _counters[name] = 0
+
+
+def stats() -> Dict[str, float]:
+    """Aciertos, fallos, respuestas guardadas, esperas agrupadas, tasa de acierto y entradas."""
+    with _lock:
+        lookups = _counters["hits"] + _counters["misses"]
+        data: Dict[str, float] = dict(_counters)
+        data["hit_rate"] = round(_counters["hits"] / lookups, 4) if lookups else 0.0
+        data["memory_items"] = len(_memory)
+        try:
+            data["disk_items"] = _connection().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        except sqlite3.Error:
+            data["disk_items"] = 0
+        return data
+
+
+def close() -> None:
+    """Cierra la conexión persistente y vacía la memoria."""
+    global _db, _db_path
+    with _lock:
+        if _db is not None:
+            _db.close()
+        _db = None
+        _db_path = None
+        _memory.clear()
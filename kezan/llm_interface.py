@@ -1,16 +1,23 @@
 """Interface para analizar datos mediante un LLM local."""
 
+import asyncio
 import json
 import os
 import time
 import logging
+import weakref
+from contextlib import aclosing, asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
 import httpx
 
+from kezan import http_client, llm_cache
 from kezan.config import LOCAL_MODELS_PATH, validate_local_model_path
-from kezan.compliance import advisory_preamble, sanitize_dsl_text
+from kezan.compliance import advisory_preamble, sanitize_dsl_stream, sanitize_dsl_text
+from kezan.market_optimizer import FallbackStrategy, LLMOptimizer
 
 # Configuración para el endpoint local del LLM
 LLM_API_URL = os.getenv(
@@ -21,9 +28,62 @@ LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.7"))
 LLM_TOP_P = float(os.getenv("LLM_TOP_P", "0.9"))
 # Opcional para LM Studio / servidores OpenAI-compatibles
 LLM_API_KEY = os.getenv("LLM_API_KEY", "")
+# Peticiones simultáneas al servidor local (p. ej. OLLAMA_NUM_PARALLEL)
+LLM_PARALLEL = int(os.getenv("LLM_PARALLEL", "4") or 1)
+# Tokens estimados de datos por prompt al analizar varios items a la vez
+LLM_BATCH_TOKENS = int(os.getenv("LLM_BATCH_TOKENS", "1500") or 1)
 
 logger = logging.getLogger(__name__)
 
+STRATEGY_FALLBACK = (
+    "Prioriza items con caídas recientes vs media y volumen alto; ajusta umbrales por volatilidad."
+)
+
+_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+_holding_slot: ContextVar[bool] = ContextVar("kezan_llm_slot", default=False)
+
+
+@asynccontextmanager
+async def llm_slot() -> AsyncIterator[None]:
+    """Reserva uno de los ``LLM_PARALLEL`` huecos de inferencia del bucle actual.
+
+    Todas las llamadas asíncronas al LLM pasan por aquí, así que nunca hay más
+    peticiones en vuelo que huecos tiene el servidor y el resto esperan en
+    cola. Es reentrante: dentro de un bloque que ya tiene hueco (también en
+    las tareas creadas desde él) no se vuelve a reservar.
+    """
+    if _holding_slot.get():
+        yield
+        return
+    loop = asyncio.get_running_loop()
+    slots = _slots.get(loop)
+    if slots is None:
+        slots = _slots[loop] = asyncio.Semaphore(max(LLM_PARALLEL, 1))
+    async with slots:
+        token = _holding_slot.set(True)
+        try:
+            yield
+        finally:
+            _holding_slot.reset(token)
+
+
+@dataclass
+class MarketBatch:
+    """Grupo de items que se analizan con un único prompt.
+
+    ``entries`` son los elementos de :meth:`LLMOptimizer.chunk_market_data`
+    (``{'id', 'current', 'history'}``) y ``keys`` la clave de caché
+    individual de cada item, la misma que usa
+    :meth:`LLMInterface.analyze_market_opportunity`.
+    """
+
+    entries: List[Dict] = field(default_factory=list)
+    keys: Dict[int, str] = field(default_factory=dict)
+
+    @property
+    def item_ids(self) -> List[int]:
+        return [entry["id"] for entry in self.entries]
+
 
 def load_model_template(name: str) -> None:
     """Load a local IA template and update runtime configuration."""
@@ -53,25 +113,17 @@ def load_model_template(name: str) -> None:
     LLM_TOP_P = float(data.get("top_p", LLM_TOP_P))
 
 
-def analyze_items_with_llm(data: List[Dict]) -> str:
-    """Envía datos de subasta a un LLM local para su análisis.
-
-    Parámetros:
-    - data (List[Dict]): lista de items formateados para la IA.
+def _generate(prompt: str, label: str, cache_inputs: Dict) -> str:
+    """Envía ``prompt`` al LLM local y devuelve el texto saneado.
 
-    Retorna:
-    - str: recomendación generada por el modelo.
-
-    Lanza:
-    - RuntimeError: si el modelo no responde o la respuesta es inválida.
+    La respuesta se cachea por contenido (ver :mod:`kezan.llm_cache`) usando
+    ``cache_inputs`` como entradas canónicas del prompt.
     """
-    prompt = (
-        advisory_preamble() + "\n" +
-        "Eres un asistente experto en el mercado de World of Warcraft. "
-        "Analiza los siguientes items y recomienda las mejores compras "
-        "en Español (modo asesor). Devuelve recomendaciones en DSL permitido y breve explicación.\n"
-        f"{json.dumps(data, ensure_ascii=False)}"
-    )
+    key = llm_cache.make_key(LLM_MODEL, LLM_TEMPERATURE, LLM_TOP_P, cache_inputs)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        logger.info("%s served from cache", label)
+        return cached
 
     payload = {
         "model": LLM_MODEL,
@@ -83,7 +135,7 @@ def analyze_items_with_llm(data: List[Dict]) -> str:
 
     try:
         start = time.perf_counter()
-        response = httpx.post(LLM_API_URL, json=payload, timeout=30)
+        response = http_client.get_client(LLM_API_URL).post(LLM_API_URL, json=payload, timeout=30)
         elapsed = time.perf_counter() - start
         response.raise_for_status()
         try:
@@ -92,12 +144,118 @@ def analyze_items_with_llm(data: List[Dict]) -> str:
             raise RuntimeError("Respuesta inválida del modelo de IA") from exc
         if not content:
             raise RuntimeError("Respuesta vacía del modelo de IA.")
-        logger.info("LLM analysis took %.2fs", elapsed)
+        logger.info("%s took %.2fs", label, elapsed)
+    except httpx.HTTPError as exc:
+        raise RuntimeError(
+            "El modelo de IA local no está activo o no responde."
+        ) from exc
+    content = sanitize_dsl_text(content)
+    llm_cache.put(key, content)
+    return content
+
+
+async def _generate_async(prompt: str, label: str, cache_inputs: Dict) -> str:
+    """Versión asíncrona de :func:`_generate`.
+
+    Usa el cliente HTTP compartido y un hueco de :func:`llm_slot`, así que no
+    bloquea el bucle de eventos mientras el modelo genera. Comparte caché con
+    la versión síncrona y las peticiones idénticas simultáneas se resuelven
+    con una sola inferencia.
+    """
+    key = llm_cache.make_key(LLM_MODEL, LLM_TEMPERATURE, LLM_TOP_P, cache_inputs)
+
+    async def call() -> str:
+        start = time.perf_counter()
+        try:
+            content = await LLMInterface()._post_async(prompt, timeout=30)
+        except httpx.HTTPError as exc:
+            raise RuntimeError(
+                "El modelo de IA local no está activo o no responde."
+            ) from exc
+        except ValueError as exc:
+            raise RuntimeError("Respuesta inválida del modelo de IA") from exc
+        if not content:
+            raise RuntimeError("Respuesta vacía del modelo de IA.")
+        logger.info("%s took %.2fs", label, time.perf_counter() - start)
         return sanitize_dsl_text(content)
+
+    return await llm_cache.cached_call_async(key, call)
+
+
+def _items_prompt(data: List[Dict]) -> Tuple[str, Dict]:
+    """Prompt de recomendación de compras y sus entradas canónicas para la caché."""
+    preamble = advisory_preamble()
+    prompt = (
+        preamble + "\n" +
+        "Eres un asistente experto en el mercado de World of Warcraft. "
+        "Analiza los siguientes items y recomienda las mejores compras "
+        "en Español (modo asesor). Devuelve recomendaciones en DSL permitido y breve explicación.\n"
+        f"{json.dumps(data, ensure_ascii=False)}"
+    )
+    return prompt, {"task": "items", "preamble": preamble, "data": data}
+
+
+def analyze_items_with_llm(data: List[Dict]) -> str:
+    """Envía datos de subasta a un LLM local para su análisis.
+
+    Parámetros:
+    - data (List[Dict]): lista de items formateados para la IA.
+
+    Retorna:
+    - str: recomendación generada por el modelo.
+
+    Lanza:
+    - RuntimeError: si el modelo no responde o la respuesta es inválida.
+    """
+    prompt, cache_inputs = _items_prompt(data)
+    return _generate(prompt, "LLM analysis", cache_inputs)
+
+
+async def analyze_items_with_llm_async(data: List[Dict]) -> str:
+    """Versión asíncrona de :func:`analyze_items_with_llm` (mismos errores y caché)."""
+    prompt, cache_inputs = _items_prompt(data)
+    return await _generate_async(prompt, "LLM analysis", cache_inputs)
+
+
+async def stream_items_with_llm(data: List[Dict]) -> AsyncIterator[str]:
+    """Versión en streaming de :func:`analyze_items_with_llm`.
+
+    Emite el texto según lo genera el modelo, saneado por líneas completas
+    (:func:`~kezan.compliance.sanitize_dsl_stream`). Comparte caché con la
+    versión síncrona: una respuesta cacheada se emite de una vez y una
+    generación completa se guarda al terminar.
+
+    Parámetros:
+    - data (List[Dict]): lista de items formateados para la IA.
+
+    Retorna:
+    - AsyncIterator[str]: fragmentos de la recomendación.
+
+    Lanza:
+    - RuntimeError: si el modelo no responde o la respuesta está vacía.
+    """
+    prompt, cache_inputs = _items_prompt(data)
+    key = llm_cache.make_key(LLM_MODEL, LLM_TEMPERATURE, LLM_TOP_P, cache_inputs)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        logger.info("LLM analysis served from cache")
+        yield cached
+        return
+
+    parts: List[str] = []
+    try:
+        async with aclosing(sanitize_dsl_stream(LLMInterface().stream_text(prompt))) as chunks:
+            async for chunk in chunks:
+                parts.append(chunk)
+                yield chunk
     except httpx.HTTPError as exc:
         raise RuntimeError(
             "El modelo de IA local no está activo o no responde."
         ) from exc
+    content = "".join(parts).strip()
+    if not content:
+        raise RuntimeError("Respuesta vacía del modelo de IA.")
+    llm_cache.put(key, content)
 
 
 def analyze_recipes_with_llm(
@@ -112,8 +270,23 @@ def analyze_recipes_with_llm(
     Retorna:
     - str: texto de recomendación generado por el modelo.
     """
+    prompt, cache_inputs = _recipes_prompt(data, inventory)
+    return _generate(prompt, "LLM recipe analysis", cache_inputs)
+
+
+async def analyze_recipes_with_llm_async(
+    data: List[Dict], inventory: Optional[List[int]] = None
+) -> str:
+    """Versión asíncrona de :func:`analyze_recipes_with_llm` (mismos errores y caché)."""
+    prompt, cache_inputs = _recipes_prompt(data, inventory)
+    return await _generate_async(prompt, "LLM recipe analysis", cache_inputs)
+
+
+def _recipes_prompt(data: List[Dict], inventory: Optional[List[int]]) -> Tuple[str, Dict]:
+    """Prompt de recomendación de crafteos y sus entradas canónicas para la caché."""
+    preamble = advisory_preamble()
     prompt = (
-        advisory_preamble() + "\n" +
+        preamble + "\n" +
         "Eres un maestro artesano de World of Warcraft. Analiza las "
         "siguientes recetas y recomienda los crafteos más rentables en "
         "Español (modo asesor). Devuelve DSL permitido y breve explicación.\n"
@@ -124,32 +297,7 @@ def analyze_recipes_with_llm(
             "\nTen en cuenta que ya poseo en mi inventario: "
             f"{inventory}."
         )
-
-    payload = {
-        "model": LLM_MODEL,
-        "prompt": prompt,
-        "stream": False,
-        "temperature": LLM_TEMPERATURE,
-        "top_p": LLM_TOP_P,
-    }
-
-    try:
-        start = time.perf_counter()
-        response = httpx.post(LLM_API_URL, json=payload, timeout=30)
-        elapsed = time.perf_counter() - start
-        response.raise_for_status()
-        try:
-            content = response.json().get("response", "").strip()
-        except (ValueError, KeyError) as exc:
-            raise RuntimeError("Respuesta inválida del modelo de IA") from exc
-        if not content:
-            raise RuntimeError("Respuesta vacía del modelo de IA.")
-        logger.info("LLM recipe analysis took %.2fs", elapsed)
-        return sanitize_dsl_text(content)
-    except httpx.HTTPError as exc:  # pragma: no cover - network errors
-        raise RuntimeError(
-            "El modelo de IA local no está activo o no responde."
-        ) from exc
+    return prompt, {"task": "recipes", "preamble": preamble, "data": data, "inventory": inventory or []}
 
 
 class LLMInterface:
@@ -165,6 +313,12 @@ class LLMInterface:
     def analyze_recipes(self, data: List[Dict], inventory: Optional[List[int]] = None) -> str:
         return analyze_recipes_with_llm(data, inventory)
 
+    async def analyze_items_async(self, data: List[Dict]) -> str:
+        return await analyze_items_with_llm_async(data)
+
+    async def analyze_recipes_async(self, data: List[Dict], inventory: Optional[List[int]] = None) -> str:
+        return await analyze_recipes_with_llm_async(data, inventory)
+
     async def analyze_intent(self, query: str) -> dict:
         """Analiza la intención del usuario y retorna un dict seguro.
 
@@ -228,47 +382,266 @@ class LLMInterface:
             logger.error("Error en scan_auction_house: %s", exc)
             return []
 
-    def suggest_search_strategy(self, item_history: List[Dict], market_trends: List[Dict], game_version: str) -> str:
-        """Sugerir estrategia (método síncrono para compatibilidad actual)."""
+    def _cache_key(self, inputs: Dict) -> str:
+        """Clave de caché de una petición con los parámetros de esta instancia."""
+        return llm_cache.make_key(self.model, self.temperature, self.top_p, inputs)
+
+    def _strategy_prompt(self, item_history: List[Dict], market_trends: List[Dict], game_version: str) -> Tuple[str, str]:
+        """Prompt de estrategia de búsqueda y su clave de caché."""
+        preamble = advisory_preamble()
         prompt = (
-            advisory_preamble() + "\n" +
+            preamble + "\n" +
             "Propón una estrategia breve de búsqueda basada en histórico y tendencias (modo asesor).\n"
             f"Version: {game_version}\n"
             f"Histórico: {json.dumps(item_history[-10:], ensure_ascii=False)}\n"
             f"Tendencias: {json.dumps(market_trends[-10:], ensure_ascii=False)}\n"
             "Responde en 2-3 frases concisas."
         )
+        key = self._cache_key({
+            "task": "search_strategy",
+            "preamble": preamble,
+            "version": game_version,
+            "history": item_history[-10:],
+            "trends": market_trends[-10:],
+        })
+        return prompt, key
+
+    def suggest_search_strategy(self, item_history: List[Dict], market_trends: List[Dict], game_version: str) -> str:
+        """Sugerir estrategia (método síncrono para compatibilidad actual)."""
+        prompt, key = self._strategy_prompt(item_history, market_trends, game_version)
+        try:
+            return llm_cache.cached_call(key, lambda: self._post_sync(prompt))
+        except Exception as exc:
+            logger.warning("Fallback suggest_search_strategy por error: %s", exc)
+            return STRATEGY_FALLBACK
+
+    async def suggest_search_strategy_async(
+        self, item_history: List[Dict], market_trends: List[Dict], game_version: str
+    ) -> str:
+        """Versión asíncrona de :meth:`suggest_search_strategy` (misma caché y fallback)."""
+        prompt, key = self._strategy_prompt(item_history, market_trends, game_version)
         try:
-            return self._post_sync(prompt)
+            return await llm_cache.cached_call_async(key, lambda: self._post_async(prompt, timeout=20))
         except Exception as exc:
             logger.warning("Fallback suggest_search_strategy por error: %s", exc)
-            return "Prioriza items con caídas recientes vs media y volumen alto; ajusta umbrales por volatilidad."
+            return STRATEGY_FALLBACK
 
     async def analyze_market_opportunity(self, item_data: Dict, historical_prices: List[Dict]) -> Dict:
-        """Analiza oportunidad de mercado y devuelve dict estructurado o fallback."""
+        """Analiza oportunidad de mercado y devuelve dict estructurado o fallback.
+
+        Sólo se cachean las respuestas JSON válidas.
+        """
+        preamble = advisory_preamble()
         prompt = (
-            advisory_preamble() + "\n" +
+            preamble + "\n" +
             "Eres un analista de subastas. Analiza la siguiente oportunidad de mercado con foco práctico.\n"
             "Devuelve SOLO JSON con las claves: analysis (string), opportunity (bool), reason (string).\n\n"
             f"Datos actuales: {json.dumps(item_data, ensure_ascii=False)}\n"
             f"Historial: {json.dumps(historical_prices[-10:], ensure_ascii=False)}"
         )
+        key = self._opportunity_key(preamble, item_data, historical_prices[-10:])
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return cached
         try:
             content = await self._post_async(prompt)
             data = json.loads(content)
             if isinstance(data, dict):
+                llm_cache.put(key, data)
                 return data
             return {"analysis": content or "", "opportunity": False, "reason": "unparsed"}
         except Exception as exc:
             logger.error("Error en analyze_market_opportunity: %s", exc)
             return {"analysis": "", "opportunity": False, "reason": str(exc)}
 
+    def _opportunity_key(self, preamble: str, item_data: Dict, history: List[Dict]) -> str:
+        return self._cache_key({
+            "task": "market_opportunity",
+            "preamble": preamble,
+            "item": item_data,
+            "history": history,
+        })
+
+    def plan_market_batches(
+        self,
+        items: Dict[int, Dict],
+        histories: Optional[Dict[int, List[Dict]]] = None,
+        max_tokens: Optional[int] = None,
+    ) -> Tuple[Dict[int, Dict], List[MarketBatch]]:
+        """Agrupa items en prompts de hasta ``max_tokens`` tokens estimados.
+
+        Parámetros:
+        - items (Dict[int, Dict]): datos actuales de cada item (como el
+          ``item_data`` de :meth:`analyze_market_opportunity`).
+        - histories (Dict[int, List[Dict]] | None): historial por item; se
+          usan los 10 últimos puntos.
+        - max_tokens (int | None): presupuesto por prompt (``LLM_BATCH_TOKENS``).
+
+        Retorna:
+        - Tuple[Dict[int, Dict], List[MarketBatch]]: análisis ya cacheados
+          (por item, compartidos con el análisis individual) y los grupos
+          que faltan por consultar.
+        """
+        histories = histories or {}
+        preamble = advisory_preamble()
+        cached: Dict[int, Dict] = {}
+        pending: Dict[int, Dict] = {}
+        keys: Dict[int, str] = {}
+        for item_id, item_data in items.items():
+            history = histories.get(item_id, [])[-10:]
+            key = self._opportunity_key(preamble, item_data, history)
+            hit = llm_cache.get(key)
+            if hit is not None:
+                cached[item_id] = hit
+                continue
+            pending[item_id] = {"current": item_data, "history": history}
+            keys[item_id] = key
+        optimizer = LLMOptimizer(max_tokens or LLM_BATCH_TOKENS)
+        batches = [
+            MarketBatch(chunk["items"], {entry["id"]: keys[entry["id"]] for entry in chunk["items"]})
+            for chunk in optimizer.chunk_market_data({"summary": pending})
+        ]
+        return cached, batches
+
+    async def run_market_batch(
+        self,
+        batch: MarketBatch,
+        stats: Optional[Dict[int, Dict]] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[int, Dict]:
+        """Analiza un grupo de items con un solo prompt.
+
+        La respuesta debe ser un array JSON con un objeto por item
+        (``item_id``, ``analysis``, ``opportunity``, ``reason``). Cada objeto
+        válido se cachea con la clave individual del item; los items que
+        faltan o vienen mal formados reciben el análisis de
+        :class:`~kezan.market_optimizer.FallbackStrategy` a partir de
+        ``stats`` (``min_price``, ``max_price``, ``mean_price``,
+        ``std_price``, ``total_listings``).
+
+        Parámetros:
+        - batch (MarketBatch): grupo creado por :meth:`plan_market_batches`.
+        - stats (Dict[int, Dict] | None): estadísticas por item para el fallback.
+        - timeout (float | None): segundos máximos de la inferencia.
+
+        Retorna:
+        - Dict[int, Dict]: análisis por item, con las claves de
+          :meth:`analyze_market_opportunity`.
+        """
+        stats = stats or {}
+        prompt = (
+            advisory_preamble() + "\n" +
+            "Eres un analista de subastas. Analiza cada una de las siguientes oportunidades de mercado con foco práctico.\n"
+            "Devuelve SOLO un array JSON con un objeto por item y las claves: "
+            "item_id (int), analysis (string), opportunity (bool), reason (string).\n\n"
+            f"Items: {json.dumps(batch.entries, ensure_ascii=False)}"
+        )
+        reason = "fallback"
+        parsed: Dict[int, Dict] = {}
+        try:
+            content = await asyncio.wait_for(self._post_async(prompt, timeout=45), timeout)
+            parsed = self._split_batch_response(content, batch.item_ids)
+        except asyncio.TimeoutError:
+            reason = "timeout"
+        except Exception as exc:
+            logger.error("Error en run_market_batch: %s", exc)
+
+        results: Dict[int, Dict] = {}
+        for item_id in batch.item_ids:
+            analysis = parsed.get(item_id)
+            if analysis is None:
+                analysis = self._fallback_opportunity(item_id, stats.get(item_id), reason)
+            else:
+                llm_cache.put(batch.keys[item_id], analysis)
+            results[item_id] = analysis
+        if len(parsed) < len(results):
+            logger.warning(
+                "Análisis por lotes: %d de %d items con fallback (%s)",
+                len(results) - len(parsed), len(results), reason,
+            )
+        return results
+
+    async def analyze_market_batch(
+        self,
+        items: Dict[int, Dict],
+        histories: Optional[Dict[int, List[Dict]]] = None,
+        stats: Optional[Dict[int, Dict]] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[int, Dict]:
+        """Analiza varios items agrupándolos en el menor número de prompts.
+
+        Equivale a llamar a :meth:`analyze_market_opportunity` por cada item,
+        pero el preámbulo y el arranque del modelo se pagan una vez por grupo.
+        """
+        results, batches = self.plan_market_batches(items, histories)
+        for done in await asyncio.gather(*(self.run_market_batch(b, stats, timeout) for b in batches)):
+            results.update(done)
+        return results
+
+    @staticmethod
+    def _split_batch_response(content: str, item_ids: List[int]) -> Dict[int, Dict]:
+        """Separa la respuesta de un lote en análisis válidos por item.
+
+        Acepta el array suelto, dentro de ``{"items": [...]}`` o rodeado de
+        texto; descarta objetos de items no pedidos, repetidos o sin
+        ``analysis`` (str) y ``opportunity`` (bool).
+        """
+        try:
+            data = json.loads(content)
+        except (TypeError, ValueError):
+            start, end = (content or "").find("["), (content or "").rfind("]")
+            if start < 0 or end <= start:
+                return {}
+            try:
+                data = json.loads(content[start:end + 1])
+            except ValueError:
+                return {}
+        if isinstance(data, dict):
+            data = data.get("items")
+        if not isinstance(data, list):
+            return {}
+        wanted = set(item_ids)
+        parsed: Dict[int, Dict] = {}
+        for entry in data:
+            if not isinstance(entry, dict):
+                continue
+            try:
+                item_id = int(entry.get("item_id"))
+            except (TypeError, ValueError):
+                continue
+            if item_id not in wanted or item_id in parsed:
+                continue
+            if not isinstance(entry.get("analysis"), str) or not isinstance(entry.get("opportunity"), bool):
+                continue
+            reason = entry.get("reason", "")
+            parsed[item_id] = {
+                "analysis": entry["analysis"],
+                "opportunity": entry["opportunity"],
+                "reason": reason if isinstance(reason, str) else str(reason),
+            }
+        return parsed
+
+    @staticmethod
+    def _fallback_opportunity(item_id: int, stats: Optional[Dict], reason: str) -> Dict:
+        """Análisis por reglas de un item que el LLM no devolvió."""
+        result = {"analysis": "", "opportunity": False, "reason": reason}
+        if not stats:
+            return result
+        basic = FallbackStrategy().get_fallback_analysis({"summary": {item_id: stats}})
+        result["analysis"] = "; ".join(r["message"] for r in basic.get("simple_recommendations", []))
+        if item_id in basic.get("basic_stats", {}):
+            result["basic_stats"] = basic["basic_stats"][item_id]
+        return result
+
     def _is_openai_style(self) -> bool:
         """Heurística simple: si la URL contiene /v1/ asumimos OpenAI-compatible (LM Studio)."""
         return "/v1/" in (self.api_url or "")
 
-    def _build_payload_headers(self, prompt: str) -> Dict:
-        """Construye payload y headers según tipo de servidor (Ollama vs OpenAI)."""
+    def _build_payload_headers(self, prompt: str, stream: bool = False) -> Dict:
+        """Construye payload y headers según tipo de servidor (Ollama vs OpenAI).
+
+        Con ``stream`` el servidor responde NDJSON (Ollama) o SSE (OpenAI).
+        """
         headers = {}
         if self._is_openai_style():
             if LLM_API_KEY:
@@ -278,13 +651,13 @@ class LLMInterface:
                 "messages": [{"role": "user", "content": prompt}],
                 "temperature": self.temperature,
                 "top_p": self.top_p,
-                "stream": False,
+                "stream": stream,
             }
         else:
             payload = {
                 "model": self.model,
                 "prompt": prompt,
-                "stream": False,
+                "stream": stream,
                 "temperature": self.temperature,
                 "top_p": self.top_p,
             }
@@ -308,10 +681,78 @@ class LLMInterface:
             return ""
         return ""
 
+    @staticmethod
+    def _parse_stream_line(line: str) -> Tuple[str, bool]:
+        """Texto y fin de generación de una línea NDJSON (Ollama) o SSE (OpenAI).
+
+        Las líneas vacías, comentarios SSE y líneas no JSON se ignoran.
+
+        Lanza:
+        - RuntimeError: si Ollama informa de un error en mitad del stream.
+        """
+        line = line.strip()
+        if not line or line.startswith(":"):
+            return "", False
+        if line.startswith("data:"):
+            data = line[5:].strip()
+            if data == "[DONE]":
+                return "", True
+            try:
+                first = (json.loads(data).get("choices") or [{}])[0]
+            except (ValueError, AttributeError):
+                return "", False
+            text = (first.get("delta") or {}).get("content") or first.get("text") or ""
+            return text, first.get("finish_reason") is not None
+        try:
+            data = json.loads(line)
+        except ValueError:
+            return "", False
+        if not isinstance(data, dict):
+            return "", False
+        if data.get("error"):
+            raise RuntimeError(f"Error del modelo de IA: {data['error']}")
+        return data.get("response") or "", bool(data.get("done"))
+
+    async def stream_text(self, prompt: str, timeout: int = 60) -> AsyncIterator[str]:
+        """Envía ``prompt`` en modo streaming y emite el texto según llega.
+
+        Ocupa un hueco de :func:`llm_slot` hasta que termina la generación.
+        El texto se emite sin sanear (ver :func:`~kezan.compliance.sanitize_dsl_stream`).
+
+        Lanza:
+        - httpx.HTTPError: si el servidor no responde o devuelve un error.
+        """
+        cfg = self._build_payload_headers(prompt, stream=True)
+        client = http_client.get_async_client(self.api_url)
+        start = time.perf_counter()
+        first_token = None
+        async with llm_slot():
+            async with client.stream(
+                "POST",
+                self.api_url,
+                json=cfg["payload"],
+                headers=cfg["headers"],
+                timeout=timeout,
+            ) as resp:
+                resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    text, done = self._parse_stream_line(line)
+                    if text:
+                        if first_token is None:
+                            first_token = time.perf_counter() - start
+                        yield text
+                    if done:
+                        break
+        logger.info(
+            "LLM stream took %.2fs (first token %.2fs)",
+            time.perf_counter() - start, first_token or 0.0,
+        )
+
     async def _post_async(self, prompt: str, timeout: int = 30) -> str:
         cfg = self._build_payload_headers(prompt)
         start = time.perf_counter()
-        async with httpx.AsyncClient() as client:
+        client = http_client.get_async_client(self.api_url)
+        async with llm_slot():
             resp = await client.post(
                 self.api_url,
                 json=cfg["payload"],
@@ -326,7 +767,7 @@ class LLMInterface:
 
     def _post_sync(self, prompt: str, timeout: int = 20) -> str:
         cfg = self._build_payload_headers(prompt)
-        resp = httpx.post(
+        resp = http_client.get_client(self.api_url).post(
             self.api_url,
             json=cfg["payload"],
             headers=cfg["headers"],
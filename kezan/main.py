@@ -1,8 +1,19 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from kezan import http_client
 from kezan.routes import profile_routes
 
-app = FastAPI(title="Kezan Protocol API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Cerrar el pool de conexiones HTTP compartido
+    await http_client.aclose_all()
+
+
+app = FastAPI(title="Kezan Protocol API", lifespan=lifespan)
 
 # Configurar CORS
 app.add_middleware(
@@ -1,6 +1,7 @@
 from typing import List, Dict, Optional
 from typing import Any
 from datetime import datetime, timedelta
+import asyncio
 import json
 from pathlib import Path
 import logging
@@ -19,6 +20,165 @@ def _ensure_np() -> Any:
         np = _np
     return np
 
+
+def _is_snapshot(data: Any) -> bool:
+    # Detección por atributos para no importar ``kezan.snapshot`` (y NumPy)
+    # al cargar este módulo.
+    return hasattr(data, "starts") and hasattr(data, "unit_price")
+
+
+def _item_stats_from_auctions(raw_data: List[Dict]) -> Dict:
+    """Agrupa precios y cantidades por item a partir de la lista de la API."""
+    item_stats = {}
+    for auction in raw_data:
+        item_id = auction['item']['id']
+        price = auction['unit_price']
+
+        if item_id not in item_stats:
+            item_stats[item_id] = {
+                'prices': [],
+                'count': 0,
+                'total_quantity': 0
+            }
+
+        item_stats[item_id]['prices'].append(price)
+        item_stats[item_id]['count'] += 1
+        item_stats[item_id]['total_quantity'] += auction.get('quantity', 1)
+    return item_stats
+
+
+def _item_stats_from_snapshot(snapshot: Any) -> Dict:
+    """Agrupa por item usando el índice de filas del snapshot (sin parsear)."""
+    item_stats = {}
+    starts = snapshot.starts
+    for k, item_id in enumerate(snapshot.items):
+        rows = slice(int(starts[k]), int(starts[k + 1]))
+        item_stats[int(item_id)] = {
+            'prices': snapshot.unit_price[rows],
+            'count': rows.stop - rows.start,
+            'total_quantity': int(snapshot.quantity[rows].sum()),
+        }
+    return item_stats
+
+
+def _has_segmented_ops(_np: Any) -> bool:
+    # Los shims de NumPy usados en pruebas no implementan reducciones por
+    # segmento; en ese caso se usa la ruta por item.
+    return hasattr(_np, "lexsort") and hasattr(getattr(_np, "add", None), "reduceat")
+
+
+def _auction_columns(_np: Any, raw_data: Any) -> tuple:
+    """Extrae columnas ``(item_ids, prices, quantities, presorted)``.
+
+    Un Snapshot ya está ordenado por ``(item_id, unit_price)``; sólo se
+    descartan los lotes sin precio. Para listas de la API se conserva el orden
+    original (las claves ausentes lanzan ``KeyError`` como en la ruta por item).
+    """
+    if _is_snapshot(raw_data):
+        valid = _np.isfinite(raw_data.unit_price)
+        return (
+            raw_data.item_id[valid],
+            raw_data.unit_price[valid],
+            raw_data.quantity[valid],
+            True,
+        )
+    item_ids = _np.array([a['item']['id'] for a in raw_data], dtype=_np.int64)
+    prices = _np.array([a['unit_price'] for a in raw_data])
+    quantities = _np.array([a.get('quantity', 1) for a in raw_data], dtype=_np.int64)
+    return item_ids, prices, quantities, False
+
+
+def _segment_columns(_np: Any, ids: Any, p: Any, q: Any) -> Dict[str, Any]:
+    """Estadísticos por item sobre columnas ya ordenadas por ``(item_id, precio)``.
+
+    Devuelve columnas alineadas por segmento (``item_id``, ``min_price``,
+    ``max_price``, ``mean_price``, ``median_price``, ``std_price``,
+    ``total_listings``, ``total_quantity``) más ``starts`` y ``z_scores`` por
+    fila (0 en items sin dispersión).
+    """
+    n = ids.shape[0]
+    starts = _np.flatnonzero(_np.concatenate(([True], ids[1:] != ids[:-1])))
+    counts = _np.diff(_np.append(starts, n))
+
+    means = _np.add.reduceat(p, starts) / counts
+    deviations = p - _np.repeat(means, counts)
+    stds = _np.sqrt(_np.add.reduceat(deviations * deviations, starts) / counts)
+    lower = starts + (counts - 1) // 2
+    upper = starts + counts // 2
+
+    # z-scores por fila; los items con desviación nula no generan anomalías
+    row_std = _np.repeat(stds, counts)
+    safe_std = _np.where(row_std > 0, row_std, 1.0)
+    return {
+        'item_id': ids[starts],
+        'min_price': _np.minimum.reduceat(p, starts),
+        'max_price': _np.maximum.reduceat(p, starts),
+        'mean_price': means,
+        'median_price': (p[lower] + p[upper]) / 2,
+        'std_price': stds,
+        'total_listings': counts,
+        'total_quantity': _np.add.reduceat(q, starts),
+        'starts': starts,
+        'z_scores': _np.where(row_std > 0, _np.abs(deviations) / safe_std, 0.0),
+    }
+
+
+def _segmented_summary(
+    _np: Any, item_ids: Any, prices: Any, quantities: Any, presorted: bool = False
+) -> tuple:
+    """Calcula ``summary`` y ``anomalies`` de todos los items a la vez.
+
+    Ordena una sola vez por ``(item_id, precio)`` y aplica ``reduceat`` sobre
+    los segmentos de cada item; la mediana sale directamente de las posiciones
+    centrales de cada segmento ordenado. El resultado conserva el orden de
+    primera aparición de los items y, dentro de cada item, el orden original
+    de las anomalías, igual que la ruta por item.
+    """
+    n = item_ids.shape[0]
+    if n == 0:
+        return {}, []
+
+    order = _np.arange(n) if presorted else _np.lexsort((prices, item_ids))
+    ids = item_ids[order]
+    p = prices[order]
+    q = quantities[order]
+
+    cols = _segment_columns(_np, ids, p, q)
+    starts = cols['starts']
+    counts = cols['total_listings']
+
+    # Orden de primera aparición de cada item en los datos de entrada
+    first_seen = _np.minimum.reduceat(order, starts)
+    seg_order = _np.argsort(first_seen, kind="stable")
+
+    summary = {}
+    for k in seg_order.tolist():
+        summary[int(cols['item_id'][k])] = {
+            'min_price': float(cols['min_price'][k]),
+            'max_price': float(cols['max_price'][k]),
+            'mean_price': float(cols['mean_price'][k]),
+            'median_price': float(cols['median_price'][k]),
+            'std_price': float(cols['std_price'][k]),
+            'total_listings': int(counts[k]),
+            'total_quantity': int(cols['total_quantity'][k]),
+        }
+
+    z_scores = cols['z_scores']
+    rows = _np.flatnonzero(z_scores > 3)
+    if rows.size:
+        row_first_seen = _np.repeat(first_seen, counts)[rows]
+        rows = rows[_np.lexsort((order[rows], row_first_seen))]
+
+    anomalies = [
+        {
+            'item_id': int(ids[i]),
+            'price': float(p[i]),
+            'z_score': float(z_scores[i]),
+        }
+        for i in rows.tolist()
+    ]
+    return summary, anomalies
+
 class MarketDataProcessor:
     def __init__(self, cache_dir: str = ".cache"):
         self.cache_dir = Path(cache_dir)
@@ -28,6 +188,9 @@ class MarketDataProcessor:
     def preprocess_auction_data(self, raw_data: List[Dict]) -> Dict:
         """
         Pre-procesa los datos de subasta para reducir la carga en el LLM.
+
+        ``raw_data`` puede ser la lista de subastas de la API o un
+        :class:`~kezan.snapshot.Snapshot` ya parseado a columnas.
         """
         processed = {
             'summary': {},
@@ -36,43 +199,48 @@ class MarketDataProcessor:
         }
 
         try:
+            _np = _ensure_np()
+            if _has_segmented_ops(_np):
+                # Ruta vectorizada: una ordenación y reducciones por segmento
+                item_ids, prices, quantities, presorted = _auction_columns(_np, raw_data)
+                summary, anomalies = _segmented_summary(
+                    _np, item_ids, prices, quantities, presorted=presorted
+                )
+                processed['summary'] = summary
+                processed['anomalies'] = anomalies
+                return processed
+
             # Calcular estadísticas básicas por item
-            item_stats = {}
-            for auction in raw_data:
-                item_id = auction['item']['id']
-                price = auction['unit_price']
-                
-                if item_id not in item_stats:
-                    item_stats[item_id] = {
-                        'prices': [],
-                        'count': 0,
-                        'total_quantity': 0
-                    }
-                
-                item_stats[item_id]['prices'].append(price)
-                item_stats[item_id]['count'] += 1
-                item_stats[item_id]['total_quantity'] += auction.get('quantity', 1)
+            if _is_snapshot(raw_data):
+                item_stats = _item_stats_from_snapshot(raw_data)
+            else:
+                item_stats = _item_stats_from_auctions(raw_data)
 
             # Calcular métricas y detectar anomalías
             for item_id, stats in item_stats.items():
-                _np = _ensure_np()
                 prices = _np.array(stats['prices'])
-                
+                mean = _np.mean(prices)
+                std = _np.std(prices)
+
                 # Estadísticas básicas
                 processed['summary'][item_id] = {
                     'min_price': float(_np.min(prices)),
                     'max_price': float(_np.max(prices)),
-                    'mean_price': float(_np.mean(prices)),
+                    'mean_price': float(mean),
                     'median_price': float(_np.median(prices)),
-                    'std_price': float(_np.std(prices)),
+                    'std_price': float(std),
                     'total_listings': stats['count'],
                     'total_quantity': stats['total_quantity']
                 }
 
+                # Sin dispersión no hay anomalías (y se evita dividir por cero)
+                if not std > 0:
+                    continue
+
                 # Detección de anomalías (precios que se desvían significativamente)
-                z_scores = _np.abs((prices - _np.mean(prices)) / _np.std(prices))
+                z_scores = _np.abs((prices - mean) / std)
                 anomaly_indices = _np.where(z_scores > 3)[0]
-                
+
                 if len(anomaly_indices) > 0:
                     processed['anomalies'].extend([
                         {
@@ -88,6 +256,24 @@ class MarketDataProcessor:
             self.logger.error(f"Error preprocessing auction data: {e}")
             return None
 
+    async def preprocess_auction_data_async(self, raw_data: Any) -> Optional[Dict]:
+        """
+        Como :meth:`preprocess_auction_data`, sin bloquear el bucle de eventos.
+
+        Los bytes crudos del endpoint y los Snapshot se procesan en el pool de
+        :mod:`kezan.processing`; las listas de la API, en un hilo.
+        """
+        if not isinstance(raw_data, (bytes, bytearray)) and not _is_snapshot(raw_data):
+            return await asyncio.to_thread(self.preprocess_auction_data, raw_data)
+        from kezan.processing import get_processor  # evita el ciclo de imports
+
+        try:
+            result = await get_processor().process(raw_data)
+        except Exception as e:
+            self.logger.error(f"Error preprocessing auction data: {e}")
+            return None
+        return result.to_processed()
+
     def cache_results(self, key: str, data: Dict, ttl_minutes: int = 15):
         """
         Cachea resultados procesados para reducir carga en el LLM.
@@ -143,7 +329,8 @@ class LLMOptimizer:
             item_data = {'id': item_id, **stats}
             estimated_tokens = len(str(item_data)) // 4  # Estimación aproximada
             
-            if current_size + estimated_tokens > self.max_tokens:
+            # Un item mayor que el presupuesto va solo en su chunk, sin dejar uno vacío
+            if current_chunk['items'] and current_size + estimated_tokens > self.max_tokens:
                 chunks.append(current_chunk)
                 current_chunk = {'items': []}
                 current_size = 0
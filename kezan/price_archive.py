@@ -0,0 +1,328 @@
+"""Archivo local de precios horarios en segmentos binarios mapeados en memoria.
+
+Cada hora se agrega un snapshot a una fila por ``(scope, item_id)`` con
+precio mínimo, percentiles 10 y 50 (ponderados por unidades) y volumen
+listado. Las filas tienen ancho fijo (:data:`ROW_DTYPE`, 56 bytes) y se
+añaden a un segmento por día (``seg-<día>.bin``) bajo
+``~/.kezan/price_archive/``; nunca se reescriben salvo al sellar.
+
+- Segmento abierto (día en curso): índice en memoria ``item_id -> filas``
+  reconstruido al abrir y actualizado en cada inserción.
+- Segmentos sellados (días anteriores): se ordenan por
+  ``(item_id, scope, hour)`` y se acompañan de ``seg-<día>.idx.npy`` con el
+  primer registro y el número de filas de cada item.
+
+Así :meth:`PriceArchive.history` lee la serie de un item (p. ej. 90 días)
+con una búsqueda binaria por segmento y un slice del ``memmap``, sin cargar
+las filas de otros items.
+
+Lo alimenta :class:`~kezan.realtime_monitor.RealTimeAuctionMonitor` (en el
+hilo donde construye cada snapshot) y lo consultan las rutas desde hilos
+con ``asyncio.to_thread``; un lock por instancia serializa escrituras,
+sellados y lecturas.
+"""
+from __future__ import annotations
+
+import functools
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from kezan.logger import get_logger
+
+logger = get_logger(__name__)
+
+ARCHIVE_DIR = Path(os.path.expanduser("~/.kezan")) / "price_archive"
+HISTORY_DAYS = 90
+RETENTION_DAYS = 400
+
+ROW_DTYPE = np.dtype([
+    ("item_id", "<i8"),
+    ("scope", "<i8"),
+    ("hour", "<i8"),
+    ("min", "<f8"),
+    ("p10", "<f8"),
+    ("p50", "<f8"),
+    ("volume", "<i8"),
+])
+INDEX_DTYPE = np.dtype([("item_id", "<i8"), ("start", "<i8"), ("count", "<i8")])
+
+
+def _locked(method):
+    """Ejecuta ``method`` con el lock de la instancia."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+def aggregate_hour(snapshot, hour: int) -> np.ndarray:
+    """Agrega un :class:`~kezan.snapshot.Snapshot` a filas ``ROW_DTYPE``.
+
+    Los percentiles se ponderan por cantidad: ``p10`` es el precio al que se
+    alcanza el 10% de las unidades listadas más baratas.
+    """
+    prices = np.asarray(snapshot.unit_price, dtype=np.float64)
+    valid = np.isfinite(prices) & (prices > 0)
+    if not valid.any():
+        return np.empty(0, dtype=ROW_DTYPE)
+    prices = prices[valid]
+    items = np.asarray(snapshot.item_id, dtype=np.int64)[valid]
+    scopes = np.asarray(snapshot.scope, dtype=np.int64)[valid]
+    qty = np.maximum(np.asarray(snapshot.quantity, dtype=np.int64)[valid], 0)
+
+    order = np.lexsort((prices, items, scopes))
+    prices, items, scopes, qty = prices[order], items[order], scopes[order], qty[order]
+    starts = np.flatnonzero(
+        np.concatenate(([True], (items[1:] != items[:-1]) | (scopes[1:] != scopes[:-1])))
+    )
+    ends = np.append(starts[1:], prices.size)
+    volume = np.add.reduceat(qty, starts)
+    cum = np.cumsum(qty)
+    before = cum[starts] - qty[starts]
+
+    def percentile(p: float) -> np.ndarray:
+        pos = np.searchsorted(cum, before + p * volume, side="left")
+        # Grupos sin unidades: se usa su primera fila
+        return prices[np.clip(pos, starts, ends - 1)]
+
+    rows = np.empty(starts.size, dtype=ROW_DTYPE)
+    rows["item_id"] = items[starts]
+    rows["scope"] = scopes[starts]
+    rows["hour"] = hour
+    rows["min"] = prices[starts]
+    rows["p10"] = percentile(0.1)
+    rows["p50"] = percentile(0.5)
+    rows["volume"] = volume
+    return rows
+
+
+class PriceArchive:
+    """Archivo append-only de filas horarias agregadas por item.
+
+    Parámetros:
+    - directory (str | Path | None): carpeta del archivo; por defecto
+      ``~/.kezan/price_archive``.
+    """
+
+    def __init__(self, directory: Optional[Path] = None):
+        self.directory = Path(directory) if directory else Path(ARCHIVE_DIR)
+        self._lock = threading.RLock()
+        self._open_day: Optional[int] = None
+        self._open_index: Dict[int, List[int]] = {}
+        self._open_hours: Set[Tuple[int, int]] = set()
+        self._open_rows = 0
+        self._sealed: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+
+    # ------------------------------------------------------------------
+    # Ficheros
+    # ------------------------------------------------------------------
+    def _segment(self, day: int) -> Path:
+        return self.directory / f"seg-{day}.bin"
+
+    def _index(self, day: int) -> Path:
+        return self.directory / f"seg-{day}.idx.npy"
+
+    def days(self) -> List[int]:
+        """Días con segmento en disco, ordenados."""
+        if not self.directory.exists():
+            return []
+        return sorted(int(p.name[4:-4]) for p in self.directory.glob("seg-*.bin"))
+
+    @staticmethod
+    def _map(path: Path) -> np.ndarray:
+        count = path.stat().st_size // ROW_DTYPE.itemsize if path.exists() else 0
+        if not count:
+            return np.empty(0, dtype=ROW_DTYPE)
+        # Una escritura interrumpida puede dejar una fila parcial al final: se ignora
+        return np.memmap(path, dtype=ROW_DTYPE, mode="r", shape=(count,))
+
+    # ------------------------------------------------------------------
+    # Segmento abierto
+    # ------------------------------------------------------------------
+    def _open(self, day: int) -> None:
+        """Abre ``day`` para escritura, sellando el segmento anterior."""
+        if self._open_day == day:
+            return
+        if self._open_day is not None and self._open_day < day:
+            self.seal(self._open_day)
+            self.prune(now_day=day)
+        path = self._segment(day)
+        partial = path.stat().st_size % ROW_DTYPE.itemsize if path.exists() else 0
+        if partial:
+            # Recortar la fila incompleta para que las siguientes queden alineadas
+            os.truncate(path, path.stat().st_size - partial)
+        rows = self._map(path)
+        self._open_day = day
+        self._open_index = {}
+        for pos, item_id in enumerate(rows["item_id"].tolist()):
+            self._open_index.setdefault(item_id, []).append(pos)
+        self._open_hours = set(zip(rows["scope"].tolist(), rows["hour"].tolist()))
+        self._open_rows = len(rows)
+
+    @_locked
+    def append(self, rows: np.ndarray) -> int:
+        """Añade filas ``ROW_DTYPE`` (todas de la misma hora).
+
+        Las combinaciones ``(scope, hour)`` ya archivadas se omiten, de modo
+        que volver a ingerir la misma hora no duplica datos.
+
+        Retorna:
+        - int: filas escritas.
+        """
+        if not len(rows):
+            return 0
+        hour = int(rows["hour"][0])
+        day = hour // 24
+        if self._open_day is not None and day < self._open_day:
+            logger.warning("Hora %s anterior al segmento abierto; se ignora", hour)
+            return 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._open(day)
+        fresh = np.array(
+            [(int(s), hour) not in self._open_hours for s in rows["scope"].tolist()], dtype=bool
+        )
+        rows = np.ascontiguousarray(rows[fresh], dtype=ROW_DTYPE)
+        if not len(rows):
+            return 0
+        with open(self._segment(day), "ab") as fh:
+            fh.write(rows.tobytes())
+        for offset, item_id in enumerate(rows["item_id"].tolist()):
+            self._open_index.setdefault(item_id, []).append(self._open_rows + offset)
+        self._open_hours.update((int(s), hour) for s in np.unique(rows["scope"]).tolist())
+        self._open_rows += len(rows)
+        return len(rows)
+
+    @_locked
+    def append_snapshot(self, snapshot, hour: Optional[int] = None) -> int:
+        """Agrega y archiva un snapshot (hora actual por defecto)."""
+        hour = int(time.time() // 3600) if hour is None else int(hour)
+        written = self.append(aggregate_hour(snapshot, hour))
+        logger.debug("Archivo de precios: %d filas para la hora %d", written, hour)
+        return written
+
+    # ------------------------------------------------------------------
+    # Sellado
+    # ------------------------------------------------------------------
+    @_locked
+    def seal(self, day: int) -> None:
+        """Ordena el segmento ``day`` por item y escribe su índice."""
+        path = self._segment(day)
+        rows = np.array(self._map(path))  # copia: se va a reemplazar el fichero
+        order = np.lexsort((rows["hour"], rows["scope"], rows["item_id"]))
+        rows = rows[order]
+        ids, starts, counts = np.unique(rows["item_id"], return_index=True, return_counts=True)
+        index = np.empty(ids.size, dtype=INDEX_DTYPE)
+        index["item_id"], index["start"], index["count"] = ids, starts, counts
+
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as fh:
+            fh.write(rows.tobytes())
+        os.replace(tmp, path)
+        tmp_index = self._index(day).with_name(f"seg-{day}.idx.tmp.npy")
+        np.save(tmp_index, index)
+        os.replace(tmp_index, self._index(day))
+        self._sealed.pop(day, None)
+        if self._open_day == day:
+            self._open_day = None
+            self._open_index, self._open_hours, self._open_rows = {}, set(), 0
+        logger.debug("Segmento %d sellado (%d filas, %d items)", day, len(rows), ids.size)
+
+    def _sealed_segment(self, day: int) -> Tuple[np.ndarray, np.ndarray]:
+        cached = self._sealed.get(day)
+        if cached is None:
+            if not self._index(day).exists():
+                self.seal(day)  # segmento de un día pasado que quedó sin sellar
+            cached = (self._map(self._segment(day)), np.load(self._index(day)))
+            self._sealed[day] = cached
+        return cached
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+    def _item_rows(self, day: int, item_id: int) -> np.ndarray:
+        if day == self._open_day:
+            positions = self._open_index.get(item_id)
+            if not positions:
+                return np.empty(0, dtype=ROW_DTYPE)
+            return np.asarray(self._map(self._segment(day))[positions])
+        if day == self._current_day() and not self._index(day).exists():
+            # El día en curso no se sella: se indexa como segmento abierto
+            self._open(day)
+            return self._item_rows(day, item_id)
+        rows, index = self._sealed_segment(day)
+        k = int(np.searchsorted(index["item_id"], item_id))
+        if k >= index.size or index["item_id"][k] != item_id:
+            return np.empty(0, dtype=ROW_DTYPE)
+        start, count = int(index["start"][k]), int(index["count"][k])
+        return np.asarray(rows[start:start + count])
+
+    @staticmethod
+    def _current_day() -> int:
+        return int(time.time() // 3600) // 24
+
+    @_locked
+    def history(
+        self,
+        item_id: int,
+        scope: Optional[int] = None,
+        start_hour: Optional[int] = None,
+        end_hour: Optional[int] = None,
+    ) -> np.ndarray:
+        """Filas de ``item_id`` entre ``start_hour`` y ``end_hour`` (incluidas).
+
+        Sólo se leen los segmentos de los días del rango y, dentro de cada
+        uno, las filas del item.
+        """
+        end_hour = int(time.time() // 3600) if end_hour is None else int(end_hour)
+        start_hour = end_hour - HISTORY_DAYS * 24 if start_hour is None else int(start_hour)
+        first, last = start_hour // 24, end_hour // 24
+        parts = [self._item_rows(day, int(item_id)) for day in self.days() if first <= day <= last]
+        if not parts:
+            return np.empty(0, dtype=ROW_DTYPE)
+        rows = np.concatenate(parts)
+        mask = (rows["hour"] >= start_hour) & (rows["hour"] <= end_hour)
+        if scope is not None:
+            mask &= rows["scope"] == int(scope)
+        rows = rows[mask]
+        return rows[np.lexsort((rows["scope"], rows["hour"]))]
+
+    def series(self, item_id: int, scope: Optional[int] = None, days: int = HISTORY_DAYS) -> List[Dict]:
+        """Serie de los últimos ``days`` días como lista de diccionarios."""
+        end_hour = int(time.time() // 3600)
+        rows = self.history(item_id, scope=scope, start_hour=end_hour - days * 24, end_hour=end_hour)
+        return [
+            {name: (int(row[name]) if ROW_DTYPE[name].kind == "i" else float(row[name])) for name in ROW_DTYPE.names}
+            for row in rows
+        ]
+
+    @_locked
+    def prune(self, keep_days: int = RETENTION_DAYS, now_day: Optional[int] = None) -> int:
+        """Elimina segmentos anteriores a ``keep_days``; retorna cuántos."""
+        now_day = self._current_day() if now_day is None else now_day
+        removed = 0
+        for day in self.days():
+            if day < now_day - keep_days:
+                self._sealed.pop(day, None)
+                self._segment(day).unlink(missing_ok=True)
+                self._index(day).unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+
+_archive: Optional[PriceArchive] = None
+
+
+def get_archive() -> PriceArchive:
+    """Instancia compartida del archivo en ``ARCHIVE_DIR``."""
+    global _archive
+    if _archive is None or _archive.directory != Path(ARCHIVE_DIR):
+        _archive = PriceArchive()
+    return _archive
@@ -0,0 +1,333 @@
+"""Procesado de snapshots en un pool de procesos.
+
+Parsear y agregar el volcado completo de una región lleva segundos de CPU;
+hecho dentro del bucle de eventos bloquea FastAPI durante ese tiempo.
+:class:`SnapshotProcessor` envía los bytes crudos del payload (o las columnas
+de un :class:`~kezan.snapshot.Snapshot` ya construido) a un
+``ProcessPoolExecutor``, donde se hace parseo, agregado por item, detección
+de anomalías (omitibles con ``aggregate=False``) y, si se indica histórico,
+detección de gangas.
+
+Los resultados vuelven en un bloque de memoria compartida
+(:class:`SharedArrays`) en lugar de diccionarios serializados con pickle: el
+proceso principal sólo copia columnas contiguas. Sólo las gangas, que son
+pocas, viajan como diccionarios.
+
+El número de procesos se configura con ``PROCESS_WORKERS`` (ver
+:mod:`kezan.config`); con ``0`` el procesado se hace en un hilo del proceso
+principal.
+
+:func:`analyze_snapshot` es la entrada de los consumidores de mercado (el
+monitor en tiempo real y ``AuctionAnalyzer.full_scan``): agrega y busca gangas
+con las estadísticas móviles vigentes, sin reenviar el snapshot de vuelta.
+"""
+from __future__ import annotations
+
+import asyncio
+import atexit
+import json
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from kezan.bargain_detector import Config, History, detect_bargains_snapshot
+from kezan.config import BARGAIN_CAPITAL, PROCESS_WORKERS
+from kezan.logger import get_logger
+from kezan.market_optimizer import _segment_columns
+from kezan.snapshot import REGION_SCOPE, Snapshot
+
+logger = get_logger(__name__)
+
+SNAPSHOT_FIELDS = (
+    "auction_id", "item_id", "quantity", "unit_price", "buyout", "bid", "time_left", "scope", "items", "starts",
+)
+SUMMARY_FIELDS = (
+    "item_id", "min_price", "max_price", "mean_price", "median_price", "std_price",
+    "total_listings", "total_quantity",
+)
+ANOMALY_Z = 3.0  # |z| a partir del cual un lote es anómalo (como en market_optimizer)
+
+
+@dataclass(frozen=True)
+class SharedArrays:
+    """Descriptor (serializable) de columnas NumPy en memoria compartida.
+
+    ``layout`` contiene ``(clave, dtype, longitud, offset)`` por columna. El
+    bloque lo crea quien produce las columnas y lo libera quien las carga.
+    """
+
+    name: str
+    layout: Tuple[Tuple[str, str, int, int], ...]
+
+    @classmethod
+    def create(cls, arrays: Dict[str, np.ndarray]) -> "SharedArrays":
+        """Copia ``arrays`` (1-D) a un bloque nuevo de memoria compartida."""
+        arrays = {key: np.ascontiguousarray(arr) for key, arr in arrays.items()}
+        layout = []
+        offset = 0
+        for key, arr in arrays.items():
+            offset = -(-offset // 8) * 8  # columnas alineadas a 8 bytes
+            layout.append((key, arr.dtype.str, int(arr.shape[0]), offset))
+            offset += arr.nbytes
+        shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        try:
+            for key, dtype, length, start in layout:
+                np.ndarray(length, dtype=dtype, buffer=shm.buf, offset=start)[:] = arrays[key]
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+        shm.close()
+        return cls(shm.name, tuple(layout))
+
+    def load(self) -> Dict[str, np.ndarray]:
+        """Copia las columnas a memoria propia y libera el bloque compartido."""
+        shm = shared_memory.SharedMemory(name=self.name)
+        try:
+            return {
+                key: np.ndarray(length, dtype=dtype, buffer=shm.buf, offset=start).copy()
+                for key, dtype, length, start in self.layout
+            }
+        finally:
+            shm.close()
+            shm.unlink()
+
+
+@dataclass(frozen=True, eq=False)
+class ProcessedSnapshot:
+    """Resultado del procesado: snapshot, agregados por item, anomalías y gangas.
+
+    ``summary`` tiene una fila por item (columnas :data:`SUMMARY_FIELDS`) y
+    ``anomalies`` una por lote anómalo (``item_id``, ``price``, ``z_score``).
+    """
+
+    snapshot: Snapshot
+    summary: Dict[str, np.ndarray]
+    anomalies: Dict[str, np.ndarray]
+    bargains: List[Dict]
+
+    def to_processed(self) -> Dict:
+        """Mismo formato que :meth:`MarketDataProcessor.preprocess_auction_data`."""
+        s = self.summary
+        summary = {
+            int(item_id): {
+                "min_price": float(s["min_price"][k]),
+                "max_price": float(s["max_price"][k]),
+                "mean_price": float(s["mean_price"][k]),
+                "median_price": float(s["median_price"][k]),
+                "std_price": float(s["std_price"][k]),
+                "total_listings": int(s["total_listings"][k]),
+                "total_quantity": int(s["total_quantity"][k]),
+            }
+            for k, item_id in enumerate(s["item_id"].tolist())
+        }
+        a = self.anomalies
+        anomalies = [
+            {"item_id": int(i), "price": float(p), "z_score": float(z)}
+            for i, p, z in zip(a["item_id"].tolist(), a["price"].tolist(), a["z_score"].tolist())
+        ]
+        return {"summary": summary, "trends": {}, "anomalies": anomalies}
+
+
+# ----------------------------------------------------------------------
+# Trabajo del proceso hijo
+# ----------------------------------------------------------------------
+def _no_aggregates() -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+    """Agregados y anomalías vacíos, con las columnas y tipos habituales."""
+    counts = ("item_id", "total_listings", "total_quantity")
+    summary = {key: np.empty(0, dtype=np.int64 if key in counts else np.float64) for key in SUMMARY_FIELDS}
+    empty = np.empty(0, dtype=np.float64)
+    return summary, {"item_id": np.empty(0, dtype=np.int64), "price": empty, "z_score": empty}
+
+
+def aggregate(snapshot: Snapshot) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+    """Agregados por item y lotes anómalos de un snapshot (sin lotes sin precio)."""
+    valid = np.isfinite(snapshot.unit_price)
+    ids = snapshot.item_id[valid]
+    prices = snapshot.unit_price[valid]
+    if not ids.size:
+        return _no_aggregates()
+    cols = _segment_columns(np, ids, prices, snapshot.quantity[valid])
+    rows = np.flatnonzero(cols["z_scores"] > ANOMALY_Z)
+    anomalies = {"item_id": ids[rows], "price": prices[rows], "z_score": cols["z_scores"][rows]}
+    return {key: cols[key] for key in SUMMARY_FIELDS}, anomalies
+
+
+def _process(
+    source: Union[bytes, bytearray, SharedArrays],
+    scope: int,
+    version: str,
+    history: Optional[History],
+    capital: float,
+    cfg: Optional[Config],
+    summarize: bool = True,
+    echo: bool = True,
+) -> Tuple[SharedArrays, List[Dict]]:
+    """Parsea, agrega y detecta gangas; se ejecuta en el proceso hijo.
+
+    Con ``echo=False`` (el llamador ya tiene el snapshot) no se devuelven sus
+    columnas, sólo agregados y anomalías.
+    """
+    if isinstance(source, SharedArrays):
+        snapshot = _snapshot_from(source.load(), version)
+    else:
+        snapshot = Snapshot.from_payload(json.loads(source), scope=scope, version=version)
+    summary, anomalies = aggregate(snapshot) if summarize else _no_aggregates()
+    bargains: List[Dict] = []
+    if history is not None:
+        bargains = detect_bargains_snapshot(
+            snapshot, history, str(scope), scope == REGION_SCOPE, capital, cfg or Config()
+        )
+    columns = {f"snapshot.{key}": getattr(snapshot, key) for key in SNAPSHOT_FIELDS} if echo else {}
+    columns.update((f"summary.{key}", value) for key, value in summary.items())
+    columns.update((f"anomaly.{key}", value) for key, value in anomalies.items())
+    return SharedArrays.create(columns), bargains
+
+
+def _snapshot_from(columns: Dict[str, np.ndarray], version: str, prefix: str = "") -> Snapshot:
+    return Snapshot(**{key: columns[prefix + key] for key in SNAPSHOT_FIELDS}, version=version)
+
+
+def _unpack(
+    shared: SharedArrays, bargains: List[Dict], version: str, snapshot: Optional[Snapshot] = None
+) -> ProcessedSnapshot:
+    columns = shared.load()
+
+    def group(prefix: str) -> Dict[str, np.ndarray]:
+        return {key[len(prefix):]: value for key, value in columns.items() if key.startswith(prefix)}
+
+    return ProcessedSnapshot(
+        snapshot=snapshot if snapshot is not None else _snapshot_from(columns, version, "snapshot."),
+        summary=group("summary."),
+        anomalies=group("anomaly."),
+        bargains=bargains,
+    )
+
+
+# ----------------------------------------------------------------------
+# Ejecutor
+# ----------------------------------------------------------------------
+class SnapshotProcessor:
+    """Ejecutor de procesado de snapshots fuera del bucle de eventos.
+
+    Parámetros:
+    - workers (int): procesos del pool; ``0`` procesa en un hilo del
+      proceso principal (útil sin ``fork`` o con poca memoria).
+    """
+
+    def __init__(self, workers: int = PROCESS_WORKERS):
+        self.workers = max(int(workers), 0)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers and self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            logger.info("Pool de procesado iniciado con %d procesos", self.workers)
+        return self._pool
+
+    async def process(
+        self,
+        source: Union[bytes, bytearray, Snapshot],
+        scope: int = REGION_SCOPE,
+        version: str = "",
+        history: Optional[History] = None,
+        capital: float = 0.0,
+        cfg: Optional[Config] = None,
+        aggregate: bool = True,
+    ) -> ProcessedSnapshot:
+        """Procesa un payload crudo o un snapshot sin bloquear el bucle.
+
+        Parámetros:
+        - source (bytes | bytearray | Snapshot): cuerpo JSON del endpoint de
+          subastas o snapshot ya construido (sus columnas viajan en memoria
+          compartida y el resultado reutiliza el mismo objeto).
+        - scope (int): reino conectado o :data:`REGION_SCOPE` (commodities).
+        - version (str): versión del snapshot (``ETag``/``Last-Modified``).
+        - history (History | None): estadísticas para detectar gangas; debe
+          poder serializarse con pickle. Sin histórico no se buscan gangas.
+        - capital (float), cfg (Config | None): parámetros del detector.
+        - aggregate (bool): calcular agregados por item y anomalías; con
+          ``False`` vuelven vacíos (quien sólo quiere el snapshot).
+
+        Retorna:
+        - ProcessedSnapshot: snapshot, agregados, anomalías y gangas.
+
+        Si la tarea que espera se cancela, el trabajo en curso termina igual
+        y sus bloques de memoria compartida se liberan al acabar.
+
+        Lanza:
+        - ValueError: si el payload no es JSON válido.
+        """
+        original = source if isinstance(source, Snapshot) else None
+        if original is not None:
+            version = version or original.version
+            source = SharedArrays.create({key: getattr(original, key) for key in SNAPSHOT_FIELDS})
+        job = partial(_process, source, scope, version, history, capital, cfg, aggregate, original is None)
+        pool = self._executor()
+        if pool is None:
+            running = asyncio.ensure_future(asyncio.to_thread(job))
+        else:
+            running = asyncio.get_running_loop().run_in_executor(pool, job)
+        try:
+            # shield: cancelar la espera no abandona el resultado del trabajo
+            shared, bargains = await asyncio.shield(running)
+        except asyncio.CancelledError:
+            running.add_done_callback(partial(_release, source))
+            raise
+        except BaseException:
+            if isinstance(source, SharedArrays):
+                _discard(source)
+            raise
+        return _unpack(shared, bargains, version, original)
+
+    def shutdown(self) -> None:
+        """Detiene el pool (se recrea bajo demanda)."""
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+
+def _discard(shared: SharedArrays) -> None:
+    """Libera un bloque que no llegó a cargarse."""
+    try:
+        shm = shared_memory.SharedMemory(name=shared.name)
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
+
+
+def _release(source: Union[bytes, SharedArrays], running: asyncio.Future) -> None:
+    """Libera los bloques de un trabajo cuyo resultado ya nadie espera."""
+    if isinstance(source, SharedArrays):
+        _discard(source)  # no-op si el trabajo ya lo cargó
+    if not running.cancelled() and running.exception() is None:
+        _discard(running.result()[0])
+
+
+_processor: Optional[SnapshotProcessor] = None
+
+
+async def analyze_snapshot(
+    snapshot: Snapshot, history: Optional[History] = None, capital: float = BARGAIN_CAPITAL
+) -> ProcessedSnapshot:
+    """Agregados, anomalías y gangas de un snapshot en el procesador compartido.
+
+    El ``scope`` (reino conectado o región) se toma de las columnas del
+    snapshot, igual que la clave de :class:`~kezan.rolling_stats.RollingStats`.
+    """
+    scope = int(snapshot.scope[0]) if len(snapshot) else REGION_SCOPE
+    return await get_processor().process(snapshot, scope=scope, history=history, capital=capital)
+
+
+def get_processor() -> SnapshotProcessor:
+    """Procesador compartido del proceso, con ``PROCESS_WORKERS`` procesos."""
+    global _processor
+    if _processor is None:
+        _processor = SnapshotProcessor()
+        atexit.register(_processor.shutdown)
+    return _processor
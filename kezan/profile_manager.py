@@ -1,10 +1,26 @@
+from collections.abc import Mapping
 from enum import Enum
-from dataclasses import dataclass
-from typing import Dict, Optional, List
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, Iterator, Optional, List, Set, Tuple
+import asyncio
+import atexit
+import copy
 import json
 import os
+import threading
+import weakref
 from pathlib import Path
 
+from kezan.auction_history import AuctionHistoryStore
+from kezan.logger import get_logger
+
+logger = get_logger(__name__)
+
+WRITE_DELAY = 0.5  # segundos para agrupar modificaciones en una escritura
+
+# Gestores vivos que ``_flush_all`` vacía al salir; débil para no retenerlos
+_managers: "weakref.WeakSet[ProfileManager]" = weakref.WeakSet()
+
 class GameVersion(Enum):
     RETAIL = "retail"
     CLASSIC = "classic"
@@ -22,21 +38,75 @@ class Profile:
     version: GameVersion
     preferences: SearchPreferences
     last_scan: Optional[str] = None
-    auction_history: Dict[int, List[dict]] = None
+    auction_history: Mapping[int, List[dict]] = None
+
+class _HistoryView(Mapping):
+    """Historial de un perfil leído bajo demanda, item a item.
+
+    ``get_profile`` lo devuelve en ``Profile.auction_history`` en lugar de
+    copiar el historial entero en cada lectura; cada acceso devuelve una
+    copia de la serie del item pedido.
+    """
+
+    def __init__(self, manager: "ProfileManager", version: GameVersion):
+        self._manager = manager
+        self._version = version
+
+    def __getitem__(self, item_id: int) -> List[dict]:
+        records = self._manager.get_auction_history(self._version, item_id)
+        if not records:
+            raise KeyError(item_id)
+        return records
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._manager._history_ids(self._version))
+
+    def __len__(self) -> int:
+        return len(self._manager._history_ids(self._version))
+
+    def __repr__(self) -> str:
+        return f"_HistoryView({self._version.value})"
+
 
 class ProfileManager:
-    def __init__(self, config_dir: str = None):
+    """Perfiles por versión en memoria con persistencia diferida.
+
+    Los perfiles se leen de disco una vez y se sirven desde memoria; los
+    cambios marcan el perfil como sucio y se escriben de forma atómica
+    (fichero temporal + ``os.replace``) pasados ``write_delay`` segundos,
+    agrupando ráfagas de modificaciones en una sola escritura. Si el fichero
+    cambia fuera del proceso (editado a mano) se recarga en la siguiente
+    lectura, salvo que haya cambios locales pendientes, que prevalecen.
+
+    Parámetros:
+    - config_dir (str | None): carpeta de perfiles; por defecto ``~/.kezan/profiles``.
+    - write_delay (float): segundos de espera antes de escribir; ``0`` escribe al instante.
+    """
+
+    def __init__(self, config_dir: str = None, write_delay: float = WRITE_DELAY):
         if config_dir is None:
             config_dir = os.path.expanduser("~/.kezan/profiles")
         self.config_dir = Path(config_dir)
         self.config_dir.mkdir(parents=True, exist_ok=True)
         self.active_profile: Optional[Profile] = None
+        self.write_delay = write_delay
+        self._lock = threading.RLock()
+        self._profiles: Dict[GameVersion, Profile] = {}
+        self._stamps: Dict[GameVersion, Optional[Tuple[int, int]]] = {}
+        self._dirty: Set[GameVersion] = set()
+        self._timer: Optional[threading.Timer] = None
+        self._async_lock: Optional[asyncio.Lock] = None
+        self._async_loop = None
+        # Historial fuera del JSON del perfil: un .jsonl por versión con escrituras agrupadas,
+        # compartido con las demás instancias sobre la misma carpeta
+        self.history = AuctionHistoryStore.shared(self.config_dir / "history")
         self._load_or_create_profiles()
+        _managers.add(self)
 
     def _load_or_create_profiles(self):
         """Inicializa perfiles por defecto si no existen."""
         for version in GameVersion:
-            profile_path = self.config_dir / f"{version.value}.json"
+            profile_path = self._path(version)
             if not profile_path.exists():
                 default_prefs = SearchPreferences(
                     default_realm="",
@@ -49,28 +119,48 @@ class ProfileManager:
                     preferences=default_prefs,
                     auction_history={}
                 )
-                self.save_profile(profile)
+                with self._lock:
+                    self._profiles[version] = profile
+                    self._write(profile)
 
-    def get_profile(self, version: GameVersion) -> Profile:
-        """Obtiene un perfil específico."""
-        profile_path = self.config_dir / f"{version.value}.json"
-        if not profile_path.exists():
-            raise ValueError(f"No existe perfil para {version.value}")
-        
+    # ------------------------------------------------------------------
+    # Disco
+    # ------------------------------------------------------------------
+    def _path(self, version: GameVersion) -> Path:
+        return self.config_dir / f"{version.value}.json"
+
+    @staticmethod
+    def _stamp(path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _read(self, version: GameVersion) -> Profile:
+        profile_path = self._path(version)
+        stamp = self._stamp(profile_path)
         with open(profile_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
-            prefs = SearchPreferences(**data['preferences'])
-            prefs.price_thresholds = {int(k): v for k, v in prefs.price_thresholds.items()}
-            return Profile(
-                version=version,
-                preferences=prefs,
-                last_scan=data.get('last_scan'),
-                auction_history={int(k): v for k, v in (data.get('auction_history', {}) or {}).items()}
-            )
+        prefs = SearchPreferences(**data['preferences'])
+        prefs.price_thresholds = {int(k): v for k, v in prefs.price_thresholds.items()}
+        profile = Profile(
+            version=version,
+            preferences=prefs,
+            last_scan=data.get('last_scan'),
+        )
+        self._stamps[version] = stamp
+        if 'auction_history' in data:
+            # Formato antiguo: mover el historial al almacén propio y aligerar el JSON
+            legacy = {int(k): v for k, v in (data.get('auction_history') or {}).items()}
+            self.history.import_history(version.value, legacy)
+            self.history.flush()
+            self._write(profile)
+        return profile
 
-    def save_profile(self, profile: Profile):
-        """Guarda un perfil en disco."""
-        profile_path = self.config_dir / f"{profile.version.value}.json"
+    def _write(self, profile: Profile) -> None:
+        """Escribe el perfil de forma atómica y recuerda su marca de fichero."""
+        profile_path = self._path(profile.version)
         data = {
             'version': profile.version.value,
             'preferences': {
@@ -80,13 +170,92 @@ class ProfileManager:
                 'notification_enabled': profile.preferences.notification_enabled
             },
             'last_scan': profile.last_scan,
-            'auction_history': profile.auction_history
         }
-        
-        print(f"Saving profile: {data}")  # Log del estado de los datos antes de guardar
-        
-        with open(profile_path, 'w', encoding='utf-8') as f:
+        logger.debug("Guardando perfil %s: %s", profile.version.value, data)
+        tmp = profile_path.with_suffix(".json.tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=2)
+        os.replace(tmp, profile_path)
+        self._stamps[profile.version] = self._stamp(profile_path)
+
+    def _profile(self, version: GameVersion) -> Profile:
+        """Perfil en memoria (sin copiar), recargado si el fichero cambió fuera."""
+        cached = self._profiles.get(version)
+        stamp = self._stamp(self._path(version))
+        if cached is not None and (version in self._dirty or stamp == self._stamps.get(version)):
+            return cached
+        if stamp is None:
+            raise ValueError(f"No existe perfil para {version.value}")
+        if cached is not None:
+            logger.info("Perfil %s modificado externamente; se recarga", version.value)
+        profile = self._profiles[version] = self._read(version)
+        return profile
+
+    def _mark_dirty(self, version: GameVersion) -> None:
+        self._dirty.add(version)
+        if self.write_delay <= 0:
+            self.flush()
+        elif self._timer is None:
+            self._timer = threading.Timer(self.write_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self) -> int:
+        """Escribe ya los perfiles con cambios pendientes.
+
+        Retorna:
+        - int: perfiles escritos.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            written = 0
+            for version in sorted(self._dirty, key=lambda v: v.value):
+                try:
+                    self._write(self._profiles[version])
+                except OSError as exc:
+                    logger.error("No se pudo guardar el perfil %s: %s", version.value, exc)
+                    continue
+                self._dirty.discard(version)
+                written += 1
+            return written
+
+    # ------------------------------------------------------------------
+    # Acceso asíncrono
+    # ------------------------------------------------------------------
+    async def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Ejecuta ``fn`` en un hilo, serializado con un lock asíncrono.
+
+        Pensado para los manejadores FastAPI: una posible recarga o escritura
+        en disco nunca bloquea el bucle de eventos y las secuencias
+        leer-modificar-guardar de distintas peticiones no se intercalan.
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_lock is None or self._async_loop is not loop:
+            self._async_lock, self._async_loop = asyncio.Lock(), loop
+        async with self._async_lock:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+    def get_profile(self, version: GameVersion) -> Profile:
+        """Obtiene una copia del perfil (desde memoria).
+
+        ``auction_history`` se lee bajo demanda (ver :class:`_HistoryView`).
+        """
+        with self._lock:
+            profile = copy.deepcopy(self._profile(version))
+        profile.auction_history = _HistoryView(self, version)
+        return profile
+
+    def save_profile(self, profile: Profile):
+        """Guarda un perfil (la escritura en disco es diferida)."""
+        stored = copy.deepcopy(replace(profile, auction_history=None))
+        with self._lock:
+            self._profiles[profile.version] = stored
+            self._mark_dirty(profile.version)
 
     def set_active_profile(self, version: GameVersion):
         """Establece el perfil activo."""
@@ -94,41 +263,72 @@ class ProfileManager:
 
     def update_preferences(self, version: GameVersion, **kwargs):
         """Actualiza las preferencias de un perfil específico."""
-        profile = self.get_profile(version)
-        for key, value in kwargs.items():
-            if hasattr(profile.preferences, key):
-                setattr(profile.preferences, key, value)
-        self.save_profile(profile)
+        with self._lock:
+            profile = self._profile(version)
+            for key, value in kwargs.items():
+                if hasattr(profile.preferences, key):
+                    setattr(profile.preferences, key, copy.deepcopy(value))
+            self._mark_dirty(version)
 
     def add_watched_item(self, version: GameVersion, item_id: int, max_price: Optional[int] = None):
         """Añade un item a la lista de observados."""
-        profile = self.get_profile(version)
-        if item_id not in profile.preferences.watched_items:
-            profile.preferences.watched_items.append(item_id)
-            if max_price is not None:
-                profile.preferences.price_thresholds[item_id] = max_price
-            self.save_profile(profile)
+        with self._lock:
+            profile = self._profile(version)
+            if item_id not in profile.preferences.watched_items:
+                profile.preferences.watched_items.append(item_id)
+                if max_price is not None:
+                    profile.preferences.price_thresholds[item_id] = max_price
+                self._mark_dirty(version)
 
     def remove_watched_item(self, version: GameVersion, item_id: int):
         """Elimina un item de la lista de observados."""
-        profile = self.get_profile(version)
-        if item_id in profile.preferences.watched_items:
-            profile.preferences.watched_items.remove(item_id)
-            profile.preferences.price_thresholds.pop(item_id, None)
-            self.save_profile(profile)
-
-    def update_auction_history(self, version: GameVersion, item_id: int, auction_data: dict):
-        """Actualiza el historial de subastas para un item."""
-        profile = self.get_profile(version)
-        if profile.auction_history is None:
-            profile.auction_history = {}
-        
-        if item_id not in profile.auction_history:
-            profile.auction_history[item_id] = []
-        
-        profile.auction_history[item_id].append(auction_data)
-        # Mantener solo los últimos 100 registros por item
-        if len(profile.auction_history[item_id]) > 100:
-            profile.auction_history[item_id] = profile.auction_history[item_id][-100:]
-        
-        self.save_profile(profile)
+        with self._lock:
+            profile = self._profile(version)
+            if item_id in profile.preferences.watched_items:
+                profile.preferences.watched_items.remove(item_id)
+                profile.preferences.price_thresholds.pop(item_id, None)
+                self._mark_dirty(version)
+
+    def set_price_threshold(self, version: GameVersion, item_id: int, max_price: int) -> bool:
+        """Fija el umbral de un item observado; ``False`` si no se observa."""
+        with self._lock:
+            profile = self._profile(version)
+            if item_id not in profile.preferences.watched_items:
+                return False
+            profile.preferences.price_thresholds[item_id] = max_price
+            self._mark_dirty(version)
+            return True
+
+    def update_auction_history(self, version: GameVersion, item_id: int, auction_data: dict, flush: bool = True):
+        """Añade un registro al historial de subastas de un item.
+
+        Con ``flush=False`` el registro queda en memoria hasta la próxima
+        llamada a :meth:`flush_history` (p. ej. una vez por escaneo).
+        """
+        with self._lock:
+            self.history.append(version.value, item_id, auction_data)
+            if flush:
+                self.history.flush()
+
+    def get_auction_history(self, version: GameVersion, item_id: int) -> List[dict]:
+        """Historial de un item sin cargar el perfil."""
+        with self._lock:
+            return self.history.get(version.value, item_id)
+
+    def _history_ids(self, version: GameVersion) -> List[int]:
+        with self._lock:
+            return self.history.item_ids(version.value)
+
+    def flush_history(self) -> int:
+        """Persiste los registros de historial pendientes."""
+        with self._lock:
+            return self.history.flush()
+
+
+def _flush_all() -> None:
+    """Escribe los cambios pendientes de todos los gestores vivos."""
+    for manager in list(_managers):
+        manager.flush()
+
+
+atexit.register(_flush_all)
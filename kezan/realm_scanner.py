@@ -0,0 +1,276 @@
+"""Escáner concurrente de varios reinos conectados.
+
+:class:`RealmScanner` descarga las subastas de N reinos (y del endpoint
+regional de commodities) en paralelo con un límite de concurrencia
+(``asyncio.Semaphore``) y dos cubos de tokens que respetan las cuotas de
+Blizzard por segundo y por hora.
+
+Blizzard publica un snapshot nuevo por reino aproximadamente cada hora, cada
+uno con su propio desfase. El escáner registra el momento en que se publicó
+la ``version`` de cada reino (cabecera ``Last-Modified`` de la respuesta, o
+el momento en que se vio si falta) y sólo vuelve a pedirlo cuando se espera su
+siguiente actualización, de modo que las peticiones quedan escalonadas a lo
+largo de la hora en lugar de concentrarse en ráfagas. Por reino se guardan la
+latencia de la última descarga y su media móvil.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+from kezan.blizzard_api import BlizzardAPI
+from kezan.config import SCAN_REALMS
+from kezan.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Cuotas publicadas de la API de Blizzard
+REQUESTS_PER_SECOND = 100
+REQUESTS_PER_HOUR = 36000
+
+UPDATE_PERIOD = 3600.0  # cada reino publica un snapshot por hora
+UPDATE_GRACE = 120.0  # margen tras la hora esperada antes de volver a pedir
+RETRY_DELAY = 300.0  # espera si el reino aún no ha publicado
+LATENCY_SMOOTHING = 0.2
+
+
+class TokenBucket:
+    """Cubo de tokens asíncrono.
+
+    Parámetros:
+    - rate (float): tokens repuestos por segundo.
+    - capacity (float): tokens máximos acumulables (ráfaga).
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._clock = clock
+        self._tokens = float(capacity)
+        self._stamp = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    @property
+    def available(self) -> float:
+        self._refill()
+        return self._tokens
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """Consume ``tokens`` si hay; si no, devuelve los segundos a esperar."""
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return 0.0
+        return (tokens - self._tokens) / self.rate
+
+    async def acquire(self, tokens: float = 1) -> None:
+        """Espera hasta poder consumir ``tokens``."""
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+@dataclass
+class RealmStats:
+    """Estado observado de un reino."""
+
+    realm: str
+    scans: int = 0
+    changes: int = 0
+    errors: int = 0
+    last_latency: Optional[float] = None
+    avg_latency: Optional[float] = None
+    version: Optional[str] = None
+    changed_at: Optional[float] = None  # epoch en que se publicó la versión actual
+    last_scan: Optional[float] = None
+
+    def next_update(self) -> Optional[float]:
+        """Momento estimado de la próxima publicación (epoch) o ``None``."""
+        if self.changed_at is None:
+            return None
+        return self.changed_at + UPDATE_PERIOD
+
+    def record(
+        self, latency: float, version: Optional[str], now: float, published: Optional[float] = None
+    ) -> bool:
+        """Registra una descarga; devuelve ``True`` si la versión cambió.
+
+        ``published`` es el epoch de publicación (``Last-Modified``); sin él
+        se toma ``now``, que llega tarde por el margen y la latencia.
+        """
+        self.scans += 1
+        self.last_scan = now
+        self.last_latency = latency
+        if self.avg_latency is None:
+            self.avg_latency = latency
+        else:
+            self.avg_latency += LATENCY_SMOOTHING * (latency - self.avg_latency)
+        changed = not version or version != self.version
+        if changed:
+            self.changes += 1
+            self.version = version
+            self.changed_at = now if published is None else min(published, now)
+        return changed
+
+
+def published_at(snapshot) -> Optional[float]:
+    """Epoch de la cabecera ``Last-Modified`` guardada en ``snapshot.meta``."""
+    value = (getattr(snapshot, "meta", None) or {}).get("last_modified")
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        logger.debug("Last-Modified no interpretable: %r", value)
+        return None
+
+
+@dataclass
+class RealmScanResult:
+    """Resultado de escanear un reino en una pasada."""
+
+    realm: str
+    snapshot: object = None
+    latency: float = 0.0
+    changed: bool = False
+    error: Optional[str] = None
+
+
+class RealmScanner:
+    """Descarga concurrente y escalonada de varios reinos.
+
+    Parámetros:
+    - realms (Iterable[str] | None): reinos conectados (IDs) y/o
+      ``"commodities"``; por defecto ``SCAN_REALMS``.
+    - api: objeto con ``async get_auctions(realm)``; por defecto :class:`BlizzardAPI`.
+    - concurrency (int): descargas simultáneas máximas.
+    - archive (PriceArchive | None): si se indica, cada snapshot nuevo se
+      agrega y se añade al archivo de precios horarios.
+    """
+
+    def __init__(
+        self,
+        realms: Optional[Iterable[str]] = None,
+        api=None,
+        concurrency: int = 4,
+        per_second: float = REQUESTS_PER_SECOND,
+        per_hour: float = REQUESTS_PER_HOUR,
+        clock: Callable[[], float] = time.time,
+        archive=None,
+    ):
+        self.realms: List[str] = [str(r) for r in (realms if realms is not None else SCAN_REALMS)]
+        self.api = api or BlizzardAPI()
+        self.concurrency = concurrency
+        self.second_bucket = TokenBucket(per_second, per_second)
+        self.hour_bucket = TokenBucket(per_hour / 3600.0, per_hour)
+        self.stats: Dict[str, RealmStats] = {realm: RealmStats(realm) for realm in self.realms}
+        self._clock = clock
+        self.archive = archive
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    # ------------------------------------------------------------------
+    # Planificación
+    # ------------------------------------------------------------------
+    def due_at(self, realm: str) -> float:
+        """Epoch a partir del cual conviene volver a pedir el reino."""
+        stats = self.stats[realm]
+        expected = stats.next_update()
+        if stats.last_scan is None:
+            return 0.0
+        if expected is None or stats.last_scan >= expected:
+            # Falló o ya se pidió tras la hora esperada sin cambios: reintentar más tarde
+            return stats.last_scan + RETRY_DELAY
+        return expected + UPDATE_GRACE
+
+    def due_realms(self, now: Optional[float] = None) -> List[str]:
+        """Reinos pendientes ordenados por su hora prevista de actualización."""
+        now = self._clock() if now is None else now
+        pending = [realm for realm in self.realms if self.due_at(realm) <= now]
+        return sorted(pending, key=self.due_at)
+
+    def next_delay(self, now: Optional[float] = None) -> float:
+        """Segundos hasta que el siguiente reino esté pendiente."""
+        now = self._clock() if now is None else now
+        if not self.realms:
+            return UPDATE_PERIOD
+        return max(min(self.due_at(realm) for realm in self.realms) - now, 0.0)
+
+    # ------------------------------------------------------------------
+    # Descarga
+    # ------------------------------------------------------------------
+    async def _scan_realm(self, realm: str) -> RealmScanResult:
+        async with self._semaphore:
+            await self.hour_bucket.acquire()
+            await self.second_bucket.acquire()
+            start = time.perf_counter()
+            try:
+                snapshot = await self.api.get_auctions(realm)
+            except Exception as exc:  # un reino caído no detiene la pasada
+                snapshot, error = None, str(exc)
+            else:
+                error = None if snapshot is not None else "sin datos"
+            latency = time.perf_counter() - start
+
+        stats = self.stats[realm]
+        if error:
+            stats.errors += 1
+            stats.last_scan = self._clock()
+            logger.warning("Escaneo de %s fallido (%.2fs): %s", realm, latency, error)
+            return RealmScanResult(realm, latency=latency, error=error)
+        changed = stats.record(
+            latency, getattr(snapshot, "version", None), self._clock(), published_at(snapshot)
+        )
+        if changed and self.archive is not None:
+            # Agregar y escribir el segmento no debe ocupar el bucle de eventos
+            await asyncio.to_thread(self.archive.append_snapshot, snapshot, int(self._clock() // 3600))
+        logger.info("Reino %s escaneado en %.2fs (%s)", realm, latency, "nuevo" if changed else "sin cambios")
+        return RealmScanResult(realm, snapshot=snapshot, latency=latency, changed=changed)
+
+    async def scan(self, realms: Optional[Iterable[str]] = None) -> Dict[str, RealmScanResult]:
+        """Escanea en paralelo los reinos indicados (por defecto, los pendientes).
+
+        Retorna:
+        - dict: resultado por reino.
+        """
+        targets = [str(r) for r in realms] if realms is not None else self.due_realms()
+        for realm in targets:
+            self.stats.setdefault(realm, RealmStats(realm))
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*(self._scan_realm(realm) for realm in targets))
+        return {result.realm: result for result in results}
+
+    async def run(self, on_result: Optional[Callable[[RealmScanResult], object]] = None) -> None:
+        """Bucle continuo: escanea los reinos pendientes y espera al siguiente."""
+        while True:
+            results = await self.scan()
+            if on_result is not None:
+                for result in results.values():
+                    if result.changed:
+                        outcome = on_result(result)
+                        if asyncio.iscoroutine(outcome):
+                            await outcome
+            await asyncio.sleep(max(self.next_delay(), 1.0))
+
+    def latency_report(self) -> Dict[str, Dict]:
+        """Latencias y contadores por reino."""
+        return {
+            realm: {
+                "last_latency": stats.last_latency,
+                "avg_latency": stats.avg_latency,
+                "scans": stats.scans,
+                "changes": stats.changes,
+                "errors": stats.errors,
+                "next_update": stats.next_update(),
+            }
+            for realm, stats in self.stats.items()
+        }
+
@@ -1,8 +1,16 @@
-from typing import Dict, List, Optional
-from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime
 import asyncio
 import logging
-from dataclasses import dataclass
+import threading
+from dataclasses import dataclass, replace
+
+import numpy as np
+
+from kezan import price_archive, processing
+from kezan.processing import ProcessedSnapshot
+from kezan.rolling_stats import RollingStats
+from kezan.snapshot import Snapshot, SnapshotDiff, diff_snapshots, time_left_name
 
 @dataclass
 class RealTimeAuctionData:
@@ -13,14 +21,215 @@ class RealTimeAuctionData:
     is_buyout: bool
     time_left: str
 
+class PriceIndex:
+    """Escalera de precios por item de un snapshot, precalculada al ingerir.
+
+    Las columnas están ordenadas por ``(item_id, precio)`` y sin lotes sin
+    precio; ``items``/``starts`` delimitan el tramo de cada item. ``cum_qty`` y
+    ``cum_cost`` son sumas acumuladas globales de unidades y de coste, así que
+    las unidades o el coste de cualquier prefijo de un tramo se obtienen
+    restando dos posiciones. Precio mínimo y máximo son O(1) y las consultas
+    de profundidad o "coste de comprar N" son una búsqueda binaria.
+    """
+
+    __slots__ = ("items", "starts", "prices", "quantities", "time_left", "buyout", "cum_qty", "cum_cost")
+
+    def __init__(self, item_id, prices, quantities, time_left=None, buyout=None):
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.quantities = np.asarray(quantities, dtype=np.int64)
+        n = self.prices.shape[0]
+        self.time_left = np.asarray(time_left if time_left is not None else np.full(n, -1), dtype=np.int8)
+        self.buyout = np.asarray(buyout if buyout is not None else np.zeros(n), dtype=bool)
+        item_id = np.asarray(item_id, dtype=np.int64)
+        if n:
+            heads = np.flatnonzero(np.concatenate(([True], item_id[1:] != item_id[:-1])))
+        else:
+            heads = np.empty(0, dtype=np.int64)
+        self.items = item_id[heads]
+        self.starts = np.append(heads, n).astype(np.int64)
+        self.cum_qty = np.cumsum(self.quantities)
+        self.cum_cost = np.cumsum(self.prices * self.quantities)
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Snapshot) -> "PriceIndex":
+        """Índice de un :class:`Snapshot` (ya ordenado por item y precio)."""
+        valid = ~np.isnan(snapshot.unit_price)  # lotes sin buyout
+        return cls(
+            snapshot.item_id[valid],
+            snapshot.unit_price[valid],
+            snapshot.quantity[valid],
+            time_left=snapshot.time_left[valid],
+            buyout=snapshot.buyout[valid] > 0,
+        )
+
+    @classmethod
+    def empty(cls) -> "PriceIndex":
+        return cls([], [], [])
+
+    def __len__(self) -> int:
+        return int(self.items.shape[0])
+
+    def __contains__(self, item_id: int) -> bool:
+        return self._bounds(item_id) is not None
+
+    def __iter__(self):
+        return iter(self.items.tolist())
+
+    def _bounds(self, item_id: int) -> Optional[Tuple[int, int]]:
+        pos = int(np.searchsorted(self.items, item_id))
+        if pos < self.items.shape[0] and self.items[pos] == item_id:
+            return int(self.starts[pos]), int(self.starts[pos + 1])
+        return None
+
+    def _qty_before(self, row: int) -> int:
+        return int(self.cum_qty[row - 1]) if row else 0
+
+    def _cost_before(self, row: int) -> float:
+        return float(self.cum_cost[row - 1]) if row else 0.0
+
+    def lowest(self, item_id: int) -> Optional[Dict]:
+        """Precio mínimo, unidades a ese precio y ``time_left`` del primer lote."""
+        bounds = self._bounds(item_id)
+        if bounds is None:
+            return None
+        start, end = bounds
+        price = float(self.prices[start])
+        last = start + int(np.searchsorted(self.prices[start:end], price, side="right"))
+        return {
+            "price": price,
+            "quantity": int(self.cum_qty[last - 1]) - self._qty_before(start),
+            "time_left": time_left_name(int(self.time_left[start])),
+        }
+
+    def summary(self, item_id: int) -> Optional[Dict]:
+        """Mínimo, máximo, unidades y número de lotes del item (O(log n))."""
+        bounds = self._bounds(item_id)
+        if bounds is None:
+            return None
+        start, end = bounds
+        return {
+            "lowest_price": float(self.prices[start]),
+            "highest_price": float(self.prices[end - 1]),
+            "available_quantity": int(self.cum_qty[end - 1]) - self._qty_before(start),
+            "num_auctions": end - start,
+        }
+
+    def cost_to_buy(self, item_id: int, units: int) -> Optional[float]:
+        """Coste de comprar las ``units`` unidades más baratas; ``None`` si no hay tantas."""
+        bounds = self._bounds(item_id)
+        if bounds is None or units <= 0:
+            return 0.0 if bounds is not None else None
+        start, end = bounds
+        base = self._qty_before(start)
+        target = base + units
+        if target > int(self.cum_qty[end - 1]):
+            return None
+        # Primer lote con el que se alcanzan las unidades pedidas
+        row = start + int(np.searchsorted(self.cum_qty[start:end], target, side="left"))
+        full_units = self._qty_before(row) - base
+        cost = self._cost_before(row) - self._cost_before(start)
+        return cost + (units - full_units) * float(self.prices[row])
+
+    def depth(self, item_id: int, max_price: float) -> int:
+        """Unidades disponibles a ``max_price`` o menos."""
+        bounds = self._bounds(item_id)
+        if bounds is None:
+            return 0
+        start, end = bounds
+        row = start + int(np.searchsorted(self.prices[start:end], max_price, side="right"))
+        return self._qty_before(row) - self._qty_before(start)
+
+    def lots(self, item_id: int, timestamp: Optional[datetime]) -> List[RealTimeAuctionData]:
+        """Materializa los lotes del item (sólo para consumidores heredados)."""
+        bounds = self._bounds(item_id)
+        if bounds is None:
+            return []
+        return [
+            RealTimeAuctionData(
+                timestamp=timestamp,
+                item_id=int(item_id),
+                current_price=float(self.prices[i]),
+                quantity=int(self.quantities[i]),
+                is_buyout=bool(self.buyout[i]),
+                time_left=time_left_name(int(self.time_left[i])),
+            )
+            for i in range(*bounds)
+        ]
+
+
+@dataclass(frozen=True)
+class MarketView:
+    """Estado publicado del monitor para un snapshot concreto.
+
+    Se construye completo fuera del bucle de eventos y se publica con una
+    única asignación, así que quien lea ``monitor.view`` (una vez) ve siempre
+    snapshot, índice y diff coherentes entre sí, nunca un libro a medias.
+    ``sequence`` aumenta en cada publicación. ``updated_at`` es la última vez
+    que la API confirmó el snapshot (también en un 304), así que la edad de
+    los datos se lee de la misma vista que los precios. ``processed`` trae
+    agregados, anomalías y gangas calculados en el pool de procesado.
+    """
+
+    version: Optional[str] = None
+    snapshot: Optional[Snapshot] = None
+    index: PriceIndex = PriceIndex.empty()
+    diff: Optional[SnapshotDiff] = None
+    built_at: Optional[datetime] = None
+    sequence: int = 0
+    updated_at: Optional[datetime] = None
+    processed: Optional[ProcessedSnapshot] = None
+
+
 class RealTimeAuctionMonitor:
-    def __init__(self):
+    """Monitor del libro de órdenes de un reino.
+
+    Con ``archive_prices`` cada snapshot nuevo se agrega también al archivo
+    local de precios horarios (:func:`kezan.price_archive.get_archive`) y con
+    ``rolling_stats`` se ingiere en las estadísticas móviles del detector de
+    gangas (que se guardan tras cada hora nueva); ambas cosas en el mismo
+    hilo en que se construye el snapshot, fuera del bucle de eventos.
+    """
+
+    def __init__(self, archive_prices: bool = False, rolling_stats: Optional[RollingStats] = None):
         self.logger = logging.getLogger(__name__)
-        self.current_data: Dict[int, List[RealTimeAuctionData]] = {}
-        self.last_update: Optional[datetime] = None
+        self.archive_prices = archive_prices
+        self.rolling_stats = rolling_stats
+        self.view = MarketView()  # snapshot publicado; se sustituye entero
+        self._build_lock = threading.Lock()  # una construcción a la vez
         self.is_monitoring = False
         self.update_interval = 60  # segundos (ajustable según la API de Blizzard)
 
+    @property
+    def index(self) -> PriceIndex:
+        """Escalera de precios del snapshot publicado."""
+        return self.view.index
+
+    @property
+    def snapshot(self) -> Optional[Snapshot]:
+        """Último snapshot publicado."""
+        return self.view.snapshot
+
+    @property
+    def snapshot_version(self) -> Optional[str]:
+        """Versión del último snapshot publicado."""
+        return self.view.version
+
+    @property
+    def bargains(self) -> List[Dict]:
+        """Gangas detectadas en el snapshot publicado (vacío sin estadísticas)."""
+        processed = self.view.processed
+        return processed.bargains if processed is not None else []
+
+    @property
+    def last_update(self) -> Optional[datetime]:
+        """Última confirmación del snapshot publicado por la API."""
+        return self.view.updated_at
+
+    @property
+    def last_diff(self) -> Optional[SnapshotDiff]:
+        """Cambios del snapshot publicado respecto al anterior."""
+        return self.view.diff
+
     async def start_monitoring(self, blizzard_api, realm: str):
         """Inicia el monitoreo en tiempo real de la casa de subastas."""
         self.is_monitoring = True
@@ -40,74 +249,139 @@ class RealTimeAuctionMonitor:
         """Actualiza los datos de subasta en tiempo real."""
         try:
             raw_data = await blizzard_api.get_auctions(realm)
-            self.last_update = datetime.now()
-            
-            # Limpiar datos antiguos
-            self.current_data.clear()
-            
-            # Procesar nuevos datos
-            for auction in raw_data:
-                item_id = auction['item']['id']
-                auction_data = RealTimeAuctionData(
-                    timestamp=self.last_update,
-                    item_id=item_id,
-                    current_price=auction['unit_price'],
-                    quantity=auction.get('quantity', 1),
-                    is_buyout=auction.get('buyout', 0) > 0,
-                    time_left=auction.get('time_left', 'UNKNOWN')
-                )
-                
-                if item_id not in self.current_data:
-                    self.current_data[item_id] = []
-                self.current_data[item_id].append(auction_data)
-
-            self.logger.info(f"Datos actualizados para {len(self.current_data)} items")
+            if raw_data is None:
+                self.logger.warning("No se recibieron datos de subasta")
+                return False
+
+            # Snapshot sin cambios (304): los datos cargados siguen vigentes
+            version = raw_data.version if isinstance(raw_data, Snapshot) else None
+            if version and version == self.snapshot_version:
+                self.logger.debug("Snapshot %s sin cambios; se omite el reprocesado", version)
+                self._touch(version)
+                return True
+
+            # Parseo, agregados y gangas en el pool de procesado; indexado en un
+            # hilo. El bucle de eventos sigue atendiendo y los lectores ven el
+            # snapshot anterior hasta la publicación
+            if not isinstance(raw_data, Snapshot):
+                raw_data = await asyncio.to_thread(Snapshot.from_auctions, raw_data)
+            processed = await self._analyze(raw_data)
+            await asyncio.to_thread(self._load_snapshot, raw_data, processed)
+            self.logger.info(f"Datos actualizados para {len(self.index)} items")
             return True
 
         except Exception as e:
             self.logger.error(f"Error actualizando datos: {e}")
             return False
 
-    def get_current_price(self, item_id: int) -> Optional[Dict]:
-        """Obtiene el precio actual más bajo para un item."""
-        if item_id not in self.current_data:
+    async def _analyze(self, snapshot: Snapshot) -> Optional[ProcessedSnapshot]:
+        """Agregados y gangas del snapshot, contra las estadísticas previas a su hora."""
+        history = self.rolling_stats.table() if self.rolling_stats is not None else None
+        try:
+            return await processing.analyze_snapshot(snapshot, history)
+        except Exception as exc:
+            # Sin agregados el libro se publica igualmente
+            self.logger.error("No se pudo procesar el snapshot: %s", exc)
             return None
 
-        current_auctions = self.current_data[item_id]
-        if not current_auctions:
-            return None
+    def _load_snapshot(self, raw_data, processed: Optional[ProcessedSnapshot] = None) -> None:
+        """Construye la vista del snapshot (o lista de lotes) y la publica.
 
-        lowest_price = min(auction.current_price for auction in current_auctions)
-        relevant_auctions = [
-            auction for auction in current_auctions 
-            if auction.current_price == lowest_price
-        ]
+        Todo el trabajo (columnas, índice y diff) se hace sobre objetos
+        nuevos; la vista anterior sigue intacta hasta la asignación final.
+        """
+        with self._build_lock:
+            # Las listas de la API se pasan a columnas antes de indexar
+            snapshot = raw_data if isinstance(raw_data, Snapshot) else Snapshot.from_auctions(raw_data)
+            previous = self.view
+            if snapshot.version and snapshot.version == previous.version:
+                self.view = replace(previous, updated_at=datetime.now())
+                return
+            now = datetime.now()
+            view = MarketView(
+                version=snapshot.version or None,
+                snapshot=snapshot,
+                index=PriceIndex.from_snapshot(snapshot),
+                diff=diff_snapshots(previous.snapshot, snapshot),
+                built_at=now,
+                sequence=previous.sequence + 1,
+                updated_at=now,
+                processed=processed,
+            )
+            self.view = view
+        if self.archive_prices:
+            try:
+                price_archive.get_archive().append_snapshot(snapshot)
+            except (OSError, ValueError) as exc:
+                self.logger.error("No se pudo archivar el snapshot: %s", exc)
+        if self.rolling_stats is not None:
+            try:
+                self.rolling_stats.record(snapshot)
+            except OSError as exc:
+                self.logger.error("No se pudieron guardar las estadísticas móviles: %s", exc)
+
+    def _touch(self, version: str) -> None:
+        """Republica la vista de ``version`` con la hora de confirmación actual.
 
+        Se llama desde el bucle de eventos, así que no espera al lock: si hay
+        una construcción en curso, ésta publicará su propia hora.
+        """
+        if not self._build_lock.acquire(blocking=False):
+            return
+        try:
+            view = self.view
+            if view.version == version:
+                self.view = replace(view, updated_at=datetime.now())
+        finally:
+            self._build_lock.release()
+
+    def changed_items(self) -> Optional[List[int]]:
+        """Items cuyo libro cambió en la última actualización (``None`` si no hubo)."""
+        if self.last_diff is None:
+            return None
+        return self.last_diff.changed_items.tolist()
+
+    def get_current_price(self, item_id: int) -> Optional[Dict]:
+        """Obtiene el precio actual más bajo para un item."""
+        view = self.view  # una sola lectura: precio y hora del mismo snapshot
+        lowest = view.index.lowest(item_id)
+        if lowest is None:
+            return None
         return {
-            'price': lowest_price,
-            'quantity': sum(auction.quantity for auction in relevant_auctions),
-            'timestamp': self.last_update.isoformat(),
-            'time_left': relevant_auctions[0].time_left
+            'price': lowest['price'],
+            'quantity': lowest['quantity'],
+            'timestamp': view.updated_at.isoformat(),
+            'time_left': lowest['time_left'],
         }
 
+    def lots(self, item_id: int) -> List[RealTimeAuctionData]:
+        """Lotes del item en el snapshot publicado, del más barato al más caro."""
+        view = self.view
+        return view.index.lots(item_id, view.updated_at)
+
+    def cost_to_buy(self, item_id: int, units: int) -> Optional[float]:
+        """Coste de comprar ``units`` unidades empezando por las más baratas."""
+        return self.index.cost_to_buy(item_id, units)
+
+    def depth(self, item_id: int, max_price: float) -> int:
+        """Unidades disponibles a ``max_price`` o menos."""
+        return self.index.depth(item_id, max_price)
+
     def get_market_snapshot(self, item_ids: List[int]) -> Dict:
         """Obtiene un snapshot del mercado para una lista de items."""
         snapshot = {}
         current_time = datetime.now()
+        view = self.view  # mismo snapshot y hora para todos los items
 
         for item_id in item_ids:
-            if item_id in self.current_data:
-                auctions = self.current_data[item_id]
-                prices = [auction.current_price for auction in auctions]
-                
-                snapshot[item_id] = {
-                    'lowest_price': min(prices),
-                    'highest_price': max(prices),
-                    'available_quantity': sum(auction.quantity for auction in auctions),
-                    'num_auctions': len(auctions),
-                    'timestamp': self.last_update.isoformat(),
-                    'age_seconds': (current_time - self.last_update).total_seconds()
-                }
+            summary = view.index.summary(item_id)
+            if summary is None:
+                continue
+            summary.update(
+                timestamp=view.updated_at.isoformat(),
+                age_seconds=(current_time - view.updated_at).total_seconds(),
+            )
+            snapshot[item_id] = summary
 
         return snapshot
 
@@ -131,7 +405,7 @@ class RealTimeMarketAnalyzer:
         analysis_data = {
             "current_market": current_data,
             "historical_context": historical_data[-10:] if historical_data else [],  # Últimos 10 registros
-            "market_age_seconds": (datetime.now() - self.monitor.last_update).total_seconds()
+            "market_age_seconds": (datetime.now() - datetime.fromisoformat(current_data["timestamp"])).total_seconds()
         }
 
         # Obtener análisis del LLM
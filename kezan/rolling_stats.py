@@ -0,0 +1,366 @@
+"""Estadísticas móviles (7d/30d) por item para el detector de gangas.
+
+:class:`RollingStats` ingiere cada snapshot horario y mantiene, por clave
+``(scope, item_id, quality)``, histogramas de precio por hora en bins
+logarítmicos (resolución ~1%). Los histogramas horarios viven en una ventana
+circular de 30 días: al llegar una hora nueva se restan de los agregados de
+7d/30d las horas que salen de cada ventana, de modo que la memoria por clave
+está acotada sin importar cuántos snapshots se hayan ingerido.
+
+Tras cada ingesta se recalculan las :class:`~kezan.bargain_detector.Stats` de
+las claves afectadas, por lo que :meth:`RollingStats.get_stats` es una simple
+búsqueda en diccionario. La clase cumple el protocolo
+:class:`~kezan.bargain_detector.History`.
+
+:class:`~kezan.realtime_monitor.RealTimeAuctionMonitor` ingiere cada snapshot
+nuevo (en el hilo donde lo construye) y guarda el estado con
+:meth:`RollingStats.save`; un lock por instancia serializa ingesta y guardado.
+
+Volumen y rotación son estimaciones: se considera vendida la caída de
+unidades listadas entre dos horas consecutivas de un item. Un item que falta
+en el snapshot de una hora se da por agotado (vende todo lo listado y se
+registra una hora vacía) y sus ventanas se siguen desplazando, de modo que
+no sirve estadísticas de 7d de datos que ya salieron de la ventana.
+"""
+from __future__ import annotations
+
+import math
+import os
+import pickle
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Deque, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from kezan.bargain_detector import Stats
+from kezan.logger import get_logger
+
+logger = get_logger(__name__)
+
+HOURS_7D = 7 * 24
+HOURS_30D = 30 * 24
+
+# Bins logarítmicos: bin k cubre [BIN_RATIO**k, BIN_RATIO**(k+1)).
+BIN_RATIO = 1.01
+_LOG_RATIO = math.log(BIN_RATIO)
+
+_DEFAULT_PATH = Path.home() / ".kezan" / "rolling_stats.pkl"
+_STATE_VERSION = 1
+
+Key = Tuple[str, int, Optional[int]]
+
+
+def price_bins(prices: np.ndarray) -> np.ndarray:
+    """Convierte precios (> 0) a índices de bin logarítmico."""
+    return np.floor(np.log(np.maximum(prices, 1e-9)) / _LOG_RATIO).astype(np.int64)
+
+
+def _weighted_median(values: np.ndarray, weights: np.ndarray) -> float:
+    order = np.argsort(values, kind="stable")
+    cum = np.cumsum(weights[order])
+    pos = int(np.searchsorted(cum, cum[-1] / 2.0))
+    return float(values[order][pos])
+
+
+class _HourEntry:
+    __slots__ = ("hour", "bins", "weights", "listed", "sold")
+
+    def __init__(self, hour: int, bins: np.ndarray, weights: np.ndarray, listed: int, sold: int):
+        self.hour = hour
+        self.bins = bins
+        self.weights = weights
+        self.listed = listed
+        self.sold = sold
+
+
+class _Series:
+    """Ventanas de 7d/30d de una clave con agregados incrementales."""
+
+    __slots__ = (
+        "window30", "window7", "agg30", "agg7", "listed7", "sold7", "last_hour", "last_listed", "last_seen",
+    )
+
+    def __init__(self) -> None:
+        self.window30: Deque[_HourEntry] = deque()
+        self.window7: Deque[_HourEntry] = deque()
+        self.agg30: Dict[int, int] = {}
+        self.agg7: Dict[int, int] = {}
+        self.listed7 = 0
+        self.sold7 = 0
+        self.last_hour: Optional[int] = None
+        self.last_listed: Optional[int] = None
+        self.last_seen: Optional[int] = None  # última hora con unidades listadas
+
+    @staticmethod
+    def _add(agg: Dict[int, int], entry: _HourEntry, sign: int) -> None:
+        for b, w in zip(entry.bins.tolist(), entry.weights.tolist()):
+            value = agg.get(b, 0) + sign * w
+            if value:
+                agg[b] = value
+            else:
+                agg.pop(b, None)
+
+    def _evict(self, hour: int) -> None:
+        while self.window7 and self.window7[0].hour <= hour - HOURS_7D:
+            old = self.window7.popleft()
+            self._add(self.agg7, old, -1)
+            self.listed7 -= old.listed
+            self.sold7 -= old.sold
+        while self.window30 and self.window30[0].hour <= hour - HOURS_30D:
+            self._add(self.agg30, self.window30.popleft(), -1)
+
+    def push(self, hour: int, bins: np.ndarray, weights: np.ndarray) -> bool:
+        if self.last_hour is not None and hour <= self.last_hour:
+            return False  # hora repetida o desordenada: se ignora
+        listed = int(weights.sum())
+        sold = max(self.last_listed - listed, 0) if self.last_listed is not None else 0
+        entry = _HourEntry(hour, bins, weights, listed, sold)
+        self._evict(hour)
+        self.window30.append(entry)
+        self.window7.append(entry)
+        self._add(self.agg30, entry, 1)
+        self._add(self.agg7, entry, 1)
+        self.listed7 += listed
+        self.sold7 += sold
+        self.last_hour = hour
+        self.last_listed = listed
+        if listed:
+            self.last_seen = hour
+        return True
+
+    def vacate(self, hour: int) -> bool:
+        """Hora ``hour`` sin lotes del item: agota lo listado y desplaza ventanas."""
+        if self.last_hour is not None and hour <= self.last_hour:
+            return False
+        if self.last_listed:
+            empty = np.empty(0, dtype=np.int64)
+            return self.push(hour, empty, empty)
+        self._evict(hour)
+        return True
+
+    def stats(self) -> Optional[Stats]:
+        if not self.agg7 or not self.agg30:
+            return None
+        bins7 = np.fromiter(self.agg7.keys(), dtype=np.int64)
+        w7 = np.fromiter(self.agg7.values(), dtype=np.float64)
+        bins30 = np.fromiter(self.agg30.keys(), dtype=np.int64)
+        w30 = np.fromiter(self.agg30.values(), dtype=np.float64)
+
+        centers7 = BIN_RATIO ** (bins7 + 0.5)
+        p50_7d = _weighted_median(centers7, w7)
+        p50_30d = _weighted_median(BIN_RATIO ** (bins30 + 0.5), w30)
+        mad_7d = _weighted_median(np.abs(centers7 - p50_7d), w7)
+
+        hours7 = len(self.window7)
+        mean_listed = self.listed7 / hours7 if hours7 else 0.0
+        days = max(hours7 / 24.0, 1.0)
+        rot = (self.sold7 / days) / mean_listed if mean_listed > 0 else 0.0
+        return Stats(
+            P50_7d=p50_7d,
+            P50_30d=p50_30d,
+            MAD_7d=mad_7d,
+            vol_7d=float(self.sold7),
+            rot=round(rot, 4),
+        )
+
+
+@dataclass(frozen=True)
+class StatsTable:
+    """Copia inmutable de las estadísticas, serializable con pickle.
+
+    Es lo que viaja al pool de :mod:`kezan.processing` para detectar gangas;
+    cumple el protocolo :class:`~kezan.bargain_detector.History`.
+    """
+
+    stats: Dict[Key, Stats]
+
+    def get_stats(self, key: tuple) -> Optional[Stats]:
+        return self.stats.get(key)
+
+
+class RollingStats:
+    """Motor persistente de estadísticas móviles por ``(scope, item_id, quality)``.
+
+    Parámetros:
+    - path (str | None): fichero de estado; si existe se carga al iniciar.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path) if path else _DEFAULT_PATH
+        self._series: Dict[Key, _Series] = {}
+        self._stats: Dict[Key, Stats] = {}
+        self.last_hour: Optional[int] = None
+        self._lock = threading.RLock()
+        if self.path.exists():
+            self._load()
+        self._table = StatsTable(dict(self._stats))
+
+    # ------------------------------------------------------------------
+    # Ingesta
+    # ------------------------------------------------------------------
+    def ingest_item(
+        self,
+        scope: str,
+        item_id: int,
+        prices: Iterable[float],
+        quantities: Iterable[int],
+        hour: int,
+        quality: Optional[int] = None,
+    ) -> bool:
+        """Añade la hora ``hour`` de un item y actualiza sus estadísticas.
+
+        Retorna ``False`` si la hora ya estaba ingerida (o es anterior).
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        quantities = np.asarray(quantities, dtype=np.int64)
+        valid = np.isfinite(prices) & (prices > 0)
+        bins, inverse = np.unique(price_bins(prices[valid]), return_inverse=True)
+        weights = np.bincount(inverse, weights=quantities[valid], minlength=bins.size).astype(np.int64)
+        with self._lock:
+            pushed = self._push((str(scope), int(item_id), quality), hour, bins, weights)
+            self._table = StatsTable(dict(self._stats))
+            return pushed
+
+    def ingest(self, snapshot, scope: str, hour: Optional[int] = None, quality: Optional[int] = None) -> int:
+        """Ingiere un :class:`~kezan.snapshot.Snapshot` completo.
+
+        Parámetros:
+        - snapshot: snapshot columnar de la hora.
+        - scope (str): región o ID de reino conectado.
+        - hour (int | None): hora absoluta (``epoch // 3600``); por defecto la actual.
+
+        Retorna:
+        - int: número de items actualizados.
+        """
+        hour = int(time.time() // 3600) if hour is None else int(hour)
+        valid = np.isfinite(snapshot.unit_price) & (snapshot.unit_price > 0)
+        item_ids = snapshot.item_id[valid]
+        if not item_ids.size:
+            return 0
+        bins = price_bins(snapshot.unit_price[valid])
+        # Agregación (item, bin) -> unidades para todo el snapshot de una vez
+        pairs = np.stack((item_ids, bins), axis=1)
+        uniq, inverse = np.unique(pairs, axis=0, return_inverse=True)
+        weights = np.bincount(inverse.ravel(), weights=snapshot.quantity[valid], minlength=len(uniq)).astype(np.int64)
+        starts = np.flatnonzero(np.concatenate(([True], uniq[1:, 0] != uniq[:-1, 0])))
+        ends = np.append(starts[1:], len(uniq))
+
+        scope = str(scope)
+        with self._lock:
+            updated = 0
+            for s, e in zip(starts.tolist(), ends.tolist()):
+                key = (scope, int(uniq[s, 0]), quality)
+                updated += self._push(key, hour, uniq[s:e, 1].copy(), weights[s:e])
+            # Items del mismo scope ausentes esta hora: agotados o retirados
+            present = set(uniq[starts, 0].tolist())
+            for key, series in self._series.items():
+                if key[0] == scope and key[2] == quality and key[1] not in present and series.vacate(hour):
+                    self._refresh(key, series)
+            self.last_hour = hour if self.last_hour is None else max(self.last_hour, hour)
+            self._prune(hour)
+            self._table = StatsTable(dict(self._stats))
+            return updated
+
+    def record(self, snapshot, hour: Optional[int] = None) -> int:
+        """Ingiere un snapshot con el scope de sus columnas y guarda el estado.
+
+        Sólo se escribe en disco si la hora aportó datos nuevos. Retorna el
+        número de items actualizados.
+        """
+        if not len(snapshot):
+            return 0
+        updated = self.ingest(snapshot, scope=str(int(snapshot.scope[0])), hour=hour)
+        if updated:
+            self.save()
+        return updated
+
+    def _push(self, key: Key, hour: int, bins: np.ndarray, weights: np.ndarray) -> bool:
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _Series()
+        if not series.push(hour, bins, weights):
+            return False
+        self._refresh(key, series)
+        return True
+
+    def _refresh(self, key: Key, series: _Series) -> None:
+        stats = series.stats()
+        if stats is None:
+            self._stats.pop(key, None)
+        else:
+            self._stats[key] = stats
+
+    def _prune(self, hour: int) -> None:
+        """Descarta claves sin lotes listados en los últimos 30 días."""
+        stale = [
+            key for key, series in self._series.items()
+            if series.last_seen is None or series.last_seen <= hour - HOURS_30D
+        ]
+        for key in stale:
+            del self._series[key]
+            self._stats.pop(key, None)
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+    def get_stats(self, key: tuple) -> Optional[Stats]:
+        """Devuelve las estadísticas precalculadas de la clave (O(1))."""
+        return self._stats.get(key)
+
+    def table(self) -> StatsTable:
+        """Estadísticas publicadas tras la última ingesta (lectura sin lock)."""
+        return self._table
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    # ------------------------------------------------------------------
+    # Persistencia
+    # ------------------------------------------------------------------
+    def save(self) -> None:
+        """Guarda el estado de forma atómica (fichero temporal + rename)."""
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            state = {
+                "version": _STATE_VERSION,
+                "last_hour": self.last_hour,
+                "series": {
+                    key: [(e.hour, e.bins, e.weights, e.listed, e.sold) for e in series.window30]
+                    + [series.last_listed]
+                    for key, series in self._series.items()
+                },
+            }
+            tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+            with open(tmp, "wb") as fh:
+                pickle.dump(state, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.path)
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "rb") as fh:
+                state = pickle.load(fh)
+        except (OSError, pickle.UnpicklingError, EOFError) as exc:
+            logger.error("No se pudo cargar %s: %s", self.path, exc)
+            return
+        if state.get("version") != _STATE_VERSION:
+            logger.warning("Versión de estado desconocida en %s; se ignora", self.path)
+            return
+        self.last_hour = state.get("last_hour")
+        for key, payload in state.get("series", {}).items():
+            *entries, last_listed = payload
+            series = _Series()
+            for hour, bins, weights, listed, sold in entries:
+                series.push(hour, bins, weights)
+                # Conservar el volumen estimado original de cada hora
+                entry = series.window30[-1]
+                series.sold7 += sold - entry.sold
+                entry.sold = sold
+            series.last_listed = last_listed
+            self._series[key] = series
+            stats = series.stats()
+            if stats is not None:
+                self._stats[key] = stats
@@ -1,7 +1,10 @@
+import asyncio
+
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional, List
 from kezan.profile_manager import ProfileManager, GameVersion
+from kezan.price_archive import get_archive
 
 router = APIRouter(prefix="/api/profile")
 profile_manager = ProfileManager()
@@ -23,7 +26,7 @@ class ThresholdUpdate(BaseModel):
 async def get_profile(version: str):
     try:
         game_version = GameVersion(version)
-        profile = profile_manager.get_profile(game_version)
+        profile = await profile_manager.call(profile_manager.get_profile, game_version)
         return {
             "version": version,
             "preferences": {
@@ -40,7 +43,8 @@ async def get_profile(version: str):
 async def update_profile(version: str, preferences: ProfilePreferences):
     try:
         game_version = GameVersion(version)
-        profile_manager.update_preferences(
+        await profile_manager.call(
+            profile_manager.update_preferences,
             game_version,
             default_realm=preferences.default_realm,
             watched_items=preferences.watched_items,
@@ -55,7 +59,7 @@ async def update_profile(version: str, preferences: ProfilePreferences):
 async def add_watched_item(version: str, item: WatchedItemRequest):
     try:
         game_version = GameVersion(version)
-        profile_manager.add_watched_item(game_version, item.itemId, item.maxPrice)
+        await profile_manager.call(profile_manager.add_watched_item, game_version, item.itemId, item.maxPrice)
         return {"status": "success"}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -64,7 +68,7 @@ async def add_watched_item(version: str, item: WatchedItemRequest):
 async def remove_watched_item(version: str, item_id: int):
     try:
         game_version = GameVersion(version)
-        profile_manager.remove_watched_item(game_version, item_id)
+        await profile_manager.call(profile_manager.remove_watched_item, game_version, item_id)
         return {"status": "success"}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -73,22 +77,23 @@ async def remove_watched_item(version: str, item_id: int):
 async def update_threshold(version: str, item_id: int, threshold: ThresholdUpdate):
     try:
         game_version = GameVersion(version)
-        profile = profile_manager.get_profile(game_version)
-        if item_id not in profile.preferences.watched_items:
+        found = await profile_manager.call(
+            profile_manager.set_price_threshold, game_version, item_id, threshold.maxPrice
+        )
+        if not found:
             raise HTTPException(status_code=404, detail="Item no encontrado")
-        
-        profile.preferences.price_thresholds[item_id] = threshold.maxPrice
-        profile_manager.save_profile(profile)
         return {"status": "success"}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/{version}/items/{item_id}/history")
-async def get_price_history(version: str, item_id: int):
+async def get_price_history(version: str, item_id: int, days: int = 90):
     try:
         game_version = GameVersion(version)
-        profile = profile_manager.get_profile(game_version)
-        history = profile.auction_history.get(item_id, [])
-        return {"history": history}
+        await profile_manager.call(profile_manager.get_profile, game_version)  # valida que el perfil exista
+        history = await profile_manager.call(profile_manager.get_auction_history, game_version, item_id)
+        # Serie horaria agregada del archivo local (sólo se leen las filas del item)
+        series = await asyncio.to_thread(get_archive().series, item_id, days=days)
+        return {"history": history, "series": series}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -5,7 +5,9 @@ disponibles (cuando existan), devolviendo métricas básicas.
 """
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
+
+from kezan.price_archive import HISTORY_DAYS, PriceArchive, get_archive
 
 
 @dataclass
@@ -17,6 +19,19 @@ class SimulationResult:
     notes: str
 
 
+def load_history(
+    item_id: int,
+    scope: Optional[int] = None,
+    days: int = HISTORY_DAYS,
+    archive: Optional[PriceArchive] = None,
+) -> List[Dict[str, Any]]:
+    """Serie horaria de ``item_id`` desde el archivo local de precios.
+
+    Sólo se leen las filas del item (ver :mod:`kezan.price_archive`).
+    """
+    return (archive or get_archive()).series(item_id, scope=scope, days=days)
+
+
 def run_backtest(strategy: Dict[str, Any], history: List[Dict[str, Any]] | None = None) -> SimulationResult:
     """Backtest mínimo placeholder.
 
@@ -0,0 +1,410 @@
+"""Snapshot columnar de subastas.
+
+El payload de Blizzard (``{"auctions": [...]}``) se parsea una única vez a
+columnas NumPy ordenadas por ``(item_id, unit_price)``. Junto a las columnas se
+guarda un índice ``item_id → rango de filas`` de forma que cada consulta por
+item es un slice contiguo y los agregados por item se resuelven con
+operaciones vectorizadas en lugar de recorrer listas de diccionarios.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from kezan.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Códigos compactos para ``time_left`` (int8). ``-1`` representa desconocido.
+TIME_LEFT_NAMES = ("SHORT", "MEDIUM", "LONG", "VERY_LONG")
+TIME_LEFT_CODES = {name: code for code, name in enumerate(TIME_LEFT_NAMES)}
+TIME_LEFT_UNKNOWN = -1
+
+# Ámbito por defecto para lotes de commodities (regionales).
+REGION_SCOPE = 0
+
+
+def time_left_name(code: int) -> str:
+    """Devuelve el nombre de ``time_left`` correspondiente a un código."""
+    if 0 <= code < len(TIME_LEFT_NAMES):
+        return TIME_LEFT_NAMES[code]
+    return "UNKNOWN"
+
+
+def lot_unit_price(entry: Dict) -> float:
+    """Precio unitario normalizado de un lote de la API (``NaN`` si no tiene).
+
+    Commodities traen ``unit_price``; el resto ``buyout`` por el lote completo.
+    """
+    up = entry.get("unit_price")
+    if up is not None:
+        return up
+    bo = entry.get("buyout") or 0
+    return bo / (entry.get("quantity") or 1) if bo else float("nan")
+
+
+@dataclass(frozen=True, eq=False)
+class Snapshot:
+    """Subastas de un escaneo almacenadas en columnas NumPy.
+
+    Todas las columnas tienen la misma longitud y están ordenadas por
+    ``item_id`` y, dentro de cada item, por ``unit_price`` ascendente (orden
+    estable respecto al payload). ``items`` contiene los IDs únicos ordenados y
+    ``starts`` los offsets de cada item (``len(items) + 1`` elementos), de modo
+    que las filas del item ``items[k]`` son ``starts[k]:starts[k + 1]``.
+
+    ``unit_price`` es el precio unitario normalizado: ``unit_price`` para
+    commodities o ``buyout / quantity`` para el resto; ``NaN`` si el lote no
+    tiene precio de compra inmediata.
+    """
+
+    auction_id: np.ndarray
+    item_id: np.ndarray
+    quantity: np.ndarray
+    unit_price: np.ndarray
+    buyout: np.ndarray
+    bid: np.ndarray
+    time_left: np.ndarray
+    scope: np.ndarray
+    items: np.ndarray
+    starts: np.ndarray
+    version: str = ""
+    meta: Dict = field(default_factory=dict)
+
+    # ------------------------------------------------------------------
+    # Construcción
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_columns(
+        cls,
+        *,
+        item_id,
+        quantity,
+        unit_price,
+        auction_id=None,
+        buyout=None,
+        bid=None,
+        time_left=None,
+        scope=None,
+        version: str = "",
+        meta: Optional[Dict] = None,
+    ) -> "Snapshot":
+        """Construye un snapshot a partir de columnas (en cualquier orden).
+
+        Las columnas opcionales se rellenan con ceros (``time_left`` con
+        :data:`TIME_LEFT_UNKNOWN`). Las filas se reordenan y se indexan.
+        """
+        item_id = np.asarray(item_id, dtype=np.int64)
+        n = item_id.shape[0]
+
+        def _col(values, dtype, fill):
+            if values is None:
+                return np.full(n, fill, dtype=dtype)
+            arr = np.asarray(values, dtype=dtype)
+            if arr.shape[0] != n:
+                raise ValueError("Todas las columnas deben tener la misma longitud")
+            return arr
+
+        quantity = _col(quantity, np.int64, 1)
+        unit_price = _col(unit_price, np.float64, np.nan)
+        auction_id = _col(auction_id, np.int64, 0)
+        buyout = _col(buyout, np.int64, 0)
+        bid = _col(bid, np.int64, 0)
+        time_left = _col(time_left, np.int8, TIME_LEFT_UNKNOWN)
+        scope = _col(scope, np.int64, REGION_SCOPE)
+
+        # Orden por item y precio; NaN queda al final de cada item.
+        order = np.lexsort((unit_price, item_id))
+        item_id = item_id[order]
+        items, first = np.unique(item_id, return_index=True)
+        starts = np.append(first, n).astype(np.int64)
+
+        return cls(
+            auction_id=auction_id[order],
+            item_id=item_id,
+            quantity=quantity[order],
+            unit_price=unit_price[order],
+            buyout=buyout[order],
+            bid=bid[order],
+            time_left=time_left[order],
+            scope=scope[order],
+            items=items,
+            starts=starts,
+            version=version,
+            meta=dict(meta or {}),
+        )
+
+    @classmethod
+    def from_auctions(
+        cls,
+        auctions: Iterable[Dict],
+        scope: int = REGION_SCOPE,
+        version: str = "",
+    ) -> "Snapshot":
+        """Parsea una lista de lotes de la API de Blizzard.
+
+        Los lotes sin ``item.id`` se descartan (con un único aviso en el log).
+        """
+        builder = SnapshotBuilder(scope=scope, version=version)
+        builder.extend(auctions)
+        return builder.build()
+
+    @classmethod
+    def from_payload(
+        cls, payload: Dict, scope: int = REGION_SCOPE, version: str = ""
+    ) -> "Snapshot":
+        """Parsea el JSON completo devuelto por el endpoint de subastas."""
+        return cls.from_auctions(payload.get("auctions", []) or [], scope=scope, version=version)
+
+    # ------------------------------------------------------------------
+    # Lecturas
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return int(self.item_id.shape[0])
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes ocupados por las columnas (sin ``meta``)."""
+        return sum(column.nbytes for column in (
+            self.auction_id, self.item_id, self.quantity, self.unit_price, self.buyout,
+            self.bid, self.time_left, self.scope, self.items, self.starts,
+        ))
+
+    def __contains__(self, item_id: int) -> bool:
+        return self._position(item_id) is not None
+
+    def _position(self, item_id: int) -> Optional[int]:
+        pos = int(np.searchsorted(self.items, item_id))
+        if pos < self.items.shape[0] and self.items[pos] == item_id:
+            return pos
+        return None
+
+    def rows(self, item_id: int) -> slice:
+        """Rango de filas del item (slice vacío si no está presente)."""
+        pos = self._position(item_id)
+        if pos is None:
+            return slice(0, 0)
+        return slice(int(self.starts[pos]), int(self.starts[pos + 1]))
+
+    def prices(self, item_id: int) -> np.ndarray:
+        """Precios unitarios del item, ordenados de menor a mayor (vista)."""
+        return self.unit_price[self.rows(item_id)]
+
+    def quantities(self, item_id: int) -> np.ndarray:
+        """Cantidades del item alineadas con :meth:`prices` (vista)."""
+        return self.quantity[self.rows(item_id)]
+
+    def select(self, item_ids: Iterable[int]) -> np.ndarray:
+        """Máscara booleana de las filas cuyos items están en ``item_ids``."""
+        wanted = np.asarray(list(item_ids), dtype=np.int64)
+        return np.isin(self.item_id, wanted)
+
+    def subset(self, item_ids: Iterable[int]) -> "Snapshot":
+        """Snapshot con sólo las filas de ``item_ids`` (misma versión y scope)."""
+        mask = self.select(item_ids)
+        return Snapshot.from_columns(
+            auction_id=self.auction_id[mask],
+            item_id=self.item_id[mask],
+            quantity=self.quantity[mask],
+            unit_price=self.unit_price[mask],
+            buyout=self.buyout[mask],
+            bid=self.bid[mask],
+            time_left=self.time_left[mask],
+            scope=self.scope[mask],
+            version=self.version,
+            meta=self.meta,
+        )
+
+    def min_prices(self) -> np.ndarray:
+        """Precio mínimo por item alineado con ``items``.
+
+        Como cada segmento está ordenado por precio, el mínimo es la primera
+        fila del segmento.
+        """
+        if not len(self):
+            return np.empty(0, dtype=np.float64)
+        return self.unit_price[self.starts[:-1]]
+
+    def to_auctions(self, limit: Optional[int] = None) -> List[Dict]:
+        """Materializa (parte de) las filas como diccionarios estilo API.
+
+        Útil para prompts o consumidores heredados que esperan listas de
+        diccionarios; ``limit`` evita materializar el snapshot completo.
+        """
+        n = len(self) if limit is None else min(limit, len(self))
+        out: List[Dict] = []
+        for i in range(n):
+            price = float(self.unit_price[i])
+            entry = {
+                "id": int(self.auction_id[i]),
+                "item": {"id": int(self.item_id[i])},
+                "quantity": int(self.quantity[i]),
+                "time_left": time_left_name(int(self.time_left[i])),
+            }
+            if not np.isnan(price):
+                entry["unit_price"] = price
+            if self.buyout[i]:
+                entry["buyout"] = int(self.buyout[i])
+            if self.bid[i]:
+                entry["bid"] = int(self.bid[i])
+            out.append(entry)
+        return out
+
+
+@dataclass(frozen=True, eq=False)
+class SnapshotDiff:
+    """Cambios entre dos snapshots consecutivos, por ID de subasta.
+
+    ``added`` son lotes nuevos, ``removed`` los vendidos o caducados y
+    ``repriced`` los que siguen publicados con otro precio unitario.
+    ``changed_items`` (ordenado) incluye además los items cuyos lotes
+    cambiaron de cantidad (compras parciales de commodities).
+    """
+
+    added: np.ndarray
+    removed: np.ndarray
+    repriced: np.ndarray
+    changed_items: np.ndarray
+
+    def __bool__(self) -> bool:
+        return bool(self.changed_items.size)
+
+    def __contains__(self, item_id: int) -> bool:
+        pos = int(np.searchsorted(self.changed_items, item_id))
+        return pos < self.changed_items.size and self.changed_items[pos] == item_id
+
+    def counts(self) -> Dict[str, int]:
+        """Número de lotes nuevos, retirados y con nuevo precio, e items afectados."""
+        return {
+            "added": int(self.added.size),
+            "removed": int(self.removed.size),
+            "repriced": int(self.repriced.size),
+            "changed_items": int(self.changed_items.size),
+        }
+
+
+def _has_unique_ids(ids: np.ndarray) -> bool:
+    """IDs ya ordenados, todos informados (``!= 0``) y sin repetir."""
+    return bool(ids.size == 0 or (ids[0] != 0 and not np.any(ids[1:] == ids[:-1])))
+
+
+def _diff_by_item(old: Snapshot, new: Snapshot) -> SnapshotDiff:
+    """Alternativa sin IDs de subasta: compara el libro de cada item."""
+    changed = []
+    for item_id in np.union1d(old.items, new.items).tolist():
+        a, b = old.rows(item_id), new.rows(item_id)
+        if not (
+            np.array_equal(old.unit_price[a], new.unit_price[b], equal_nan=True)
+            and np.array_equal(old.quantity[a], new.quantity[b])
+        ):
+            changed.append(item_id)
+    empty = np.empty(0, dtype=np.int64)
+    return SnapshotDiff(empty, empty, empty, np.asarray(changed, dtype=np.int64))
+
+
+def diff_snapshots(old: Optional[Snapshot], new: Snapshot) -> SnapshotDiff:
+    """Calcula el diff entre ``old`` y ``new`` por ID de subasta.
+
+    Se ordenan los IDs de ambos snapshots y se cruzan con operaciones de
+    conjuntos sobre arrays ordenados (``intersect1d``/máscaras), sin
+    diccionarios intermedios. Si algún snapshot no trae IDs únicos (p. ej.
+    construido a mano), se comparan los libros item a item.
+    """
+    if old is None:
+        empty = np.empty(0, dtype=np.int64)
+        return SnapshotDiff(np.sort(new.auction_id), empty, empty, new.items.copy())
+
+    old_order = np.argsort(old.auction_id, kind="stable")
+    new_order = np.argsort(new.auction_id, kind="stable")
+    old_ids = old.auction_id[old_order]
+    new_ids = new.auction_id[new_order]
+    if not (_has_unique_ids(old_ids) and _has_unique_ids(new_ids)):
+        return _diff_by_item(old, new)
+
+    _, old_pos, new_pos = np.intersect1d(old_ids, new_ids, assume_unique=True, return_indices=True)
+    kept_old = np.zeros(old_ids.size, dtype=bool)
+    kept_old[old_pos] = True
+    kept_new = np.zeros(new_ids.size, dtype=bool)
+    kept_new[new_pos] = True
+
+    old_rows = old_order[old_pos]
+    new_rows = new_order[new_pos]
+    old_price, new_price = old.unit_price[old_rows], new.unit_price[new_rows]
+    price_changed = ~((old_price == new_price) | (np.isnan(old_price) & np.isnan(new_price)))
+    qty_changed = old.quantity[old_rows] != new.quantity[new_rows]
+
+    changed_items = np.unique(np.concatenate((
+        new.item_id[new_order[~kept_new]],
+        old.item_id[old_order[~kept_old]],
+        new.item_id[new_rows[price_changed | qty_changed]],
+    )))
+    return SnapshotDiff(
+        added=new_ids[~kept_new],
+        removed=old_ids[~kept_old],
+        repriced=new.auction_id[new_rows[price_changed]],
+        changed_items=changed_items,
+    )
+
+
+class SnapshotBuilder:
+    """Acumula lotes en buffers columnares y construye un :class:`Snapshot`.
+
+    Permite rellenar las columnas lote a lote mientras llegan (por ejemplo
+    desde :class:`~kezan.auction_stream.AuctionStreamDecoder`) sin conservar
+    los diccionarios originales.
+    """
+
+    def __init__(self, scope: int = REGION_SCOPE, version: str = ""):
+        self.scope = scope
+        self.version = version
+        self.skipped = 0
+        self._auction_id: List[int] = []
+        self._item_id: List[int] = []
+        self._quantity: List[int] = []
+        self._unit_price: List[float] = []
+        self._buyout: List[int] = []
+        self._bid: List[int] = []
+        self._time_left: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self._item_id)
+
+    def append(self, entry: Dict) -> bool:
+        """Añade un lote; devuelve ``False`` si se descarta por no tener item."""
+        iid = (entry.get("item") or {}).get("id")
+        if not iid:
+            self.skipped += 1
+            return False
+        qty = entry.get("quantity") or 1
+        bo = entry.get("buyout") or 0
+        self._auction_id.append(entry.get("id") or 0)
+        self._item_id.append(iid)
+        self._quantity.append(qty)
+        self._unit_price.append(lot_unit_price(entry))
+        self._buyout.append(bo)
+        self._bid.append(entry.get("bid") or 0)
+        self._time_left.append(TIME_LEFT_CODES.get(entry.get("time_left"), TIME_LEFT_UNKNOWN))
+        return True
+
+    def extend(self, entries: Iterable[Dict]) -> None:
+        """Añade varios lotes."""
+        for entry in entries:
+            self.append(entry)
+
+    def build(self) -> Snapshot:
+        """Convierte los buffers en un :class:`Snapshot` ordenado e indexado."""
+        if self.skipped:
+            logger.warning("%d entradas sin item ID descartadas", self.skipped)
+        return Snapshot.from_columns(
+            auction_id=self._auction_id,
+            item_id=self._item_id,
+            quantity=self._quantity,
+            unit_price=self._unit_price,
+            buyout=self._buyout,
+            bid=self._bid,
+            time_left=self._time_left,
+            scope=np.full(len(self._item_id), self.scope, dtype=np.int64),
+            version=self.version,
+        )
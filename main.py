@@ -1,7 +1,18 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from kezan import http_client
 from kezan.api import router as kezan_router
 
-app = FastAPI(title="Kezan Protocol")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Cerrar el pool de conexiones HTTP compartido
+    await http_client.aclose_all()
+
+
+app = FastAPI(title="Kezan Protocol", lifespan=lifespan)
 
 app.include_router(kezan_router)
 
@@ -3,6 +3,8 @@ import os
 import sys
 from pathlib import Path
 
+import pytest
+
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
@@ -13,3 +15,23 @@ collect_ignore_glob = [
     "integration_tests/*",
     "security_tests/*",
 ]
+
+
+@pytest.fixture(autouse=True)
+def _local_stores(tmp_path, monkeypatch):
+    """Aísla los almacenes persistentes (items, precios, caché del LLM) y el procesado en cada prueba."""
+    from kezan import item_db, item_resolver, llm_cache, price_archive, processing, rolling_stats
+
+    monkeypatch.setattr(item_resolver, "ITEMS_FILE", tmp_path / "items.sqlite3")
+    monkeypatch.setattr(item_db, "STATIC_DIR", tmp_path / "static_items")
+    monkeypatch.setattr(price_archive, "ARCHIVE_DIR", tmp_path / "price_archive")
+    monkeypatch.setattr(llm_cache, "CACHE_FILE", tmp_path / "llm_cache.sqlite3")
+    monkeypatch.setattr(rolling_stats, "_DEFAULT_PATH", tmp_path / "rolling_stats.pkl")
+    # Procesado en hilo: las pruebas del pool crean su propio SnapshotProcessor
+    monkeypatch.setattr(processing, "_processor", processing.SnapshotProcessor(workers=0))
+    llm_cache.close()
+    item_db.close_stores()
+    yield
+    item_resolver.close()
+    item_db.close_stores()
+    llm_cache.close()
@@ -0,0 +1,52 @@
+"""Pruebas para la tabla de márgenes por snapshot."""
+
+import numpy as np
+import pytest
+
+from kezan import analyzer
+from kezan.analyzer import MarginTable
+from kezan.snapshot import Snapshot
+
+
+def _table(margins):
+    margins = np.asarray(margins, dtype=float)
+    order = np.argsort(-margins, kind="stable")
+    n = margins.size
+    return MarginTable(
+        margins=margins[order],
+        item_ids=np.arange(n)[order],
+        unit_prices=np.ones(n),
+        avg_prices=np.ones(n),
+    )
+
+
+@pytest.mark.parametrize("min_margin", [-1.0, 0.0, 0.1, 0.25, 0.3, 0.31, 0.9, 2.0])
+def test_count_matches_linear_scan(min_margin):
+    margins = [0.3, 0.1, 0.5, 0.3, 0.0, 0.25, 0.9]
+    table = _table(margins)
+    assert table.count_at_least(min_margin) == sum(m >= min_margin for m in margins)
+    top = table.top(limit=3, min_margin=min_margin)
+    assert [row["margin"] for row in top] == sorted((m for m in margins if m >= min_margin), reverse=True)[:3]
+
+
+def test_top_respects_limit_and_ties():
+    table = _table([0.3, 0.3, 0.3])
+    assert [row["id"] for row in table.top(limit=2, min_margin=0.3)] == [0, 1]
+    assert table.top(limit=0, min_margin=0) == []
+
+
+def test_margin_table_reused_per_version(monkeypatch):
+    monkeypatch.setattr(analyzer, "_table", None)
+    snap = Snapshot.from_columns(item_id=[1, 2], quantity=[1, 1], unit_price=[10.0, float("nan")], version="v1")
+    first = analyzer.margin_table(snap)
+    assert len(first) == 1
+    # Mismo contenido, otro objeto con la misma versión -> misma tabla
+    again = Snapshot.from_columns(item_id=[1], quantity=[1], unit_price=[10.0], version="v1")
+    assert analyzer.margin_table(again) is first
+    newer = Snapshot.from_columns(item_id=[1], quantity=[1], unit_price=[12.0], version="v2")
+    assert analyzer.margin_table(newer) is not first
+    # Payloads sin versión se reconocen por identidad
+    payload = {"auctions": [{"item": {"id": 3}, "unit_price": 4, "quantity": 1}]}
+    table = analyzer.margin_table(payload)
+    assert analyzer.margin_table(payload) is table
+    assert analyzer.margin_table(dict(payload)) is not table
@@ -6,47 +6,37 @@ import pytest
 async def test_get_top_items_success_and_cache(monkeypatch):
     # Import here to ensure monkeypatching works against module objects
     from kezan import analyzer
-    from kezan import cache as kezan_cache
-
-    # In-memory cache shim
-    mem = {}
-
-    def fake_get(key):
-        return mem.get(key)
 
-    def fake_set(key, value, ttl):
-        mem[key] = value
-
-    # Mock fetch_auction_data
+    payload = {
+        "auctions": [
+            {"item": {}, "buyout": 100, "quantity": 2},  # missing id -> warn/skip
+            {"item": {"id": 101}, "buyout": 150, "quantity": 3},  # margin ~0.33 -> include
+            {"item": {"id": 202}, "buyout": 100, "quantity": 1},  # margin ~0.33 -> include
+            {"item": {"id": 303}, "buyout": 1000, "quantity": 1000},  # unit=1, avg=1.5, margin ~0.33 -> include
+            {"item": {"id": 404}, "buyout": 100, "quantity": 100},  # unit=1, margin ~0.33 -> include
+            {"item": {"id": 505}, "buyout": 1, "quantity": 1},  # unit=1, margin ~0.33 -> include
+        ]
+    }
+
+    # Mock fetch_auction_data (cached payload -> same object every call)
     async def fake_fetch():
-        return {
-            "auctions": [
-                {"item": {}, "buyout": 100, "quantity": 2},  # missing id -> warn/skip
-                {"item": {"id": 101}, "buyout": 150, "quantity": 3},  # margin ~0.33 -> include
-                {"item": {"id": 202}, "buyout": 100, "quantity": 1},  # margin ~0.33 -> include
-                {"item": {"id": 303}, "buyout": 1000, "quantity": 1000},  # unit=1, avg=1.5, margin ~0.33 -> include
-                {"item": {"id": 404}, "buyout": 100, "quantity": 100},  # unit=1, margin ~0.33 -> include
-                {"item": {"id": 505}, "buyout": 1, "quantity": 1},  # unit=1, margin ~0.33 -> include
-            ]
-        }
-
-    # Wire patches
-    monkeypatch.setattr(kezan_cache, "get", fake_get)
-    monkeypatch.setattr(kezan_cache, "set", fake_set)
+        return payload
+
     monkeypatch.setattr(analyzer, "fetch_auction_data", fake_fetch)
 
-    # First call hits fetch and populates cache
+    # First call builds the margin table for this snapshot
     res1 = await analyzer.get_top_items(limit=2, min_margin=0.3)
     assert isinstance(res1, dict) and "items" in res1
     assert len(res1["items"]) == 2
-    # Second call should be served from cache without invoking fetch again
-    # Replace fetch with a sentinel to ensure it's not called
-    async def sentinel_fetch():
-        raise AssertionError("fetch_auction_data should not be called due to cache")
+    # Later calls, with any parameters, reuse the table without re-parsing
+    def no_parse(*a, **k):
+        raise AssertionError("snapshot should not be parsed again for the same payload")
 
-    monkeypatch.setattr(analyzer, "fetch_auction_data", sentinel_fetch)
+    monkeypatch.setattr(analyzer.Snapshot, "from_payload", no_parse)
     res2 = await analyzer.get_top_items(limit=2, min_margin=0.3)
     assert res2 == res1
+    assert len((await analyzer.get_top_items(limit=10, min_margin=0.3))["items"]) == 5
+    assert (await analyzer.get_top_items(limit=10, min_margin=0.5))["items"] == []
 
 
 @pytest.mark.asyncio
@@ -56,7 +46,7 @@ async def test_get_top_items_runtime_error(monkeypatch):
 
     # Ensure cache miss
     monkeypatch.setattr(kezan_cache, "get", lambda k: None)
-    monkeypatch.setattr(kezan_cache, "set", lambda k, v, ttl: None)
+    monkeypatch.setattr(kezan_cache, "set", lambda k, v, ttl, **kw: None)
 
     async def boom():
         raise RuntimeError("API down")
@@ -73,7 +63,7 @@ async def test_get_top_items_no_data(monkeypatch):
 
     # Ensure cache miss
     monkeypatch.setattr(kezan_cache, "get", lambda k: None)
-    monkeypatch.setattr(kezan_cache, "set", lambda k, v, ttl: None)
+    monkeypatch.setattr(kezan_cache, "set", lambda k, v, ttl, **kw: None)
 
     async def no_data():
         return None
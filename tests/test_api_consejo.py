@@ -15,11 +15,11 @@ def test_consejo_success(monkeypatch):
     async def fake_get_top_items(limit=5, min_margin=0.3):
         return {"items": [{"name": "Black Lotus"}]}
 
-    def fake_analyze_items_with_llm(data):
+    async def fake_analyze_items_with_llm(data):
         return "Compra Black Lotus"
 
     monkeypatch.setattr(api_module, "get_top_items", fake_get_top_items)
-    monkeypatch.setattr(api_module, "analyze_items_with_llm", fake_analyze_items_with_llm)
+    monkeypatch.setattr(api_module, "analyze_items_with_llm_async", fake_analyze_items_with_llm)
 
     response = client.get("/api/consejo")
     assert response.status_code == 200
@@ -33,11 +33,11 @@ def test_consejo_model_error(monkeypatch):
     async def fake_get_top_items(limit=5, min_margin=0.3):
         return {"items": [{"name": "Black Lotus"}]}
 
-    def fake_analyze_items_with_llm(data):
+    async def fake_analyze_items_with_llm(data):
         raise RuntimeError("El modelo de IA local no está activo o no responde.")
 
     monkeypatch.setattr(api_module, "get_top_items", fake_get_top_items)
-    monkeypatch.setattr(api_module, "analyze_items_with_llm", fake_analyze_items_with_llm)
+    monkeypatch.setattr(api_module, "analyze_items_with_llm_async", fake_analyze_items_with_llm)
 
     response = client.get("/api/consejo")
     assert response.status_code == 200
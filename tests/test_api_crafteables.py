@@ -38,12 +38,12 @@ def test_crafteables_success(monkeypatch):
             }
         ]
 
-    def fake_llm(recipes, inventory=None):
+    async def fake_llm(recipes, inventory=None):
         return "Haz este craft"
 
     monkeypatch.setattr(api_module, "load_recipes", fake_load_recipes)
     monkeypatch.setattr(api_module, "analyze_recipes", fake_analyze_recipes)
-    monkeypatch.setattr(api_module, "analyze_recipes_with_llm", fake_llm)
+    monkeypatch.setattr(api_module, "analyze_recipes_with_llm_async", fake_llm)
 
     response = client.get("/api/crafteables", params={"profesion": "cocina"})
     assert response.status_code == 200
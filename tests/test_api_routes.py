@@ -33,7 +33,10 @@ def test_crafteables_error(monkeypatch):
         return [{"profit": 0}]
 
     monkeypatch.setattr(api, "analyze_recipes", fake_analyze_recipes)
-    monkeypatch.setattr(api, "analyze_recipes_with_llm", lambda r: (_ for _ in ()).throw(RuntimeError("falla")))
+    async def failing_llm(recipes):
+        raise RuntimeError("falla")
+
+    monkeypatch.setattr(api, "analyze_recipes_with_llm_async", failing_llm)
     client = TestClient(app)
     resp = client.get("/api/crafteables?profesion=alc")
     assert resp.json()["error"] == "falla"
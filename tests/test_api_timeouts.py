@@ -22,6 +22,6 @@ def test_fetch_auction_timeout(monkeypatch):
         async def get(self, *args, **kwargs):
             raise httpx.TimeoutException("timeout")
 
-    monkeypatch.setattr(httpx, "AsyncClient", lambda timeout=10: DummyClient())
+    monkeypatch.setattr(blizzard_api.http_client, "get_async_client", lambda url: DummyClient())
     data = asyncio.run(blizzard_api.fetch_auction_data())
     assert data is None
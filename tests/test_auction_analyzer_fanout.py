@@ -0,0 +1,64 @@
+"""Pruebas del análisis concurrente y acotado de items observados."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from kezan import llm_interface
+from kezan.auction_analyzer import AuctionAnalyzer
+from kezan.profile_manager import GameVersion
+from kezan.snapshot import Snapshot
+
+
+def _analyzer(watched, delays):
+    aa = AuctionAnalyzer()
+    prefs = SimpleNamespace(watched_items=watched, price_thresholds={})
+    aa.profile_manager = SimpleNamespace(
+        get_profile=lambda gv: SimpleNamespace(preferences=prefs, auction_history={})
+    )
+    fetches = []
+
+    async def get_auctions(realm):
+        fetches.append(realm)
+        return Snapshot.from_columns(
+            item_id=watched, quantity=[1] * len(watched), unit_price=[10.0] * len(watched), version="v1"
+        )
+
+    aa.blizzard_api = SimpleNamespace(get_auctions=get_auctions)
+    state = {"in_flight": 0, "peak": 0}
+
+    async def analyze_market_opportunity(item_data, historical_prices):
+        item_id = item_data["item"]["id"]
+        async with llm_interface.llm_slot():  # como LLMInterface._post_async
+            state["in_flight"] += 1
+            state["peak"] = max(state["peak"], state["in_flight"])
+            try:
+                await asyncio.sleep(delays.get(item_id, 0.01))
+            finally:
+                state["in_flight"] -= 1
+        return {"analysis": str(item_id), "opportunity": True, "reason": ""}
+
+    aa.llm = SimpleNamespace(analyze_market_opportunity=analyze_market_opportunity)
+    return aa, state, fetches
+
+
+@pytest.mark.asyncio
+async def test_fan_out_is_bounded_and_shares_one_snapshot(monkeypatch):
+    monkeypatch.setattr(llm_interface, "LLM_PARALLEL", 3)
+    watched = list(range(1, 11))
+    aa, state, fetches = _analyzer(watched, {})
+    results = await aa.analyze_watched_items(GameVersion.RETAIL, "r", use_realtime=False)
+    assert [r["item_id"] for r in results] == watched
+    assert state["peak"] == 3
+    assert fetches == ["r"]
+
+
+@pytest.mark.asyncio
+async def test_partial_results_stream_and_timeouts(monkeypatch):
+    monkeypatch.setattr(llm_interface, "LLM_PARALLEL", 4)
+    aa, _, _ = _analyzer([1, 2, 3], {1: 0.2, 2: 5.0, 3: 0.0})
+    seen = []
+    async for result in aa.iter_watched_analyses(GameVersion.RETAIL, "r", use_realtime=False, timeout=0.5):
+        seen.append((result["item_id"], result["analysis"]["reason"]))
+    assert seen == [(3, ""), (1, ""), (2, "timeout")]
@@ -50,7 +50,7 @@ async def test_analyze_watched_items_realtime_and_non_realtime(monkeypatch):
     aa.llm = SimpleNamespace(
         analyze_market_opportunity=fake_analyze_market_opportunity,
         scan_auction_house=None,
-        suggest_search_strategy=None,
+        suggest_search_strategy_async=None,
     )
 
     # Stub BlizzardAPI; not used in realtime path besides start_monitoring
@@ -92,10 +92,11 @@ async def test_get_market_insights_and_thresholds(monkeypatch):
     # Patch profile manager
     monkeypatch.setattr(aa, "profile_manager", SimpleNamespace(get_profile=lambda gv: fake_profile))
 
-    # Patch LLM suggest strategy (sync function in current impl)
-    aa.llm = SimpleNamespace(
-        suggest_search_strategy=lambda item_history, market_trends, game_version: "focus-high-volume"
-    )
+    # Patch LLM suggest strategy
+    async def fake_suggest(item_history, market_trends, game_version):
+        return "focus-high-volume"
+
+    aa.llm = SimpleNamespace(suggest_search_strategy_async=fake_suggest)
 
     insights = await aa.get_market_insights(GameVersion.RETAIL, realm="ignored")
     assert insights["strategy"] == "focus-high-volume"
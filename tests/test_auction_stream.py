@@ -0,0 +1,131 @@
+"""Pruebas para la descarga y decodificación en streaming de subastas."""
+
+import json
+
+import httpx
+import pytest
+
+from kezan import blizzard_api
+from kezan.auction_stream import AuctionStreamDecoder
+
+PAYLOAD = {
+    "_links": {"self": {"href": "https://eu.api.blizzard.com/x"}},
+    "connected_realm": {"href": "https://eu.api.blizzard.com/y"},
+    "auctions": [
+        {"id": i, "item": {"id": 100 + i % 3, "name": "Ñandú ✨"}, "quantity": i + 1, "unit_price": 10 * (i + 1)}
+        for i in range(50)
+    ],
+    "commodities": {"href": "z"},
+}
+RAW = json.dumps(PAYLOAD, ensure_ascii=False).encode("utf-8")
+
+
+@pytest.mark.parametrize("size", [1, 7, 64, len(RAW)])
+def test_decoder_any_chunk_size(size):
+    dec = AuctionStreamDecoder()
+    lots = []
+    for i in range(0, len(RAW), size):
+        lots.extend(dec.feed(RAW[i:i + size]))
+    dec.close()
+    assert lots == PAYLOAD["auctions"] and dec.count == 50 and dec.done
+    assert dec.feed(b"[]") == []
+
+
+def test_decoder_empty_and_truncated():
+    dec = AuctionStreamDecoder()
+    assert dec.feed(b'{"auctions" : [ ] }') == []
+    dec.close()
+
+    dec = AuctionStreamDecoder()
+    dec.feed(RAW[: len(RAW) // 2])
+    with pytest.raises(ValueError):
+        dec.close()
+
+
+def _mock_client(monkeypatch, handler):
+    monkeypatch.setattr(
+        blizzard_api.http_client,
+        "get_async_client",
+        lambda url: httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+
+
+@pytest.mark.asyncio
+async def test_stream_and_snapshot(monkeypatch):
+    async def token():
+        return "tok"
+
+    monkeypatch.setattr(blizzard_api, "get_access_token", token)
+    store = {}
+    monkeypatch.setattr(blizzard_api.cache, "get", lambda k: store.get(k))
+    monkeypatch.setattr(blizzard_api.cache, "set", lambda k, v, ttl, **kw: store.update({k: v}))
+    _mock_client(monkeypatch, lambda request: httpx.Response(200, content=RAW))
+
+    lots = [lot async for lot in blizzard_api.stream_auction_data(item_ids=[101])]
+    assert lots and all(lot["item"]["id"] == 101 for lot in lots)
+
+    snap = await blizzard_api.fetch_auction_snapshot()
+    assert len(snap) == 50 and snap.items.tolist() == [100, 101, 102]
+    assert store["auction_snapshot"] is snap
+    assert await blizzard_api.BlizzardAPI().fetch_auction_snapshot() is snap
+
+
+@pytest.mark.asyncio
+async def test_stream_errors(monkeypatch):
+    async def token():
+        return "tok"
+
+    monkeypatch.setattr(blizzard_api, "get_access_token", token)
+    monkeypatch.setattr(blizzard_api.cache, "get", lambda k: None)
+    _mock_client(monkeypatch, lambda request: httpx.Response(200, content=RAW[:100]))
+    assert await blizzard_api.fetch_auction_snapshot() is None
+
+    _mock_client(monkeypatch, lambda request: httpx.Response(503))
+    with pytest.raises(RuntimeError):
+        async for _ in blizzard_api.stream_auction_data():
+            pass
+
+    def boom(request):
+        raise httpx.ConnectError("down")
+
+    _mock_client(monkeypatch, boom)
+    with pytest.raises(RuntimeError):
+        async for _ in blizzard_api.BlizzardAPI().stream_auctions():
+            pass
+
+    async def no_token():
+        return None
+
+    monkeypatch.setattr(blizzard_api, "get_access_token", no_token)
+    with pytest.raises(RuntimeError):
+        async for _ in blizzard_api.stream_auction_data():
+            pass
+
+
+@pytest.mark.asyncio
+async def test_thresholds_use_stream(monkeypatch):
+    from types import SimpleNamespace
+
+    from kezan.auction_analyzer import AuctionAnalyzer
+    from kezan.profile_manager import GameVersion
+
+    aa = AuctionAnalyzer()
+    prefs = SimpleNamespace(price_thresholds={1: 50, 2: 5, 3: 10})
+    monkeypatch.setattr(aa, "profile_manager", SimpleNamespace(get_profile=lambda gv: SimpleNamespace(preferences=prefs)))
+    requested = {}
+
+    async def stream(realm, item_ids=None):
+        requested["ids"] = item_ids
+        for lot in [
+            {"item": {"id": 1}, "unit_price": 60},
+            {"item": {"id": 1}, "unit_price": 40},
+            {"item": {"id": 2}, "unit_price": 10},
+            {"item": {"id": 3}, "quantity": 2, "buyout": 10},
+            {"item": {"id": 3}, "quantity": 1, "bid": 1},
+        ]:
+            yield lot
+
+    aa.blizzard_api = SimpleNamespace(stream_auctions=stream)
+    alerts = await aa.monitor_price_thresholds(GameVersion.RETAIL, realm="r")
+    assert sorted(requested["ids"]) == [1, 2, 3]
+    assert [(a["item_id"], a["current_price"]) for a in alerts] == [(1, 40), (3, 5.0)]
@@ -0,0 +1,82 @@
+import random
+
+import numpy as np
+
+from kezan.bargain_detector import (
+    Config,
+    Lot,
+    Stats,
+    detect_bargains,
+    detect_bargains_batch,
+    detect_bargains_snapshot,
+    stats_columns,
+)
+from kezan.snapshot import Snapshot
+
+
+class DummyHistory:
+    def __init__(self, stats_map):
+        self.stats_map = stats_map
+        self.calls = 0
+
+    def get_stats(self, key):
+        self.calls += 1
+        return self.stats_map.get(key)
+
+
+def _random_market(seed=3, n_items=40, n_lots=2000):
+    rnd = random.Random(seed)
+    stats_map = {}
+    for item in range(1, n_items + 1):
+        if item % 7 == 0:
+            continue  # items sin histórico
+        p50 = rnd.uniform(10, 1000)
+        stats_map[("eu", item, None)] = Stats(
+            P50_7d=p50,
+            P50_30d=p50 * rnd.uniform(0.8, 1.3),
+            MAD_7d=rnd.choice([0.0, p50 * rnd.uniform(0.01, 0.3)]),
+            vol_7d=float(rnd.randint(0, 2000)),
+            rot=rnd.uniform(0, 1.5),
+        )
+    item_ids, prices = [], []
+    for _ in range(n_lots):
+        item = rnd.randint(1, n_items)
+        p50 = stats_map.get(("eu", item, None), Stats(100, 100, 1, 0, 0)).P50_7d
+        item_ids.append(item)
+        prices.append(rnd.choice([float("nan"), p50 * rnd.uniform(0.2, 1.5), 0.5]))
+    return stats_map, item_ids, prices
+
+
+def test_batch_matches_scalar_path():
+    stats_map, item_ids, prices = _random_market()
+    history = DummyHistory(stats_map)
+    cfg = Config(bargain_score_min=0.3)
+    lots = [
+        Lot(item_id=i, quantity=1, scope="eu", is_commodity=True, price_u=None if p != p else p)
+        for i, p in zip(item_ids, prices)
+    ]
+    expected = detect_bargains(lots, history, capital=50000.0, cfg=cfg)
+
+    history.calls = 0
+    cols = stats_columns(history, "eu", item_ids)
+    assert history.calls == len(set(item_ids))  # una consulta por item, no por lote
+    got = detect_bargains_batch(item_ids, prices, cols, capital=50000.0, cfg=cfg, scope="eu")
+    assert expected and got == expected
+
+
+def test_batch_noncommodity_and_per_lot_scope():
+    stats = {"P50_7d": [100.0, 100.0], "P50_30d": [100.0, 100.0], "MAD_7d": [5.0, 5.0],
+             "vol_7d": np.array([10, 100]), "rot": [0.2, 1.2]}
+    out = detect_bargains_batch([1, 2], [50.0, 50.0], stats, capital=10000, cfg=Config(bargain_score_min=0.5),
+                                scope=["1080", "1081"], is_commodity=False)
+    # Sólo el segundo lote supera la liquidez mínima de no-commodities
+    assert [r["item_id"] for r in out] == [2]
+    assert out[0]["realm_or_region"] == "1081" and out[0]["vol_7d"] == 100 and out[0]["eta_h"] == 36
+    assert detect_bargains_batch([], [], {f: [] for f in stats}, capital=1, cfg=Config()) == []
+
+
+def test_detect_bargains_snapshot():
+    stats = Stats(P50_7d=100.0, P50_30d=120.0, MAD_7d=10.0, vol_7d=500.0, rot=0.8)
+    snap = Snapshot.from_columns(item_id=[100, 100, 5], quantity=[1, 2, 1], unit_price=[70.0, 99.0, 1.0])
+    recs = detect_bargains_snapshot(snap, DummyHistory({("EU", 100, None): stats}), "EU", True, 10000.0, Config())
+    assert len(recs) == 1 and recs[0]["price_u"] == 70.0
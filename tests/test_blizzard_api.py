@@ -9,6 +9,9 @@ from kezan import blizzard_api
 class FakeResponse:
     """Respuesta simulada para llamadas HTTP."""
 
+    status_code = 200
+    headers = {}
+
     def __init__(self, data):
         self._data = data
 
@@ -26,7 +29,7 @@ async def test_get_access_token_and_cache(monkeypatch):
     monkeypatch.setattr(blizzard_api, "API_CLIENT_SECRET", "sec")
     store = {}
     monkeypatch.setattr(blizzard_api.cache, "get", lambda k: store.get(k))
-    monkeypatch.setattr(blizzard_api.cache, "set", lambda k, v, ttl: store.update({k: v}))
+    monkeypatch.setattr(blizzard_api.cache, "set", lambda k, v, ttl, **kw: store.update({k: v}))
 
     class Client:
         async def __aenter__(self):
@@ -38,7 +41,7 @@ async def test_get_access_token_and_cache(monkeypatch):
         async def post(self, *a, **k):
             return FakeResponse({"access_token": "tok"})
 
-    monkeypatch.setattr(httpx, "AsyncClient", lambda timeout: Client())
+    monkeypatch.setattr(blizzard_api.http_client, "get_async_client", lambda url: Client())
     tok1 = await blizzard_api.get_access_token()
     tok2 = await blizzard_api.get_access_token()
     assert tok1 == tok2 == "tok"
@@ -61,7 +64,7 @@ async def test_get_access_token_errors(monkeypatch):
         async def post(self, *a, **k):
             raise httpx.RequestError("boom", request=None)
 
-    monkeypatch.setattr(httpx, "AsyncClient", lambda timeout: ClientReqErr())
+    monkeypatch.setattr(blizzard_api.http_client, "get_async_client", lambda url: ClientReqErr())
     assert await blizzard_api.get_access_token() is None
 
     class ClientHttpErr:
@@ -74,7 +77,7 @@ async def test_get_access_token_errors(monkeypatch):
         async def post(self, *a, **k):
             raise httpx.HTTPStatusError("boom", request=None, response=None)
 
-    monkeypatch.setattr(httpx, "AsyncClient", lambda timeout: ClientHttpErr())
+    monkeypatch.setattr(blizzard_api.http_client, "get_async_client", lambda url: ClientHttpErr())
     assert await blizzard_api.get_access_token() is None
 
 
@@ -85,7 +88,7 @@ async def test_fetch_auction_data(monkeypatch):
     monkeypatch.setattr(blizzard_api, "API_CLIENT_SECRET", "sec")
     store = {}
     monkeypatch.setattr(blizzard_api.cache, "get", lambda k: store.get(k))
-    monkeypatch.setattr(blizzard_api.cache, "set", lambda k, v, ttl: store.update({k: v}))
+    monkeypatch.setattr(blizzard_api.cache, "set", lambda k, v, ttl, **kw: store.update({k: v}))
 
     class Client:
         async def __aenter__(self):
@@ -100,7 +103,7 @@ async def test_fetch_auction_data(monkeypatch):
         async def get(self, *a, **k):
             return FakeResponse({"auctions": []})
 
-    monkeypatch.setattr(httpx, "AsyncClient", lambda timeout: Client())
+    monkeypatch.setattr(blizzard_api.http_client, "get_async_client", lambda url: Client())
     data = await blizzard_api.fetch_auction_data()
     assert data == {"auctions": []}
 
@@ -133,7 +136,7 @@ async def test_fetch_auction_data_error(monkeypatch):
         async def get(self, *a, **k):
             raise httpx.HTTPStatusError("boom", request=None, response=None)
 
-    monkeypatch.setattr(httpx, "AsyncClient", lambda timeout: Client())
+    monkeypatch.setattr(blizzard_api.http_client, "get_async_client", lambda url: Client())
     assert await blizzard_api.fetch_auction_data() is None
 
 
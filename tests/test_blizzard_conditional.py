@@ -0,0 +1,129 @@
+"""Pruebas para las descargas condicionales (ETag/Last-Modified) de subastas."""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from kezan import blizzard_api
+from kezan.snapshot import Snapshot
+
+RAW = json.dumps({"auctions": [
+    {"id": 1, "item": {"id": 7}, "quantity": 2, "unit_price": 30},
+    {"id": 2, "item": {"id": 8}, "quantity": 1, "unit_price": 5},
+]}).encode()
+
+
+@pytest.fixture(autouse=True)
+def _state(monkeypatch):
+    async def token():
+        return "tok"
+
+    monkeypatch.setattr(blizzard_api, "get_access_token", token)
+    monkeypatch.setattr(blizzard_api, "_validators", {})
+    monkeypatch.setattr(blizzard_api, "_last_payloads", {})
+    monkeypatch.setattr(blizzard_api, "_last_snapshots", {})
+    monkeypatch.setattr(blizzard_api.cache, "get", lambda k: None)
+    monkeypatch.setattr(blizzard_api.cache, "set", lambda k, v, ttl, **kw: None)
+
+
+def _server(monkeypatch, etag='"v1"'):
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304)
+        return httpx.Response(200, content=RAW, headers={"ETag": etag, "Last-Modified": "Sat, 17 Oct 2026 10:00:00 GMT"})
+
+    monkeypatch.setattr(
+        blizzard_api.http_client,
+        "get_async_client",
+        lambda url: httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+    return seen
+
+
+def test_realm_urls_and_scope():
+    assert blizzard_api.auction_url("1305").endswith("/connected-realm/1305/auctions")
+    assert blizzard_api.auction_url(blizzard_api.COMMODITIES) == blizzard_api.BLIZZ_COMMODITIES_URL
+    assert blizzard_api.auction_url("Sanguino") == blizzard_api.BLIZZ_AUCTION_URL
+    assert blizzard_api.realm_scope(1305) == 1305
+    assert blizzard_api.realm_scope("commodities") == 0
+
+
+@pytest.mark.asyncio
+async def test_snapshot_304_reuses_previous(monkeypatch):
+    seen = _server(monkeypatch)
+    api = blizzard_api.BlizzardAPI()
+
+    first = await api.get_auctions("1305")
+    assert isinstance(first, Snapshot) and len(first) == 2
+    assert first.version == '"v1"' and (first.scope == 1305).all()
+    assert "If-None-Match" not in seen[0].headers
+
+    second = await api.get_auctions("1305")
+    assert second is first
+    assert seen[1].headers["If-None-Match"] == '"v1"'
+    assert "If-Modified-Since" in seen[1].headers
+
+    # Cada endpoint lleva sus propios validadores
+    other = await api.get_auctions(blizzard_api.COMMODITIES)
+    assert other is not first and "If-None-Match" not in seen[2].headers
+
+    # Descargas filtradas nunca son condicionales
+    partial = await blizzard_api.fetch_auction_snapshot(item_ids=[7], url=blizzard_api.auction_url("1305"))
+    assert partial.items.tolist() == [7] and "If-None-Match" not in seen[3].headers
+
+
+@pytest.mark.asyncio
+async def test_fetch_auction_data_304(monkeypatch):
+    seen = _server(monkeypatch)
+    first = await blizzard_api.fetch_auction_data()
+    second = await blizzard_api.fetch_auction_data()
+    assert second is first and len(first["auctions"]) == 2
+    assert seen[1].headers["If-None-Match"] == '"v1"'
+
+
+@pytest.mark.asyncio
+async def test_pipeline_skips_unchanged_snapshot(monkeypatch):
+    from kezan.auction_analyzer import AuctionAnalyzer
+    from kezan.profile_manager import GameVersion
+    from kezan.realtime_monitor import RealTimeAuctionMonitor
+
+    snap = Snapshot.from_columns(item_id=[7], quantity=[1], unit_price=[3.0], version='"v1"')
+
+    class API:
+        async def get_auctions(self, realm):
+            return snap
+
+    mon = RealTimeAuctionMonitor()
+    loads = []
+    original = mon._load_snapshot
+    monkeypatch.setattr(mon, "_load_snapshot", lambda s, p=None: (loads.append(s), original(s, p)))
+    assert await mon.update_auction_data(API(), "1305") is True
+    assert await mon.update_auction_data(API(), "1305") is True
+    assert len(loads) == 1 and mon.get_current_price(7)["price"] == 3.0
+
+    scans = []
+
+    class LLM:
+        async def scan_auction_house(self, current_data, profile_preferences, game_version):
+            scans.append(current_data)
+            return []
+
+    az = AuctionAnalyzer()
+    az.llm = LLM()
+    az.blizzard_api = API()
+    sleeps = []
+
+    async def fake_sleep(_):
+        sleeps.append(_)
+        if len(sleeps) == 3:
+            raise asyncio.CancelledError()
+
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+    with pytest.raises(asyncio.CancelledError):
+        await az.full_scan(GameVersion.RETAIL, realm="1305", scan_interval=0)
+    assert len(scans) == 1
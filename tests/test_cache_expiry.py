@@ -2,19 +2,119 @@
 
 import time
 
+import numpy as np
+import pytest
+
 from kezan import cache
+from kezan.snapshot import Snapshot
 
 
-def test_cache_expira_y_elimina(tmp_path, monkeypatch):
-    """Verifica que las entradas expiran y se borran del disco."""
+@pytest.fixture(autouse=True)
+def _cache_tmp(tmp_path, monkeypatch):
     monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
-    monkeypatch.setattr(cache, "CACHE_FILE", tmp_path / "cache.db")
+    monkeypatch.setattr(cache, "CACHE_FILE", tmp_path / "cache.sqlite3")
+    cache.clear()
+    yield
+    cache.close()
+
 
+def _disk_keys():
+    return [row[0] for row in cache._connection().execute("SELECT key FROM cache")]
+
+
+def test_cache_expira_y_elimina(monkeypatch):
+    """Verifica que las entradas expiran y se borran del disco."""
     cache.set("x", "y", ttl=1)
     assert cache.get("x") == "y"
 
     ahora = time.time() + 2
     monkeypatch.setattr(cache.time, "time", lambda: ahora)
     assert cache.get("x") is None
-    with cache._open_db() as db:
-        assert "x" not in db
+    assert "x" not in _disk_keys()
+
+
+def test_cache_disk_tier_survives_memory_loss():
+    """Un fallo en memoria se sirve desde disco y se promociona."""
+    cache.set("k", {"a": 1}, ttl=60)
+    cache._memory.clear()
+    cache._memory_bytes = 0
+    assert cache.get("k") == {"a": 1}
+    assert cache.get("k") == {"a": 1}
+    stats = cache.stats()
+    assert stats["disk_hits"] == 1 and stats["memory_hits"] == 1
+    assert stats["disk_items"] == 1 and stats["disk_bytes"] > 0
+
+    # Reabrir el fichero conserva los datos
+    cache.close()
+    cache._memory.clear()
+    cache._memory_bytes = 0
+    assert cache.get("k") == {"a": 1}
+
+
+def test_cache_lru_eviction_and_bytes(monkeypatch):
+    """La memoria se acota por entradas y por bytes."""
+    monkeypatch.setattr(cache, "MAX_MEMORY_ITEMS", 2)
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    cache.get("a")  # "a" pasa a ser la más reciente
+    cache.set("c", 3, ttl=60)
+    assert list(cache._memory) == ["a", "c"]
+    assert cache.stats()["evictions"] == 1
+
+    big = "z" * 1000
+    monkeypatch.setattr(cache, "MAX_MEMORY_BYTES", 600)
+    cache.set("big", big, ttl=60)
+    assert "big" not in cache._memory
+    assert cache.stats()["memory_bytes"] <= 600
+    # Sigue disponible desde disco
+    assert cache.get("big") == big
+
+
+def test_cache_sweep_and_memory_only_values(monkeypatch):
+    """El barrido elimina claves caducadas no leídas; lo no serializable queda en memoria."""
+    cache.set("old", 1, ttl=1)
+    cache.set("new", 2, ttl=100)
+    assert cache.sweep(now=time.time() + 10) == 2  # memoria + disco
+    assert _disk_keys() == ["new"] and "old" not in cache._memory
+
+    unpicklable = lambda: None  # noqa: E731
+    cache.set("fn", unpicklable, ttl=60)
+    assert cache.get("fn") is unpicklable and "fn" not in _disk_keys()
+
+    monkeypatch.setattr(cache, "MAX_DISK_VALUE_BYTES", 10)
+    cache.set("new", "x" * 100, ttl=60)
+    assert "new" not in _disk_keys() and cache.get("new") == "x" * 100
+
+    cache.delete("new")
+    assert cache.get("new") is None and cache.stats()["misses"] == 1
+
+
+def test_cache_sizes_are_estimated_without_pickle(monkeypatch):
+    """El tamaño se estima sin serializar; sólo se serializa lo que va a disco."""
+    snap = Snapshot.from_columns(item_id=[1, 2], quantity=[1, 1], unit_price=[1.0, 2.0])
+    assert cache._estimate_size(np.zeros(100)) == 800
+    assert cache._estimate_size(snap) == snap.nbytes > 0
+    assert cache._estimate_size(b"x" * 50) == 50 and cache._estimate_size("y" * 70) == 70
+    rows = [{"id": i, "name": "n" * 100} for i in range(1000)]
+    assert 100_000 < cache._estimate_size(rows) < 1_000_000
+
+    dumps = []
+    real_dumps = cache.pickle.dumps
+    monkeypatch.setattr(cache.pickle, "dumps", lambda *a, **k: dumps.append(1) or real_dumps(*a, **k))
+    monkeypatch.setattr(cache, "MAX_DISK_VALUE_BYTES", 1000)
+    cache.set("arr", np.zeros(1000), ttl=60)
+    assert not dumps and "arr" not in _disk_keys() and cache._memory["arr"].size == 8000
+    cache.set("small", np.zeros(10), ttl=60)
+    assert len(dumps) == 1 and "small" in _disk_keys()
+
+
+def test_sweeper_restarts_after_close():
+    """Reabrir la caché justo después de ``close()`` arranca un barrido nuevo."""
+    cache._connection()
+    old = cache._sweeper
+    cache.close()
+    cache._connection()
+    assert cache._sweeper is not old and cache._sweeper.is_alive()
+    assert not cache._stop.is_set()
+    old.join(timeout=5)
+    assert not old.is_alive() and cache._sweeper.is_alive()
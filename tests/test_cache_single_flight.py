@@ -0,0 +1,88 @@
+"""Pruebas para la agrupación de descargas y stale-while-revalidate."""
+
+import asyncio
+import time
+
+import pytest
+
+from kezan import cache
+
+
+@pytest.fixture(autouse=True)
+def _cache_tmp(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_FILE", tmp_path / "cache.sqlite3")
+    cache.clear()
+    yield
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_fetch():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"auctions": [1]}
+
+    results = await asyncio.gather(*(cache.get_or_fetch("k", fetch, ttl=60) for _ in range(10)))
+    assert len(calls) == 1 and all(r is results[0] for r in results)
+    assert cache.stats()["coalesced"] == 9
+    # Ya cacheado: sin nueva descarga
+    assert await cache.get_or_fetch("k", fetch, ttl=60) == {"auctions": [1]}
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_errors_propagate_and_none_is_not_cached():
+    async def boom():
+        await asyncio.sleep(0)
+        raise RuntimeError("caído")
+
+    outcomes = await asyncio.gather(
+        *(cache.single_flight("x", boom) for _ in range(3)), return_exceptions=True
+    )
+    assert all(isinstance(o, RuntimeError) for o in outcomes)
+
+    async def nothing():
+        return None
+
+    assert await cache.get_or_fetch("x", nothing, ttl=60) is None
+    assert cache.get_stale("x") is None
+
+
+@pytest.mark.asyncio
+async def test_stale_value_served_while_refreshing(monkeypatch):
+    async def first():
+        return "v1"
+
+    assert await cache.get_or_fetch("snap", first, ttl=10, stale_ttl=100) == "v1"
+
+    later = time.time() + 20
+    monkeypatch.setattr(cache.time, "time", lambda: later)
+    assert cache.get("snap") is None  # ya no es fresco
+    refreshed = asyncio.Event()
+
+    async def second():
+        await refreshed.wait()
+        return "v2"
+
+    # Se sirve la copia obsoleta sin esperar a la descarga
+    assert await cache.get_or_fetch("snap", second, ttl=10, stale_ttl=100) == "v1"
+    assert await cache.get_or_fetch("snap", second, ttl=10, stale_ttl=100) == "v1"
+    stats = cache.stats()
+    assert stats["stale_hits"] == 2 and stats["refreshes"] == 1
+
+    refreshed.set()
+    for _ in range(5):
+        await asyncio.sleep(0)
+    assert cache.get("snap") == "v2"
+
+    # Pasado el margen de obsolescencia se vuelve a esperar la descarga
+    much_later = later + 1000
+    monkeypatch.setattr(cache.time, "time", lambda: much_later)
+
+    async def third():
+        return "v3"
+
+    assert await cache.get_or_fetch("snap", third, ttl=10, stale_ttl=100) == "v3"
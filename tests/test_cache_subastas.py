@@ -1,5 +1,4 @@
 import asyncio
-import httpx
 import pytest
 import os
 import sys
@@ -12,9 +11,10 @@ from kezan import blizzard_api
 
 @pytest.fixture(autouse=True)
 def _clear_cache(monkeypatch, tmp_path):
-    monkeypatch.setattr(cache, "_cache_memory", {})
-    monkeypatch.setattr(cache, "CACHE_FILE", tmp_path / "cache.db")
+    monkeypatch.setattr(cache, "CACHE_FILE", tmp_path / "cache.sqlite3")
+    cache.clear()
     yield
+    cache.close()
 def test_auction_cache(monkeypatch):
     async def fake_token():
         return "token"
@@ -36,6 +36,9 @@ def test_auction_cache(monkeypatch):
             self.get_calls += 1
 
             class Resp:
+                status_code = 200
+                headers = {}
+
                 def raise_for_status(self):
                     pass
 
@@ -45,7 +48,7 @@ def test_auction_cache(monkeypatch):
             return Resp()
 
     dummy = DummyClient()
-    monkeypatch.setattr(httpx, "AsyncClient", lambda timeout=10: dummy)
+    monkeypatch.setattr(blizzard_api.http_client, "get_async_client", lambda url: dummy)
 
     d1 = asyncio.run(blizzard_api.fetch_auction_data())
     d2 = asyncio.run(blizzard_api.fetch_auction_data())
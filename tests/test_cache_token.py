@@ -1,5 +1,4 @@
 import asyncio
-import httpx
 import pytest
 import os
 import sys
@@ -12,9 +11,10 @@ from kezan import blizzard_api
 
 @pytest.fixture(autouse=True)
 def _clear_cache(monkeypatch, tmp_path):
-    monkeypatch.setattr(cache, "_cache_memory", {})
-    monkeypatch.setattr(cache, "CACHE_FILE", tmp_path / "cache.db")
+    monkeypatch.setattr(cache, "CACHE_FILE", tmp_path / "cache.sqlite3")
+    cache.clear()
     yield
+    cache.close()
 def test_token_cached(monkeypatch):
     monkeypatch.setattr(blizzard_api, "API_CLIENT_ID", "id")
     monkeypatch.setattr(blizzard_api, "API_CLIENT_SECRET", "secret")
@@ -43,7 +43,7 @@ def test_token_cached(monkeypatch):
             return Resp()
 
     dummy = DummyClient()
-    monkeypatch.setattr(httpx, "AsyncClient", lambda timeout=10: dummy)
+    monkeypatch.setattr(blizzard_api.http_client, "get_async_client", lambda url: dummy)
 
     t1 = asyncio.run(blizzard_api.get_access_token())
     t2 = asyncio.run(blizzard_api.get_access_token())
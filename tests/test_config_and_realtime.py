@@ -1,9 +1,8 @@
-from datetime import datetime
-
 from fastapi.testclient import TestClient
 
 from kezan.ai_framework.config_manager import ConfigManager
-from kezan.realtime_monitor import RealTimeAuctionMonitor, RealTimeAuctionData
+from kezan.realtime_monitor import RealTimeAuctionMonitor
+from kezan.snapshot import Snapshot
 from kezan import main as app_main
 
 
@@ -31,13 +30,9 @@ def test_config_manager_crud(tmp_path):
 def test_realtime_monitor_basics():
     mon = RealTimeAuctionMonitor()
     # Pre-carga datos simulados sin tocar red
-    now = datetime.now()
-    mon.last_update = now
-    mon.current_data[1] = [
-        RealTimeAuctionData(timestamp=now, item_id=1, current_price=10, quantity=2, is_buyout=True, time_left="SHORT"),
-        RealTimeAuctionData(timestamp=now, item_id=1, current_price=10, quantity=1, is_buyout=False, time_left="LONG"),
-        RealTimeAuctionData(timestamp=now, item_id=1, current_price=12, quantity=5, is_buyout=True, time_left="MEDIUM"),
-    ]
+    mon._load_snapshot(Snapshot.from_columns(
+        item_id=[1, 1, 1], quantity=[2, 1, 5], unit_price=[10.0, 10.0, 12.0], time_left=[0, 2, 1],
+    ))
     price = mon.get_current_price(1)
     assert price and price["price"] == 10 and price["quantity"] == 3
     snap = mon.get_market_snapshot([1])
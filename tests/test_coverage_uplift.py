@@ -1,12 +1,12 @@
 import asyncio
-from datetime import datetime
 from types import SimpleNamespace
 
 import pytest
 
 from kezan.ai_controller import AIController, AIControllerConfig
 from kezan.realtime_monitor import RealTimeAuctionMonitor
-from kezan.realtime_monitor import RealTimeAuctionData, RealTimeMarketAnalyzer
+from kezan.realtime_monitor import RealTimeMarketAnalyzer
+from kezan.snapshot import Snapshot
 from kezan.auction_analyzer import AuctionAnalyzer
 from kezan.profile_manager import GameVersion, ProfileManager
 import importlib.util
@@ -40,7 +40,7 @@ class DummyLLM:
     async def scan_auction_house(self, *args, **kwargs):
         return []
 
-    def suggest_search_strategy(self, *args, **kwargs):
+    async def suggest_search_strategy_async(self, *args, **kwargs):
         return "Estrategia breve"
 
 
@@ -71,7 +71,7 @@ async def test_realtime_monitor_update(monkeypatch):
     mon = RealTimeAuctionMonitor()
     dummy = DummyBlizzard()
     ok = await mon.update_auction_data(dummy, realm="X")
-    assert ok is True and mon.last_update and mon.current_data
+    assert ok is True and mon.last_update and len(mon.index)
     cur = mon.get_current_price(1)
     assert cur and cur["price"] == 10 and cur["quantity"] == 2
 
@@ -136,12 +136,8 @@ def test_market_optimizer_components(tmp_path):
 
 @pytest.mark.asyncio
 async def test_realtime_market_analyzer_item():
-    now = datetime.now()
     mon = RealTimeAuctionMonitor()
-    mon.last_update = now
-    mon.current_data[1] = [
-        RealTimeAuctionData(timestamp=now, item_id=1, current_price=10, quantity=2, is_buyout=True, time_left="SHORT")
-    ]
+    mon._load_snapshot(Snapshot.from_columns(item_id=[1], quantity=[2], unit_price=[10.0], time_left=[0]))
     analyzer = RealTimeMarketAnalyzer(mon)
 
     class _LLM:
@@ -181,11 +177,9 @@ async def test_auction_analyzer_realtime_branch(tmp_path):
     az.llm = DummyLLM()
 
     # Pre-populate realtime data and mark monitoring active to skip starting background task
-    now = datetime.now()
-    az.realtime_monitor.last_update = now
     az.realtime_monitor.is_monitoring = True
-    az.realtime_monitor.current_data[1] = [
-        RealTimeAuctionData(timestamp=now, item_id=1, current_price=10, quantity=2, is_buyout=True, time_left="SHORT")
-    ]
+    az.realtime_monitor._load_snapshot(
+        Snapshot.from_columns(item_id=[1], quantity=[2], unit_price=[10.0], time_left=[0])
+    )
     res = await az.analyze_watched_items(GameVersion.RETAIL, realm="Realm", use_realtime=True)
     assert res and res[0]["item_id"] == 1
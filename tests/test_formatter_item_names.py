@@ -15,3 +15,23 @@ def test_format_for_ai_resolves_names(monkeypatch):
 
     formatted = formatter.format_for_ai(items)
     assert [item["name"] for item in formatted["items"]] == ["Foo", "Bar", "Baz"]
+
+
+def test_format_page_for_ai_resolves_once(monkeypatch):
+    import asyncio
+
+    calls = []
+
+    async def fake_bulk(item_ids, locale):
+        calls.append(list(item_ids))
+        return {i: f"N{i}" for i in item_ids}
+
+    def single(item_id):
+        raise AssertionError("no debe resolverse item a item")
+
+    monkeypatch.setattr(formatter, "resolve_item_names", fake_bulk)
+    monkeypatch.setattr(formatter, "resolve_item_name", single)
+    items = [{"id": 1}, {"id": 2, "name": "Dado"}, {"id": 3}]
+    formatted = asyncio.run(formatter.format_page_for_ai(items))
+    assert [item["name"] for item in formatted["items"]] == ["N1", "Dado", "N3"]
+    assert calls == [[1, 3]]
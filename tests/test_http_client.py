@@ -0,0 +1,120 @@
+"""Pruebas para el registro de clientes HTTP compartidos."""
+
+import asyncio
+
+import pytest
+
+from kezan import http_client
+
+
+@pytest.fixture(autouse=True)
+def _clean_registry():
+    http_client.close_all()
+    http_client.reset_metrics()
+    yield
+    http_client.close_all()
+    http_client.reset_metrics()
+    http_client._host_limits.clear()
+
+
+def test_host_key_normalizes_ports():
+    assert http_client.host_key("https://eu.api.blizzard.com/data?x=1") == "https://eu.api.blizzard.com:443"
+    assert http_client.host_key("http://localhost:11434/api/generate") == "http://localhost:11434"
+
+
+def test_sync_client_is_shared_per_host():
+    a = http_client.get_client("https://eu.battle.net/oauth/token")
+    b = http_client.get_client("https://eu.battle.net/other")
+    c = http_client.get_client("https://eu.api.blizzard.com/x")
+    assert a is b and a is not c
+    http_client.close_all()
+    assert a.is_closed
+    assert http_client.get_client("https://eu.battle.net/") is not a
+
+
+def test_async_client_rebuilt_per_event_loop():
+    async def grab():
+        first = http_client.get_async_client("https://eu.api.blizzard.com/a")
+        second = http_client.get_async_client("https://eu.api.blizzard.com/b")
+        assert first is second
+        return first
+
+    c1 = asyncio.run(grab())
+    c2 = asyncio.run(grab())
+    assert c1 is not c2
+    # El cliente del bucle ya cerrado se cierra en segundo plano
+    import time
+
+    deadline = time.monotonic() + 5
+    while not c1.is_closed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert c1.is_closed and not c2.is_closed
+    assert http_client.pool_metrics()["https://eu.api.blizzard.com:443"]["clients"] == 2
+
+
+def test_metrics_count_requests_and_reuse():
+    import httpx
+
+    key = http_client.host_key("http://llm.local")
+    metrics = http_client._metrics_for(key)
+    trace = {}
+
+    def handler(request):
+        trace.update(request.extensions)
+        return httpx.Response(200, json={})
+
+    client = httpx.Client(
+        transport=httpx.MockTransport(handler),
+        event_hooks={"request": [http_client._sync_hook(key)]},
+    )
+    for _ in range(3):
+        client.get("http://llm.local/x")
+    # Simula que el transporte abrió una única conexión
+    trace["trace"]("connection.connect_tcp.complete", {})
+
+    stats = http_client.pool_metrics()[key]
+    assert metrics.requests == 3
+    assert stats["connections"] == 1 and stats["reused"] == 2
+    assert stats["reuse_ratio"] == pytest.approx(0.6667)
+
+
+@pytest.mark.asyncio
+async def test_aclose_all_closes_async_clients():
+    http_client.configure_host("https://eu.api.blizzard.com", max_connections=4)
+    client = http_client.get_async_client("https://eu.api.blizzard.com/x")
+    await http_client.aclose_all()
+    assert client.is_closed
+    assert http_client.get_async_client("https://eu.api.blizzard.com/x") is not client
+
+
+def test_close_all_closes_async_clients_of_stopped_loops():
+    loop = asyncio.new_event_loop()
+    try:
+        client = loop.run_until_complete(_grab())
+        http_client.close_all()
+        assert client.is_closed
+        assert not http_client._async_clients
+    finally:
+        loop.close()
+
+
+@pytest.mark.asyncio
+async def test_aclose_all_closes_clients_of_other_loops():
+    import threading
+
+    other = asyncio.new_event_loop()
+    thread = threading.Thread(target=other.run_forever, daemon=True)
+    thread.start()
+    try:
+        foreign = asyncio.run_coroutine_threadsafe(_grab(), other).result(timeout=5)
+        own = await _grab()
+        await http_client.aclose_all()
+        assert own.is_closed and foreign.is_closed
+    finally:
+        other.call_soon_threadsafe(other.stop)
+        thread.join(timeout=5)
+        other.close()
+
+
+async def _grab():
+    return http_client.get_async_client("https://eu.api.blizzard.com/x")
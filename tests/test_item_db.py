@@ -0,0 +1,81 @@
+"""Pruebas para la base estática de items mapeada en memoria."""
+
+import json
+
+import pytest
+
+from kezan import item_db, item_resolver
+
+
+def _dump(tmp_path):
+    path = tmp_path / "items.json"
+    path.write_text(json.dumps([
+        {"id": 300, "name": {"en_US": "Peacebloom", "es_ES": "Flor de paz"},
+         "quality": {"type": "COMMON"}, "item_class": {"name": {"en_US": "Herb"}}, "is_stackable": True},
+        {"id": 7, "name": {"en_US": "Sword"}, "quality": "EPIC", "item_class": "Weapon"},
+        {"id": "x", "name": "inválido"},
+        {"id": 9},
+    ]), encoding="utf-8")
+    return path
+
+
+def test_import_json_and_lookup(tmp_path):
+    assert item_db.import_dump(_dump(tmp_path)) == 2
+    store = item_db.get_store("en_US")
+    assert len(store) == 2 and store.ids.tolist() == [7, 300]
+    assert store.get(300) == ("Peacebloom", "COMMON", "Herb", True, True)
+    assert store.get(7) == ("Sword", "EPIC", "Weapon", False, False)
+    assert store.get(8) is None and store.get(10**6) is None
+    assert set(store.get_many([1, 7, 300, 301])) == {7, 300}
+
+    # Volcado localizado: sólo los items con nombre en ese idioma
+    assert item_db.import_dump(_dump(tmp_path), locale="es_ES") == 1
+    assert item_db.get_store("es_ES").get(300)[0] == "Flor de paz"
+    assert item_db.get_store("fr_FR") is None
+
+
+def test_import_csv_replaces_store_and_cli(tmp_path, capsys):
+    item_db.import_dump(_dump(tmp_path))
+    path = tmp_path / "items.csv"
+    path.write_text("id,name,quality,item_class,stackable,commodity\n5,Poción ñ,RARE,Consumible,true,1\n", encoding="utf-8")
+    assert item_db.main([str(path)]) == 0
+    assert "1 items" in capsys.readouterr().out
+    store = item_db.get_store("en_US")
+    assert store.ids.tolist() == [5]
+    assert store.get(5) == ("Poción ñ", "RARE", "Consumible", True, True)
+    assert item_db.main([str(tmp_path / "no-existe.json")]) == 1
+
+
+def test_missing_store_is_picked_up_once_imported(tmp_path):
+    """Un almacén ausente no se recuerda para siempre: otro proceso puede importarlo."""
+    import shutil
+
+    item_db.import_dump(_dump(tmp_path))
+    assert item_db.get_store("fr_FR") is None
+    # Copia directa, sin pasar por close_stores(), como haría otro proceso
+    shutil.copytree(item_db.store_dir("en_US"), item_db.store_dir("fr_FR"))
+    store = item_db.get_store("fr_FR")
+    assert store is not None and store.get(7)[0] == "Sword"
+    assert item_db.get_store("fr_FR") is store
+
+
+def test_empty_dump(tmp_path):
+    path = tmp_path / "empty.json"
+    path.write_text("{}", encoding="utf-8")
+    assert item_db.import_dump(path) == 0
+    assert item_db.get_store("en_US").get_many([1]) == {}
+
+
+@pytest.mark.asyncio
+async def test_resolver_uses_static_store_without_network(tmp_path, monkeypatch):
+    item_db.import_dump(_dump(tmp_path))
+
+    def no_network(url):
+        raise AssertionError("no debe haber red")
+
+    monkeypatch.setattr(item_resolver.http_client, "get_async_client", no_network)
+    monkeypatch.setattr(item_resolver.http_client, "get_client", no_network)
+    monkeypatch.setattr(item_resolver, "_name_cache", {})
+    infos = await item_resolver.resolve_items([300, 7])
+    assert infos[300].name == "Peacebloom" and infos[300].commodity
+    assert item_resolver.resolve_item_name(7) == "Sword"
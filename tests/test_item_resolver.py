@@ -1,5 +1,7 @@
 """Pruebas para la resolución de nombres de items."""
 
+import types
+
 import httpx
 import pytest
 
@@ -28,7 +30,9 @@ def test_get_access_token(monkeypatch):
     def fake_post(*a, **k):
         return FakeResp({"access_token": "tok"})
 
-    monkeypatch.setattr(httpx, "post", fake_post)
+    monkeypatch.setattr(
+        item_resolver.http_client, "get_client", lambda url: types.SimpleNamespace(post=fake_post)
+    )
     assert item_resolver._get_access_token() == "tok"
     # Reutiliza caché
     assert item_resolver._get_access_token() == "tok"
@@ -56,7 +60,9 @@ def test_get_access_token_no_token(monkeypatch):
         def json(self):
             return {}
 
-    monkeypatch.setattr(httpx, "post", lambda *a, **k: Resp())
+    monkeypatch.setattr(
+        item_resolver.http_client, "get_client", lambda url: types.SimpleNamespace(post=lambda *a, **k: Resp())
+    )
     with pytest.raises(RuntimeError):
         item_resolver._get_access_token()
 
@@ -69,7 +75,9 @@ def test_resolve_item_name(monkeypatch):
     def fake_get(*a, **k):
         return FakeResp({"name": "Poción"})
 
-    monkeypatch.setattr(httpx, "get", fake_get)
+    monkeypatch.setattr(
+        item_resolver.http_client, "get_client", lambda url: types.SimpleNamespace(get=fake_get)
+    )
     assert item_resolver.resolve_item_name(1) == "Poción"
     # Segunda llamada usa caché
     assert item_resolver.resolve_item_name(1) == "Poción"
@@ -82,6 +90,86 @@ def test_resolve_item_name_fallback(monkeypatch):
     def fake_get(*a, **k):
         raise httpx.HTTPError("fail")
 
-    monkeypatch.setattr(httpx, "get", fake_get)
+    monkeypatch.setattr(
+        item_resolver.http_client, "get_client", lambda url: types.SimpleNamespace(get=fake_get)
+    )
     assert item_resolver.resolve_item_name(0) == "ItemID unknown"
     assert item_resolver.resolve_item_name(9999) == "ItemID 9999"
+
+
+def _item_server(monkeypatch, seen):
+    def handler(request):
+        item_id = int(request.url.path.rsplit("/", 1)[-1])
+        seen.append((item_id, request.url.params["locale"]))
+        if item_id == 404:
+            return httpx.Response(404)
+        return httpx.Response(200, json={
+            "id": item_id,
+            "name": f"Item {item_id} {request.url.params['locale']}",
+            "quality": {"type": "RARE"},
+            "item_class": {"name": "Consumible"},
+            "is_stackable": item_id % 2 == 0,
+        })
+
+    monkeypatch.setattr(
+        item_resolver.http_client,
+        "get_async_client",
+        lambda url: httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+    monkeypatch.setattr(item_resolver, "_token_cache", "tok")
+
+
+@pytest.mark.asyncio
+async def test_resolve_items_bulk_persists_per_locale(monkeypatch):
+    """Deduplica, descarga sólo lo que falta y persiste por idioma."""
+    seen = []
+    _item_server(monkeypatch, seen)
+
+    infos = await item_resolver.resolve_items([2, 3, 2, 0, 404])
+    assert sorted(seen) == [(2, "en_US"), (3, "en_US"), (404, "en_US")]
+    assert set(infos) == {2, 3}
+    assert infos[2].stackable and infos[2].commodity and infos[2].quality == "RARE"
+    assert not infos[3].commodity and infos[3].item_class == "Consumible"
+
+    # Tras reabrir la tabla, los items conocidos no se vuelven a descargar
+    item_resolver.close()
+    seen.clear()
+    names = await item_resolver.resolve_item_names([3, 2, 404])
+    assert names == {3: "Item 3 en_US", 2: "Item 2 en_US", 404: "ItemID 404"}
+    assert seen == [(404, "en_US")]
+    assert item_resolver.resolve_item_name(3) == "Item 3 en_US"
+
+    # Otro idioma es otra entrada
+    seen.clear()
+    es = await item_resolver.resolve_items([2], locale="es_ES")
+    assert es[2].name == "Item 2 es_ES" and seen == [(2, "es_ES")]
+
+
+@pytest.mark.asyncio
+async def test_resolve_items_bounded_concurrency(monkeypatch):
+    """Nunca hay más descargas simultáneas que el límite."""
+    import asyncio
+
+    active = peak = 0
+
+    class Client:
+        async def get(self, url, **kwargs):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.001)
+            active -= 1
+            return httpx.Response(200, json={"name": url}, request=httpx.Request("GET", url))
+
+    monkeypatch.setattr(item_resolver.http_client, "get_async_client", lambda url: Client())
+    monkeypatch.setattr(item_resolver, "_token_cache", "tok")
+    infos = await item_resolver.resolve_items(range(1, 21), concurrency=3)
+    assert len(infos) == 20 and peak == 3
+
+
+@pytest.mark.asyncio
+async def test_resolve_item_names_without_credentials(monkeypatch):
+    """Sin credenciales se devuelven identificadores sin fallar."""
+    monkeypatch.setattr(item_resolver, "_token_cache", None)
+    monkeypatch.setattr(item_resolver, "API_CLIENT_ID", "")
+    assert await item_resolver.resolve_item_names([5, 5]) == {5: "ItemID 5"}
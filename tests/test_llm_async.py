@@ -0,0 +1,104 @@
+"""Pruebas de las variantes asíncronas de los helpers del LLM."""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from kezan import http_client, llm_cache, llm_interface
+from kezan.auction_analyzer import AuctionAnalyzer
+from kezan.llm_interface import LLMInterface
+from kezan.profile_manager import GameVersion
+
+
+def _serve(monkeypatch, handler):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(http_client, "get_async_client", lambda url: client)
+
+
+@pytest.mark.asyncio
+async def test_async_helpers_share_cache_and_single_flight(monkeypatch):
+    llm_cache.clear()
+    calls = []
+
+    async def handler(request):
+        calls.append(json.loads(request.content)["prompt"])
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"response": "BUY(1,2,3) ahora"})
+
+    _serve(monkeypatch, handler)
+    first, second = await asyncio.gather(
+        llm_interface.analyze_items_with_llm_async([{"name": "A"}]),
+        llm_interface.analyze_items_with_llm_async([{"name": "A"}]),
+    )
+    assert first == second == "RECOMMEND_BUY(1,2,3) ahora" and len(calls) == 1
+    # La espera agrupada se sirvió sin inferencia: cuenta como acierto
+    stats = llm_cache.stats()
+    assert stats["misses"] == 1 and stats["hits"] == 1 and stats["coalesced"] == 1
+
+    def no_post(*args, **kwargs):
+        raise AssertionError("debería servirse de la caché")
+
+    monkeypatch.setattr(http_client, "get_client", lambda url: SimpleNamespace(post=no_post))
+    assert llm_interface.analyze_items_with_llm([{"name": "A"}]) == first
+
+    await llm_interface.analyze_recipes_with_llm_async([{"r": 1}], inventory=[7])
+    assert "inventario: [7]" in calls[-1] and len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_async_errors_match_sync_helpers(monkeypatch):
+    llm_cache.clear()
+
+    def down(request):
+        raise httpx.ConnectError("sin servidor")
+
+    _serve(monkeypatch, down)
+    with pytest.raises(RuntimeError, match="no está activo"):
+        await llm_interface.analyze_items_with_llm_async([{"x": 1}])
+    _serve(monkeypatch, lambda request: httpx.Response(200, json={"response": "  "}))
+    with pytest.raises(RuntimeError, match="vacía"):
+        await llm_interface.analyze_recipes_with_llm_async([{"x": 1}])
+
+    llm = LLMInterface()
+    _serve(monkeypatch, down)
+    assert await llm.suggest_search_strategy_async([], [], "retail") == llm_interface.STRATEGY_FALLBACK
+
+
+@pytest.mark.asyncio
+async def test_cached_call_async_recovers_from_cancelled_leader():
+    llm_cache.clear()
+    started = asyncio.Event()
+
+    async def slow():
+        started.set()
+        await asyncio.sleep(10)
+
+    async def fast():
+        return "ok"
+
+    leader = asyncio.ensure_future(llm_cache.cached_call_async("k", slow))
+    await started.wait()
+    follower = asyncio.ensure_future(llm_cache.cached_call_async("k", fast))
+    await asyncio.sleep(0)
+    leader.cancel()
+    assert await follower == "ok"
+    assert llm_cache.get("k") == "ok"
+
+
+@pytest.mark.asyncio
+async def test_market_insights_use_async_strategy():
+    aa = AuctionAnalyzer()
+    prefs = SimpleNamespace(watched_items=[1], price_thresholds={})
+    aa.profile_manager = SimpleNamespace(
+        get_profile=lambda gv: SimpleNamespace(preferences=prefs, auction_history={1: [5, 6]})
+    )
+
+    async def suggest(item_history, market_trends, game_version):
+        return f"async {game_version} {len(market_trends)}"
+
+    aa.llm = SimpleNamespace(suggest_search_strategy_async=suggest)
+    insights = await aa.get_market_insights(GameVersion.RETAIL, "r")
+    assert insights["strategy"] == "async retail 1"
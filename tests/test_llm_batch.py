@@ -0,0 +1,116 @@
+"""Pruebas del análisis de varios items en un único prompt."""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from kezan import llm_cache
+from kezan.auction_analyzer import AuctionAnalyzer
+from kezan.llm_interface import LLMInterface
+from kezan.profile_manager import GameVersion
+from kezan.snapshot import Snapshot
+
+
+def _llm(monkeypatch, reply):
+    prompts = []
+
+    async def post(prompt, timeout=30):
+        prompts.append(prompt)
+        return reply(prompt)
+
+    llm = LLMInterface()
+    monkeypatch.setattr(llm, "_post_async", post)
+    return llm, prompts
+
+
+def _items_in(prompt):
+    return json.loads(prompt.split("Items: ", 1)[1])
+
+
+@pytest.mark.asyncio
+async def test_batch_packs_items_validates_and_falls_back(monkeypatch):
+    llm_cache.clear()
+
+    def reply(prompt):
+        ids = [entry["id"] for entry in _items_in(prompt)]
+        answer = [
+            {"item_id": ids[0], "analysis": "sube", "opportunity": True, "reason": "r"},
+            {"item_id": ids[0], "analysis": "repetido", "opportunity": False},
+            {"item_id": 999, "analysis": "no pedido", "opportunity": True},
+        ]
+        if len(ids) > 1:
+            answer.append({"item_id": ids[1], "analysis": "x", "opportunity": "sí"})
+        return "Resultado:\n" + json.dumps(answer)
+
+    llm, prompts = _llm(monkeypatch, reply)
+    items = {i: {"price": 10 * i} for i in (1, 2, 3)}
+    stats = {2: {"min_price": 1, "max_price": 9, "mean_price": 5, "std_price": 3, "total_listings": 2}}
+    results = await llm.analyze_market_batch(items, {1: [{"p": 1}] * 20}, stats=stats)
+
+    assert len(prompts) == 1 and [e["id"] for e in _items_in(prompts[0])] == [1, 2, 3]
+    assert len(_items_in(prompts[0])[0]["history"]) == 10
+    assert results[1] == {"analysis": "sube", "opportunity": True, "reason": "r"}
+    assert results[2]["reason"] == "fallback" and results[2]["opportunity"] is False
+    assert "liquidez" in results[2]["analysis"] and results[2]["basic_stats"]["market_activity"] == 2
+    assert results[3] == {"analysis": "", "opportunity": False, "reason": "fallback"}
+
+    # El item válido queda cacheado con la misma clave que el análisis individual
+    assert await llm.analyze_market_opportunity({"price": 10}, [{"p": 1}] * 20) == results[1]
+    assert len(prompts) == 1
+
+
+@pytest.mark.asyncio
+async def test_token_budget_splits_prompts_and_timeout(monkeypatch):
+    llm_cache.clear()
+
+    def reply(prompt):
+        return json.dumps({"items": [
+            {"item_id": e["id"], "analysis": "ok", "opportunity": False} for e in _items_in(prompt)
+        ]})
+
+    llm, prompts = _llm(monkeypatch, reply)
+    items = {i: {"price": i, "pad": "x" * 200} for i in range(6)}
+    cached, batches = llm.plan_market_batches(items, max_tokens=130)
+    assert not cached and [len(b.entries) for b in batches] == [2, 2, 2]
+    results = await llm.analyze_market_batch(items)
+    assert all(r["analysis"] == "ok" for r in results.values()) and len(results) == 6
+
+    # Items mayores que el presupuesto: un lote por item y ninguno vacío
+    _, batches = llm.plan_market_batches({1: {"price": 1}, 2: {"price": 2}}, max_tokens=1)
+    assert [[e["id"] for e in b.entries] for b in batches] == [[1], [2]]
+
+    async def slow(prompt, timeout=30):
+        await asyncio.sleep(1)
+
+    monkeypatch.setattr(llm, "_post_async", slow)
+    _, batches = llm.plan_market_batches({42: {"price": 1}})
+    assert (await llm.run_market_batch(batches[0], timeout=0.01))[42]["reason"] == "timeout"
+
+
+@pytest.mark.asyncio
+async def test_watched_items_use_one_prompt_per_batch(monkeypatch):
+    llm_cache.clear()
+    llm, prompts = _llm(monkeypatch, lambda prompt: json.dumps([
+        {"item_id": e["id"], "analysis": str(e["id"]), "opportunity": True} for e in _items_in(prompt)
+    ]))
+    watched = [7, 3, 5]
+    aa = AuctionAnalyzer()
+    prefs = SimpleNamespace(watched_items=watched, price_thresholds={})
+    aa.profile_manager = SimpleNamespace(
+        get_profile=lambda gv: SimpleNamespace(preferences=prefs, auction_history={})
+    )
+
+    async def get_auctions(realm):
+        return Snapshot.from_columns(item_id=watched, quantity=[1, 1, 1], unit_price=[5.0, 6.0, 7.0], version="v1")
+
+    aa.blizzard_api = SimpleNamespace(get_auctions=get_auctions)
+    aa.llm = llm
+    results = await aa.analyze_watched_items(GameVersion.RETAIL, "r", use_realtime=False)
+    assert [r["item_id"] for r in results] == watched and len(prompts) == 1
+    assert [r["analysis"]["analysis"] for r in results] == ["7", "3", "5"]
+
+    # Segunda pasada sobre el mismo snapshot: todo sale de la caché
+    await aa.analyze_watched_items(GameVersion.RETAIL, "r", use_realtime=False)
+    assert len(prompts) == 1
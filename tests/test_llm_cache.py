@@ -0,0 +1,100 @@
+"""Pruebas de la caché de respuestas del LLM."""
+
+import json
+import types
+
+import pytest
+
+from kezan import http_client, llm_cache, llm_interface
+from kezan.llm_interface import LLMInterface
+
+
+class _Resp:
+    def __init__(self, text):
+        self.text = text
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"response": self.text}
+
+
+def test_key_is_canonical_and_scoped_by_params_and_snapshot():
+    a = llm_cache.make_key("m", 0.7, 0.9, {"x": 1, "y": [1, 2]})
+    assert a == llm_cache.make_key("m", 0.7, 0.9, {"y": [1, 2], "x": 1})
+    assert llm_cache.make_key("m", 0.7, 0.9, "hola   mundo\n") == llm_cache.make_key("m", 0.7, 0.9, "hola mundo")
+    assert a != llm_cache.make_key("m", 0.2, 0.9, {"x": 1, "y": [1, 2]})
+    assert a != llm_cache.make_key("otro", 0.7, 0.9, {"x": 1, "y": [1, 2]})
+    with llm_cache.snapshot_version('"v2"'):
+        assert a != llm_cache.make_key("m", 0.7, 0.9, {"x": 1, "y": [1, 2]})
+    assert a == llm_cache.make_key("m", 0.7, 0.9, {"x": 1, "y": [1, 2]})
+
+
+def test_persisted_ttl_and_stats(monkeypatch):
+    llm_cache.clear()
+    llm_cache.put("k", {"a": 1})
+    assert llm_cache.get("k") == {"a": 1}
+    llm_cache.close()  # sólo queda la copia en disco
+    assert llm_cache.get("k") == {"a": 1}
+    assert llm_cache.get("otra") is None
+    stats = llm_cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 1 and stats["hit_rate"] == pytest.approx(2 / 3, abs=1e-4)
+
+    llm_cache.put("corta", "x", ttl=10)
+    now = llm_cache.time.time()
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now + 11)
+    assert llm_cache.get("corta") is None
+    assert llm_cache.prune() == 1
+    llm_cache.put("nada", "x", ttl=0)
+    assert llm_cache.stats()["disk_items"] == 1
+
+
+def test_sync_helpers_reuse_cached_responses(monkeypatch):
+    calls = []
+
+    def fake_post(url, json=None, headers=None, timeout=None):
+        calls.append(json)
+        return _Resp("COMPRAR item")
+
+    monkeypatch.setattr(http_client, "get_client", lambda url: types.SimpleNamespace(post=fake_post))
+    first = llm_interface.analyze_items_with_llm([{"name": "A", "margin": 0.5}])
+    second = llm_interface.analyze_items_with_llm([{"margin": 0.5, "name": "A"}])
+    assert first == second and len(calls) == 1
+    llm_interface.analyze_recipes_with_llm([{"name": "A"}], inventory=[1])
+    llm_interface.analyze_recipes_with_llm([{"name": "A"}], inventory=[2])
+    assert len(calls) == 3
+
+    llm = LLMInterface()
+    llm.suggest_search_strategy([{"p": 1}], [], "retail")
+    llm.suggest_search_strategy([{"p": 1}], [], "retail")
+    assert len(calls) == 4
+
+
+@pytest.mark.asyncio
+async def test_market_opportunity_cached_per_snapshot(monkeypatch):
+    prompts = []
+
+    async def post(prompt, timeout=30):
+        prompts.append(prompt)
+        return json.dumps({"analysis": "a", "opportunity": True, "reason": "r"})
+
+    llm = LLMInterface()
+    monkeypatch.setattr(llm, "_post_async", post)
+    with llm_cache.snapshot_version("v1"):
+        await llm.analyze_market_opportunity({"price": 5}, [])
+        assert (await llm.analyze_market_opportunity({"price": 5}, []))["opportunity"] is True
+    with llm_cache.snapshot_version("v2"):
+        await llm.analyze_market_opportunity({"price": 5}, [])
+    assert len(prompts) == 2
+
+
+def test_stats_route():
+    from fastapi.testclient import TestClient
+    from main import app
+
+    llm_cache.clear()
+    llm_cache.put("k", "v")
+    llm_cache.get("k")
+    data = TestClient(app).get("/api/llm-cache").json()
+    assert data["hits"] == 1 and data["hit_rate"] == 1.0 and data["disk_items"] == 1
@@ -1,9 +1,11 @@
 """Pruebas para la interfaz del LLM local."""
 
+import types
+
 import httpx
 import pytest
 
-from kezan import llm_interface
+from kezan import http_client, llm_interface
 
 
 class Resp:
@@ -17,16 +19,21 @@ class Resp:
         return self._data
 
 
+def _serve(monkeypatch, post):
+    """Sustituye el cliente HTTP compartido por uno cuyo ``post`` es ``post``."""
+    monkeypatch.setattr(http_client, "get_client", lambda url: types.SimpleNamespace(post=post))
+
+
 def test_analyze_items_with_llm(monkeypatch):
     """Retorna texto cuando la respuesta es válida."""
-    monkeypatch.setattr(httpx, "post", lambda *a, **k: Resp({"response": "ok"}))
+    _serve(monkeypatch, lambda *a, **k: Resp({"response": "ok"}))
     res = llm_interface.analyze_items_with_llm([{"a": 1}])
     assert res == "ok"
 
 
 def test_analyze_items_with_llm_empty(monkeypatch):
     """Error cuando el modelo responde vacío."""
-    monkeypatch.setattr(httpx, "post", lambda *a, **k: Resp({"response": ""}))
+    _serve(monkeypatch, lambda *a, **k: Resp({"response": ""}))
     with pytest.raises(RuntimeError):
         llm_interface.analyze_items_with_llm([{}])
 
@@ -37,14 +44,14 @@ def test_analyze_items_with_llm_error(monkeypatch):
     def fake_post(*a, **k):
         raise httpx.HTTPError("fail")
 
-    monkeypatch.setattr(httpx, "post", fake_post)
+    _serve(monkeypatch, fake_post)
     with pytest.raises(RuntimeError):
         llm_interface.analyze_items_with_llm([])
 
 
 def test_analyze_recipes_with_llm(monkeypatch):
     """Analiza recetas incluyendo inventario previo."""
-    monkeypatch.setattr(httpx, "post", lambda *a, **k: Resp({"response": "texto"}))
+    _serve(monkeypatch, lambda *a, **k: Resp({"response": "texto"}))
     res = llm_interface.analyze_recipes_with_llm([{"r": 1}], inventory=[1])
     assert res == "texto"
 
@@ -55,14 +62,14 @@ def test_analyze_recipes_with_llm_error(monkeypatch):
     def boom(*a, **k):
         raise httpx.HTTPError("fail")
 
-    monkeypatch.setattr(httpx, "post", boom)
+    _serve(monkeypatch, boom)
     with pytest.raises(RuntimeError):
         llm_interface.analyze_recipes_with_llm([])
 
 
 def test_analyze_recipes_with_llm_empty(monkeypatch):
     """Error cuando la respuesta de recetas está vacía."""
-    monkeypatch.setattr(httpx, "post", lambda *a, **k: Resp({"response": ""}))
+    _serve(monkeypatch, lambda *a, **k: Resp({"response": ""}))
     with pytest.raises(RuntimeError):
         llm_interface.analyze_recipes_with_llm([{}])
 
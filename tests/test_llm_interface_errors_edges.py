@@ -15,12 +15,11 @@ class BadResp:
 
 
 def test_analyze_items_with_llm_invalid_json_raises(monkeypatch):
-    class MockHTTPX:
-        HTTPError = RuntimeError
+    class MockClient:
         @staticmethod
         def post(*a, **k):
             return BadResp({})
-    monkeypatch.setattr(mod, "httpx", MockHTTPX)
+    monkeypatch.setattr(mod.http_client, "get_client", lambda url: MockClient)
     with pytest.raises(RuntimeError):
         mod.analyze_items_with_llm([{ "x": 1 }])
 
@@ -34,12 +33,12 @@ def test_analyze_recipes_with_inventory_changes_prompt(monkeypatch):
             return self._data
         def raise_for_status(self):
             pass
-    # Patch httpx and sanitize_dsl_text to observe call
+    # Patch the shared HTTP client to observe the call
     def fake_post(*a, **k):
         # assert prompt contains inventory phrase
         payload = k.get("json") or {}
         assert "prompt" in payload and "inventario" in payload["prompt"].lower()
         return OkResp()
-    monkeypatch.setattr(mod, "httpx", types.SimpleNamespace(post=fake_post))
+    monkeypatch.setattr(mod.http_client, "get_client", lambda url: types.SimpleNamespace(post=fake_post))
     out = mod.analyze_recipes_with_llm([{ "r": 1 }], inventory=[1, 2])
     assert out == "hola"
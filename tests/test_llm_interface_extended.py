@@ -2,6 +2,7 @@ import json
 import types
 import pytest
 
+from kezan import llm_cache
 from kezan.llm_interface import LLMInterface
 
 
@@ -35,7 +36,7 @@ async def test__post_async_ollama(monkeypatch):
             return await fake_post(self, url, json=json, headers=headers, timeout=timeout)
 
     import kezan.llm_interface as mod
-    monkeypatch.setattr(mod, "httpx", types.SimpleNamespace(AsyncClient=FakeClient, post=lambda *a, **k: DummyResp({"response": "hola"})))
+    monkeypatch.setattr(mod.http_client, "get_async_client", lambda url: FakeClient())
 
     out = await llm._post_async("hola")
     assert out == "hola"
@@ -64,7 +65,7 @@ async def test__post_async_openai(monkeypatch):
             return await fake_post(self, url, json=json, headers=headers, timeout=timeout)
 
     import kezan.llm_interface as mod
-    monkeypatch.setattr(mod, "httpx", types.SimpleNamespace(AsyncClient=FakeClient, post=lambda *a, **k: DummyResp(openai_like)))
+    monkeypatch.setattr(mod.http_client, "get_async_client", lambda url: FakeClient())
 
     out = await llm._post_async("hola")
     assert out == "respuesta"
@@ -80,7 +81,7 @@ def test__post_sync_and_payload_headers(monkeypatch):
     assert "messages" not in cfg["payload"]
 
     import kezan.llm_interface as mod
-    monkeypatch.setattr(mod, "httpx", types.SimpleNamespace(post=lambda *a, **k: DummyResp({"response": "sync"})))
+    monkeypatch.setattr(mod.http_client, "get_client", lambda url: types.SimpleNamespace(post=lambda *a, **k: DummyResp({"response": "sync"})))
 
     out = llm._post_sync("hola")
     assert out == "sync"
@@ -109,7 +110,7 @@ async def test_analyze_intent_success_and_fallback(monkeypatch):
 
     import kezan.llm_interface as mod
     # Return proper JSON
-    monkeypatch.setattr(mod, "httpx", types.SimpleNamespace(AsyncClient=FakeClient))
+    monkeypatch.setattr(mod.http_client, "get_async_client", lambda url: FakeClient())
     # Craft response to be a JSON string
     async def fake__post_async(prompt: str, timeout: int = 30):
         return json.dumps({"type": "query", "operation": "read", "requires_api_call": False, "requires_file_access": False})
@@ -170,5 +171,6 @@ async def test_analyze_market_opportunity_paths(monkeypatch):
         raise RuntimeError("x")
 
     monkeypatch.setattr(LLMInterface, "_post_async", staticmethod(bad))
+    llm_cache.clear()  # la respuesta válida anterior está cacheada
     r2 = await llm.analyze_market_opportunity({"a": 1}, [])
     assert r2.get("opportunity") is False and "reason" in r2
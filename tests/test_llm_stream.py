@@ -0,0 +1,108 @@
+"""Pruebas del streaming de respuestas del LLM."""
+
+import json
+import types
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import kezan.api as api_module
+from kezan import http_client, llm_cache, llm_interface
+from kezan.compliance import sanitize_dsl_stream
+from kezan.llm_interface import LLMInterface
+
+
+def _serve(monkeypatch, body, seen=None):
+    def handler(request):
+        if seen is not None:
+            seen.append(json.loads(request.content))
+        return httpx.Response(200, content=body)
+
+    monkeypatch.setattr(
+        http_client, "get_async_client", lambda url: httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+
+
+async def _collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+@pytest.mark.asyncio
+async def test_sanitizer_works_on_complete_lines():
+    async def tokens():
+        for token in ("Consejo: BU", "Y(1,2", ")\nluego CRA", "FT(3)"):
+            yield token
+
+    assert await _collect(sanitize_dsl_stream(tokens())) == [
+        "Consejo: RECOMMEND_BUY(1,2)\n",
+        "luego RECOMMEND_CRAFT(3)",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_ollama_ndjson_stream(monkeypatch):
+    seen = []
+    lines = [{"response": "Hola", "done": False}, {"response": " mundo", "done": False},
+             {"response": "", "done": True}, {"response": "ignorado"}]
+    _serve(monkeypatch, "\n".join(json.dumps(line) for line in lines).encode(), seen)
+    llm = LLMInterface()
+    llm.api_url = "http://localhost:11434/api/generate"
+    assert await _collect(llm.stream_text("p")) == ["Hola", " mundo"]
+    assert seen[0]["stream"] is True and seen[0]["prompt"] == "p"
+
+    _serve(monkeypatch, b'{"error": "model not found"}\n')
+    with pytest.raises(RuntimeError):
+        await _collect(llm.stream_text("p"))
+
+
+@pytest.mark.asyncio
+async def test_openai_sse_stream(monkeypatch):
+    seen = []
+    events = [{"choices": [{"delta": {"role": "assistant"}}]},
+              {"choices": [{"delta": {"content": "Ho"}}]},
+              {"choices": [{"delta": {"content": "la"}, "finish_reason": None}]}]
+    body = ": keep-alive\n\n" + "".join(f"data: {json.dumps(e)}\n\n" for e in events) + "data: [DONE]\n\n"
+    _serve(monkeypatch, body.encode(), seen)
+    llm = LLMInterface()
+    llm.api_url = "http://localhost:1234/v1/chat/completions"
+    assert await _collect(llm.stream_text("p")) == ["Ho", "la"]
+    assert seen[0]["stream"] is True and seen[0]["messages"][0]["content"] == "p"
+
+
+@pytest.mark.asyncio
+async def test_stream_items_shares_cache_with_sync_helper(monkeypatch):
+    llm_cache.clear()
+    lines = [{"response": "BUY(1,", "done": False}, {"response": "2,3)\nfin", "done": True}]
+    _serve(monkeypatch, "\n".join(json.dumps(line) for line in lines).encode())
+    streamed = await _collect(llm_interface.stream_items_with_llm([{"name": "A"}]))
+    assert streamed == ["RECOMMEND_BUY(1,2,3)\n", "fin"]
+
+    def no_post(*args, **kwargs):
+        raise AssertionError("debería servirse de la caché")
+
+    monkeypatch.setattr(http_client, "get_client", lambda url: types.SimpleNamespace(post=no_post))
+    assert llm_interface.analyze_items_with_llm([{"name": "A"}]) == "RECOMMEND_BUY(1,2,3)\nfin"
+    assert await _collect(llm_interface.stream_items_with_llm([{"name": "A"}])) == ["RECOMMEND_BUY(1,2,3)\nfin"]
+
+    _serve(monkeypatch, b"")
+    with pytest.raises(RuntimeError):
+        await _collect(llm_interface.stream_items_with_llm([{"name": "B"}]))
+
+
+def test_consejo_stream_route(monkeypatch):
+    from main import app
+
+    async def fake_get_top_items(limit=5, min_margin=0.3):
+        return {"items": [{"name": "Black Lotus"}]}
+
+    async def fake_stream(items):
+        yield "Vigila "
+        yield items[0]["name"]
+        raise RuntimeError("El modelo de IA local no está activo o no responde.")
+
+    monkeypatch.setattr(api_module, "get_top_items", fake_get_top_items)
+    monkeypatch.setattr(api_module, "stream_items_with_llm", fake_stream)
+    response = TestClient(app).get("/api/consejo/stream")
+    assert response.status_code == 200 and response.headers["content-type"].startswith("text/plain")
+    assert response.text == "Vigila Black Lotus\n[error] El modelo de IA local no está activo o no responde.\n"
@@ -0,0 +1,74 @@
+"""La ruta vectorizada de preprocess_auction_data coincide con la ruta por item."""
+
+import math
+import random
+import types
+
+import numpy as np
+
+
+def _per_item_numpy():
+    # NumPy real sin reducciones por segmento -> fuerza la ruta por item
+    return types.SimpleNamespace(
+        array=np.array, min=np.min, max=np.max, mean=np.mean,
+        median=np.median, std=np.std, abs=np.abs, where=np.where,
+    )
+
+
+def _raw_auctions(seed=7):
+    rnd = random.Random(seed)
+    raw = []
+    for _ in range(400):
+        item = rnd.choice([5, 3, 11, 8, 42])
+        raw.append({"item": {"id": item}, "unit_price": rnd.randint(90, 110), "quantity": rnd.randint(1, 20)})
+    # Valores extremos para generar anomalías y un item sin dispersión
+    raw.append({"item": {"id": 3}, "unit_price": 100000, "quantity": 1})
+    raw.append({"item": {"id": 8}, "unit_price": 50000})
+    raw.extend({"item": {"id": 77}, "unit_price": 9, "quantity": 2} for _ in range(3))
+    return raw
+
+
+def test_segmented_matches_per_item(monkeypatch, tmp_path):
+    import kezan.market_optimizer as mo
+
+    raw = _raw_auctions()
+    mdp = mo.MarketDataProcessor(cache_dir=str(tmp_path / "c"))
+
+    monkeypatch.setattr(mo, "np", np)
+    fast = mdp.preprocess_auction_data(raw)
+    monkeypatch.setattr(mo, "np", _per_item_numpy())
+    slow = mdp.preprocess_auction_data(raw)
+
+    assert list(fast["summary"]) == list(slow["summary"])
+    for item_id, stats in slow["summary"].items():
+        for key, value in stats.items():
+            assert math.isclose(fast["summary"][item_id][key], value, rel_tol=1e-9), (item_id, key)
+
+    assert [(a["item_id"], a["price"]) for a in fast["anomalies"]] == [
+        (a["item_id"], a["price"]) for a in slow["anomalies"]
+    ]
+    assert fast["anomalies"] and fast["summary"][77]["std_price"] == 0.0
+
+
+def test_segmented_zero_std_and_errors(monkeypatch, tmp_path):
+    import kezan.market_optimizer as mo
+    from kezan.snapshot import Snapshot
+
+    monkeypatch.setattr(mo, "np", np)
+    mdp = mo.MarketDataProcessor(cache_dir=str(tmp_path / "c"))
+
+    with np.errstate(all="raise"):
+        out = mdp.preprocess_auction_data([{"item": {"id": 1}, "unit_price": 4}] * 3)
+    assert out["anomalies"] == [] and out["summary"][1]["std_price"] == 0.0
+
+    assert mdp.preprocess_auction_data([]) == {"summary": {}, "trends": {}, "anomalies": []}
+    # Claves ausentes -> None como en la ruta original
+    assert mdp.preprocess_auction_data([{"item": {"id": 1}}]) is None
+
+    snap = Snapshot.from_payload({"auctions": [
+        {"item": {"id": 2}, "quantity": 1, "unit_price": 3},
+        {"item": {"id": 2}, "quantity": 2, "unit_price": 7},
+        {"item": {"id": 2}, "quantity": 1, "bid": 5},
+    ]})
+    out = mdp.preprocess_auction_data(snap)
+    assert out["summary"][2]["median_price"] == 5.0 and out["summary"][2]["total_listings"] == 2
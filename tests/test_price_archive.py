@@ -0,0 +1,117 @@
+"""Pruebas para el archivo de precios horarios mapeado en memoria."""
+
+import numpy as np
+import pytest
+
+from kezan import price_archive
+from kezan.price_archive import PriceArchive, aggregate_hour
+from kezan.snapshot import Snapshot
+
+DAY = 20000  # día arbitrario (epoch // 86400)
+HOUR = DAY * 24
+
+
+def _snap(price_shift=0.0, scope=1305, version=""):
+    return Snapshot.from_columns(
+        item_id=[1, 1, 1, 2, 3],
+        quantity=[1, 8, 1, 5, 2],
+        unit_price=[10.0 + price_shift, 20.0 + price_shift, 30.0 + price_shift, 7.0, float("nan")],
+        scope=[scope] * 5,
+        version=version,
+    )
+
+
+def test_aggregate_hour_weighted_percentiles():
+    rows = aggregate_hour(_snap(), HOUR)
+    assert rows["item_id"].tolist() == [1, 2]  # el item sin precio se descarta
+    first = rows[0]
+    assert (first["min"], first["p10"], first["p50"], first["volume"]) == (10.0, 10.0, 20.0, 10)
+    assert rows[1]["p50"] == 7.0 and rows[1]["hour"] == HOUR
+    assert len(aggregate_hour(Snapshot.from_columns(item_id=[], quantity=[], unit_price=[]), HOUR)) == 0
+
+
+def test_append_query_and_seal(tmp_path):
+    archive = PriceArchive(tmp_path)
+    assert archive.append_snapshot(_snap(), hour=HOUR) == 2
+    assert archive.append_snapshot(_snap(), hour=HOUR) == 0  # hora repetida
+    assert archive.append_snapshot(_snap(1.0), hour=HOUR + 1) == 2
+    assert archive.append_snapshot(_snap(scope=0), hour=HOUR + 1) == 2  # otro scope
+
+    rows = archive.history(1, start_hour=HOUR, end_hour=HOUR + 23)
+    assert rows["hour"].tolist() == [HOUR, HOUR + 1, HOUR + 1]
+    assert archive.history(1, scope=1305, start_hour=HOUR, end_hour=HOUR + 23)["min"].tolist() == [10.0, 11.0]
+
+    # Al pasar al día siguiente se sella el anterior con su índice
+    archive.append_snapshot(_snap(2.0), hour=HOUR + 24)
+    assert (tmp_path / f"seg-{DAY}.idx.npy").exists()
+    index = np.load(tmp_path / f"seg-{DAY}.idx.npy")
+    assert index["item_id"].tolist() == [1, 2] and index["count"].tolist() == [3, 3]
+
+    full = archive.history(1, scope=1305, start_hour=HOUR, end_hour=HOUR + 47)
+    assert full["min"].tolist() == [10.0, 11.0, 12.0]
+    assert len(archive.history(99, start_hour=HOUR, end_hour=HOUR + 47)) == 0
+
+    # Una instancia nueva lee los mismos datos desde disco
+    again = PriceArchive(tmp_path)
+    assert again.history(1, scope=1305, start_hour=HOUR, end_hour=HOUR + 47)["min"].tolist() == [10.0, 11.0, 12.0]
+    assert again.append_snapshot(_snap(), hour=HOUR + 24) == 0
+
+
+def test_partial_row_and_prune(tmp_path):
+    archive = PriceArchive(tmp_path)
+    archive.append_snapshot(_snap(), hour=HOUR)
+    with open(tmp_path / f"seg-{DAY}.bin", "ab") as fh:
+        fh.write(b"\x00" * 10)  # escritura interrumpida
+    fresh = PriceArchive(tmp_path)
+    assert fresh.append_snapshot(_snap(1.0), hour=HOUR + 1) == 2
+    assert fresh.history(2, start_hour=HOUR, end_hour=HOUR + 1)["hour"].tolist() == [HOUR, HOUR + 1]
+    assert fresh.prune(keep_days=10, now_day=DAY + 20) == 1 and fresh.days() == []
+
+
+def test_series_route_and_simulator(monkeypatch, tmp_path):
+    hour = int(price_archive.time.time() // 3600)
+    price_archive.get_archive().append_snapshot(_snap(), hour=hour)
+
+    from kezan.simulator import load_history
+
+    series = load_history(1, scope=1305, days=1)
+    assert series == [{"item_id": 1, "scope": 1305, "hour": hour, "min": 10.0, "p10": 10.0, "p50": 20.0, "volume": 10}]
+
+    from fastapi.testclient import TestClient
+    from main import app
+
+    client = TestClient(app)
+    resp = client.post("/api/simulate", json={"item_id": 1})
+    assert resp.status_code == 200 and resp.json()["trades"] == 1
+    resp = client.post("/api/simulate", json={"item_id": "1", "scope": 1305})
+    assert resp.status_code == 200 and resp.json()["trades"] == 1
+    for body in ({"item_id": "abc"}, {"item_id": -1}, {"item_id": True}, {"item_id": 1, "scope": "x"}, {"item_id": 1, "scope": [1]}):
+        assert client.post("/api/simulate", json=body).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_scanner_archives_new_snapshots(tmp_path):
+    from kezan.realm_scanner import RealmScanner
+
+    snap = _snap(version="v1")
+
+    class API:
+        async def get_auctions(self, realm):
+            return snap
+
+    archive = PriceArchive(tmp_path)
+    scanner = RealmScanner(["1305"], api=API(), archive=archive, clock=lambda: HOUR * 3600.0)
+    await scanner.scan()
+    await scanner.scan()  # misma versión: no se vuelve a archivar
+    assert archive.history(1, start_hour=HOUR, end_hour=HOUR)["volume"].tolist() == [10]
+
+
+def test_monitor_feeds_shared_archive():
+    from kezan.auction_analyzer import AuctionAnalyzer
+
+    monitor = AuctionAnalyzer().realtime_monitor
+    monitor._load_snapshot(_snap(version="v1"))
+    monitor._load_snapshot(_snap(version="v1"))  # misma versión: no se vuelve a archivar
+    hour = int(price_archive.time.time() // 3600)
+    rows = price_archive.get_archive().history(1, start_hour=hour - 1, end_hour=hour)
+    assert rows["volume"].tolist() == [10]
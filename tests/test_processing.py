@@ -0,0 +1,194 @@
+"""Pruebas del procesado de snapshots en un pool de procesos."""
+
+import asyncio
+import json
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from kezan import blizzard_api, processing
+from kezan.bargain_detector import Config, Stats
+from kezan.market_optimizer import MarketDataProcessor
+from kezan.snapshot import Snapshot
+
+PAYLOAD = {
+    "auctions": [
+        {"id": 1, "item": {"id": 5}, "quantity": 10, "unit_price": 100, "time_left": "LONG"},
+        {"id": 2, "item": {"id": 5}, "quantity": 4, "unit_price": 120, "time_left": "SHORT"},
+        {"id": 3, "item": {"id": 9}, "quantity": 1, "buyout": 700},
+        {"id": 4, "item": {"id": 9}, "quantity": 1, "bid": 10},
+    ]
+}
+
+
+class _History:
+    """Histórico serializable: precio de referencia alto para el item 5."""
+
+    def get_stats(self, key):
+        if key[1] == 5:
+            return Stats(P50_7d=200.0, P50_30d=210.0, MAD_7d=5.0, vol_7d=1000, rot=1.0)
+        return None
+
+
+def test_shared_arrays_roundtrip_frees_block():
+    shared = processing.SharedArrays.create({"a": np.arange(3), "b": np.array([1.5]), "c": np.empty(0)})
+    out = shared.load()
+    assert out["a"].tolist() == [0, 1, 2] and out["b"].tolist() == [1.5] and out["c"].size == 0
+    with pytest.raises(FileNotFoundError):
+        processing.SharedArrays(shared.name, shared.layout).load()
+
+
+@pytest.mark.asyncio
+async def test_pool_parses_aggregates_and_detects_bargains(tmp_path):
+    proc = processing.SnapshotProcessor(workers=1)
+    try:
+        result = await proc.process(
+            json.dumps(PAYLOAD).encode(), version="v1", history=_History(), capital=10_000, cfg=Config()
+        )
+    finally:
+        proc.shutdown()
+    snap = result.snapshot
+    assert snap.version == "v1" and snap.items.tolist() == [5, 9] and len(snap) == 4
+    assert result.summary["item_id"].tolist() == [5, 9]
+    assert result.summary["min_price"].tolist() == [100.0, 700.0]
+    assert result.summary["total_quantity"].tolist() == [14, 1]
+    assert [b["item_id"] for b in result.bargains] == [5, 5]
+    # Mismo resultado que la ruta en proceso
+    mdp = MarketDataProcessor(cache_dir=str(tmp_path / "c"))
+    expected = mdp.preprocess_auction_data(Snapshot.from_payload(PAYLOAD))
+    assert result.to_processed() == expected
+
+
+@pytest.mark.asyncio
+async def test_inline_processor_accepts_snapshot_and_bad_payload(tmp_path, monkeypatch):
+    proc = processing.SnapshotProcessor(workers=0)
+    result = await proc.process(Snapshot.from_payload(PAYLOAD, version="v2"))
+    assert result.snapshot.version == "v2" and result.anomalies["item_id"].size == 0
+    with pytest.raises(ValueError):
+        await proc.process(b"{no json")
+
+    monkeypatch.setattr(processing, "_processor", proc)
+    mdp = MarketDataProcessor(cache_dir=str(tmp_path / "c"))
+    out = await mdp.preprocess_auction_data_async(json.dumps(PAYLOAD).encode())
+    assert out["summary"][9]["max_price"] == 700.0
+    assert await mdp.preprocess_auction_data_async(b"[") is None
+    listed = await mdp.preprocess_auction_data_async([{"item": {"id": 1}, "unit_price": 4}])
+    assert listed["summary"][1]["min_price"] == 4
+
+
+@pytest.mark.asyncio
+async def test_full_download_uses_processor(monkeypatch):
+    calls = []
+
+    async def body(url, validators=None):
+        validators.etag = '"e1"'
+        validators.last_modified = "Tue, 13 Oct 2026 10:00:00 GMT"
+        for part in (json.dumps(PAYLOAD).encode()[:10], json.dumps(PAYLOAD).encode()[10:]):
+            yield part
+
+    class Proc:
+        async def process(self, raw, scope, version, aggregate=True):
+            calls.append((raw, scope, version, aggregate))
+            return await processing.SnapshotProcessor(workers=0).process(
+                raw, scope=scope, version=version, aggregate=aggregate
+            )
+
+    monkeypatch.setattr(blizzard_api, "PROCESS_WORKERS", 2)
+    monkeypatch.setattr(blizzard_api, "_stream_body", body)
+    monkeypatch.setattr(processing, "get_processor", lambda: Proc())
+    snap = await blizzard_api._download_snapshot(None, "https://example/auctions", 1080)
+    assert calls == [(json.dumps(PAYLOAD).encode(), 1080, '"e1"', False)]
+    assert isinstance(calls[0][0], bytearray)  # el cuerpo no se copia a bytes
+    assert snap.items.tolist() == [5, 9] and (snap.scope == 1080).all() and snap.version == '"e1"'
+    assert snap.meta["last_modified"] == "Tue, 13 Oct 2026 10:00:00 GMT"
+    blizzard_api._last_snapshots.pop("https://example/auctions", None)
+    blizzard_api._validators.pop("https://example/auctions", None)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_wait_releases_shared_blocks(monkeypatch):
+    proc = processing.SnapshotProcessor(workers=0)
+    result = await proc.process(json.dumps(PAYLOAD).encode(), aggregate=False)
+    assert len(result.snapshot) == 4 and result.summary["item_id"].size == 0
+    assert result.to_processed() == {"summary": {}, "trends": {}, "anomalies": []}
+
+    started, release = threading.Event(), threading.Event()
+    created, freed = [], []
+    original_process, original_discard = processing._process, processing._discard
+
+    def slow_process(*args):
+        started.set()
+        release.wait(5)
+        shared, bargains = original_process(*args)
+        created.append(shared.name)
+        return shared, bargains
+
+    def discard(shared):
+        freed.append(shared.name)
+        original_discard(shared)
+
+    monkeypatch.setattr(processing, "_process", slow_process)
+    monkeypatch.setattr(processing, "_discard", discard)
+    task = asyncio.ensure_future(proc.process(Snapshot.from_payload(PAYLOAD)))
+    await asyncio.to_thread(started.wait, 5)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    release.set()
+    for _ in range(100):
+        if created and created[0] in freed:
+            break
+        await asyncio.sleep(0.01)
+    assert created and created[0] in freed
+    with pytest.raises(FileNotFoundError):
+        processing.SharedArrays(created[0], ()).load()
+
+
+@pytest.mark.asyncio
+async def test_monitor_and_full_scan_detect_bargains_off_loop(tmp_path, monkeypatch):
+    from kezan.auction_analyzer import AuctionAnalyzer
+    from kezan.profile_manager import GameVersion, ProfileManager
+
+    az = AuctionAnalyzer()
+    now_hour = int(time.time() // 3600)
+    for h in range(48):  # item 5 estable a 200 con 10 unidades vendidas por hora
+        seed = Snapshot.from_columns(item_id=[5], quantity=[1000 - 10 * h], unit_price=[200.0], scope=[1305])
+        az.rolling_stats.ingest(seed, scope="1305", hour=now_hour - 48 + h)
+    cheap = Snapshot.from_columns(
+        item_id=[5, 6], quantity=[3, 1], unit_price=[100.0, 9.0], scope=[1305, 1305], version="v9",
+        meta={"last_modified": "x"},
+    )
+
+    # El histórico publicado viaja al pool y el snapshot no vuelve por memoria compartida
+    pool = processing.SnapshotProcessor(workers=1)
+    try:
+        result = await pool.process(cheap, scope=1305, history=az.rolling_stats.table(), capital=10_000)
+    finally:
+        pool.shutdown()
+    assert result.snapshot is cheap and [b["item_id"] for b in result.bargains] == [5]
+
+    class API:
+        async def get_auctions(self, realm):
+            return cheap
+
+    monitor = az.realtime_monitor
+    assert await monitor.update_auction_data(API(), "1305") is True
+    assert [b["item_id"] for b in monitor.bargains] == [5]
+    assert monitor.view.processed.summary["item_id"].tolist() == [5, 6]
+
+    class LLM:
+        async def scan_auction_house(self, current_data, profile_preferences, game_version):
+            return []
+
+    async def stop(_):
+        raise asyncio.CancelledError()
+
+    az.llm, az.blizzard_api = LLM(), API()
+    az.profile_manager = ProfileManager(config_dir=str(tmp_path / "profiles"))
+    monkeypatch.setattr(asyncio, "sleep", stop)
+    with pytest.raises(asyncio.CancelledError):
+        await az.full_scan(GameVersion.RETAIL, realm="1305", scan_interval=0)
+    assert [b["item_id"] for b in az.bargains["1305"]] == [5]
+    assert az.profile_manager.get_auction_history(GameVersion.RETAIL, 5)[-1]["price"] == 100.0
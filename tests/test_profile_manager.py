@@ -2,7 +2,7 @@ import pytest
 import os
 import tempfile
 from pathlib import Path
-from kezan.profile_manager import ProfileManager, GameVersion, Profile, SearchPreferences
+from kezan.profile_manager import ProfileManager, GameVersion, SearchPreferences
 
 @pytest.fixture
 def temp_config_dir():
@@ -11,7 +11,9 @@ def temp_config_dir():
 
 @pytest.fixture
 def profile_manager(temp_config_dir):
-    return ProfileManager(config_dir=temp_config_dir)
+    pm = ProfileManager(config_dir=temp_config_dir)
+    yield pm
+    pm.flush()  # antes de borrar el directorio temporal
 
 def test_profile_creation(profile_manager):
     """Verifica que los perfiles se crean correctamente."""
@@ -98,3 +100,185 @@ def test_multiple_versions(profile_manager):
     assert retail.preferences.default_realm == "Sargeras"
     assert classic.preferences.default_realm == "Faerlina"
     assert retail.preferences.watched_items != classic.preferences.watched_items
+
+def test_auction_history_separate_store_and_batched(profile_manager, temp_config_dir):
+    """El historial vive fuera del JSON del perfil y se escribe por lotes."""
+    import json
+
+    version = GameVersion.RETAIL
+    for price in range(3):
+        profile_manager.update_auction_history(version, 7, {"price": price}, flush=False)
+    history_file = Path(temp_config_dir) / "history" / "retail.jsonl"
+    assert not history_file.exists()  # nada escrito hasta el flush
+    assert profile_manager.get_auction_history(version, 7) == [{"price": 0}, {"price": 1}, {"price": 2}]
+    assert profile_manager.flush_history() == 3
+    assert len(history_file.read_text(encoding="utf-8").splitlines()) == 3
+
+    data = json.loads((Path(temp_config_dir) / "retail.json").read_text(encoding="utf-8"))
+    assert "auction_history" not in data
+
+    # Una instancia nueva recupera el historial
+    fresh = ProfileManager(config_dir=temp_config_dir)
+    assert fresh.get_profile(version).auction_history == {7: [{"price": 0}, {"price": 1}, {"price": 2}]}
+
+
+def test_auction_history_limit_compaction_and_legacy(temp_config_dir):
+    """Se conservan 100 registros por item, se compacta y se migra el formato antiguo."""
+    import json
+
+    legacy = {
+        "version": "classic",
+        "preferences": {"default_realm": "", "watched_items": [], "price_thresholds": {}, "notification_enabled": True},
+        "last_scan": None,
+        "auction_history": {"5": [{"price": 1}]},
+    }
+    (Path(temp_config_dir) / "classic.json").write_text(json.dumps(legacy), encoding="utf-8")
+    pm = ProfileManager(config_dir=temp_config_dir)
+    assert pm.get_profile(GameVersion.CLASSIC).auction_history == {5: [{"price": 1}]}
+    migrated = json.loads((Path(temp_config_dir) / "classic.json").read_text(encoding="utf-8"))
+    assert "auction_history" not in migrated
+    assert pm.get_profile(GameVersion.CLASSIC).auction_history == {5: [{"price": 1}]}  # sin duplicar
+
+    for price in range(450):
+        pm.update_auction_history(GameVersion.RETAIL, 1, {"price": price}, flush=False)
+    pm.flush_history()
+    records = pm.get_auction_history(GameVersion.RETAIL, 1)
+    assert len(records) == 100 and records[-1] == {"price": 449}
+    lines = (Path(temp_config_dir) / "history" / "retail.jsonl").read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 100
+    assert ProfileManager(config_dir=temp_config_dir).get_auction_history(GameVersion.RETAIL, 1) == records
+
+
+def test_history_shared_between_managers_and_other_writers(temp_config_dir):
+    """Otras instancias y otros escritores del fichero no dejan lecturas viejas ni pierden registros."""
+    from kezan.auction_history import AuctionHistoryStore
+
+    a = ProfileManager(config_dir=temp_config_dir)
+    b = ProfileManager(config_dir=temp_config_dir)
+    a.update_auction_history(GameVersion.RETAIL, 1, {"price": 5})
+    assert b.get_auction_history(GameVersion.RETAIL, 1) == [{"price": 5}]
+
+    # Un almacén independiente (como otro proceso) escribe en el mismo fichero
+    other = AuctionHistoryStore(Path(temp_config_dir) / "history")
+    other.append("retail", 99, {"price": 7})
+    other.flush()
+    assert a.get_auction_history(GameVersion.RETAIL, 99) == [{"price": 7}]
+    other.append("retail", 99, {"price": 8})
+    other.flush()
+    a.history.compact("retail")
+    fresh = AuctionHistoryStore(Path(temp_config_dir) / "history")
+    assert fresh.get("retail", 99) == [{"price": 7}, {"price": 8}]
+    assert fresh.get("retail", 1) == [{"price": 5}]
+
+
+def test_profiles_served_from_memory_with_write_behind(temp_config_dir):
+    """Las lecturas no tocan el JSON y las escrituras se agrupan."""
+    import json
+    import time
+
+    pm = ProfileManager(config_dir=temp_config_dir, write_delay=60)
+    path = Path(temp_config_dir) / "retail.json"
+    writes = []
+    original = pm._write
+    pm._write = lambda profile: (writes.append(profile.version), original(profile))
+
+    pm.add_watched_item(GameVersion.RETAIL, 1, 10)
+    pm.add_watched_item(GameVersion.RETAIL, 2)
+    assert pm.set_price_threshold(GameVersion.RETAIL, 2, 5)
+    assert not pm.set_price_threshold(GameVersion.RETAIL, 3, 5)
+    assert pm.get_profile(GameVersion.RETAIL).preferences.watched_items == [1, 2]
+    assert json.loads(path.read_text(encoding="utf-8"))["preferences"]["watched_items"] == []
+    assert writes == []
+
+    # Las copias devueltas no alteran el estado interno
+    copy_ = pm.get_profile(GameVersion.RETAIL)
+    copy_.preferences.watched_items.append(99)
+    assert 99 not in pm.get_profile(GameVersion.RETAIL).preferences.watched_items
+
+    assert pm.flush() == 1 and writes == [GameVersion.RETAIL]
+    saved = json.loads(path.read_text(encoding="utf-8"))["preferences"]
+    assert saved["watched_items"] == [1, 2] and saved["price_thresholds"] == {"1": 10, "2": 5}
+    assert not list(Path(temp_config_dir).glob("*.tmp"))
+
+    # Escritura diferida automática
+    pm.write_delay = 0.05
+    pm.remove_watched_item(GameVersion.RETAIL, 1)
+    deadline = time.time() + 2
+    while pm._dirty and time.time() < deadline:
+        time.sleep(0.01)
+    assert json.loads(path.read_text(encoding="utf-8"))["preferences"]["watched_items"] == [2]
+
+
+def test_external_edit_is_reloaded(profile_manager, temp_config_dir):
+    """Un cambio del fichero fuera del proceso se detecta en la siguiente lectura."""
+    import json
+
+    path = Path(temp_config_dir) / "classic.json"
+    data = json.loads(path.read_text(encoding="utf-8"))
+    data["preferences"]["default_realm"] = "Mankrik"
+    path.write_text(json.dumps(data), encoding="utf-8")
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert profile_manager.get_profile(GameVersion.CLASSIC).preferences.default_realm == "Mankrik"
+
+
+@pytest.mark.asyncio
+async def test_async_call_serializes(profile_manager):
+    """``call`` ejecuta en hilos sin intercalar operaciones."""
+    import asyncio
+
+    await asyncio.gather(*(
+        profile_manager.call(profile_manager.add_watched_item, GameVersion.RETAIL, item_id)
+        for item_id in range(20)
+    ))
+    profile = await profile_manager.call(profile_manager.get_profile, GameVersion.RETAIL)
+    assert sorted(profile.preferences.watched_items) == list(range(20))
+
+
+@pytest.mark.asyncio
+async def test_history_is_lazy_and_thread_safe(profile_manager, monkeypatch):
+    """``get_profile`` no copia el historial y los hilos de ``call`` no se pisan."""
+    import asyncio
+    import threading
+
+    def no_full_copy(version):
+        raise AssertionError("get_profile no debe copiar todo el historial")
+
+    monkeypatch.setattr(profile_manager.history, "all", no_full_copy)
+    version = GameVersion.RETAIL
+    threads = [
+        threading.Thread(target=lambda i=i: [
+            profile_manager.update_auction_history(version, i % 3, {"n": n}, flush=n % 10 == 0) for n in range(50)
+        ])
+        for i in range(6)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    profile_manager.flush_history()
+    profile = await profile_manager.call(profile_manager.get_profile, version)
+    assert sorted(profile.auction_history) == [0, 1, 2]
+    assert len(profile.auction_history[0]) == 100 and profile.auction_history.get(9, []) == []
+    await asyncio.gather(*(profile_manager.call(profile_manager.get_auction_history, version, 1) for _ in range(5)))
+
+
+def test_exit_hook_flushes_live_managers_without_retaining_them(temp_config_dir):
+    """Un único hook de salida escribe lo pendiente y no mantiene vivos los gestores."""
+    import gc
+    import json
+    import weakref
+
+    from kezan import profile_manager as module
+
+    pm = ProfileManager(config_dir=temp_config_dir, write_delay=60)
+    pm.add_watched_item(GameVersion.RETAIL, 7)
+    assert pm in module._managers
+    module._flush_all()
+    saved = json.loads((Path(temp_config_dir) / "retail.json").read_text(encoding="utf-8"))
+    assert saved["preferences"]["watched_items"] == [7]
+
+    ref = weakref.ref(pm)
+    del pm
+    gc.collect()
+    assert ref() is None and not any(m.config_dir == Path(temp_config_dir) for m in module._managers)
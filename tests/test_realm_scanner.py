@@ -0,0 +1,138 @@
+"""Pruebas para el escáner concurrente de reinos."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from kezan import realm_scanner
+from kezan.realm_scanner import RealmScanner, TokenBucket
+
+
+class Clock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refills():
+    clock = Clock()
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock)
+    assert bucket.try_acquire() == 0 and bucket.try_acquire() == 0
+    assert bucket.try_acquire() == pytest.approx(0.5)
+    clock.now = 0.5
+    assert bucket.try_acquire() == 0
+    clock.now = 100
+    assert bucket.available == 2
+
+
+class FakeAPI:
+    def __init__(self, versions, delay=0.01):
+        self.versions = versions
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.calls = []
+
+    async def get_auctions(self, realm):
+        self.calls.append(realm)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.active -= 1
+        version = self.versions.get(realm)
+        if isinstance(version, Exception):
+            raise version
+        return SimpleNamespace(version=version)
+
+
+@pytest.mark.asyncio
+async def test_scan_bounded_concurrency_and_latency():
+    realms = [str(1000 + i) for i in range(6)] + ["commodities"]
+    api = FakeAPI({r: "v1" for r in realms})
+    api.versions["1003"] = RuntimeError("caído")
+    scanner = RealmScanner(realms=realms, api=api, concurrency=2)
+
+    results = await scanner.scan()
+    assert api.peak == 2 and sorted(api.calls) == sorted(realms)
+    assert results["1003"].error and not results["1003"].changed
+    assert results["1000"].changed and results["1000"].latency > 0
+
+    report = scanner.latency_report()
+    assert report["1000"]["scans"] == 1 and report["1000"]["avg_latency"] > 0
+    assert report["1003"]["errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_staggering_follows_observed_updates():
+    clock = Clock(10_000.0)
+    api = FakeAPI({"1": "a", "2": "a"})
+    scanner = RealmScanner(realms=["1", "2"], api=api, clock=clock)
+
+    await scanner.scan()
+    # Recién actualizados: nada pendiente hasta la próxima hora
+    assert scanner.due_realms() == []
+    delay = scanner.next_delay()
+    assert delay == realm_scanner.UPDATE_PERIOD + realm_scanner.UPDATE_GRACE
+
+    # El reino 2 publica más tarde: se reintenta sin cambios y se reprograma
+    clock.now += delay
+    api.versions["1"] = "b"
+    results = await scanner.scan()
+    assert results["1"].changed and not results["2"].changed
+    assert scanner.due_at("2") == clock.now + realm_scanner.RETRY_DELAY
+    assert scanner.due_at("1") == clock.now + realm_scanner.UPDATE_PERIOD + realm_scanner.UPDATE_GRACE
+
+    clock.now += realm_scanner.RETRY_DELAY
+    assert scanner.due_realms() == ["2"]
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_waits(monkeypatch):
+    api = FakeAPI({"1": "a", "2": "a", "3": "a"}, delay=0)
+    scanner = RealmScanner(realms=["1", "2", "3"], api=api, per_second=1)
+    waits = []
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(seconds):
+        waits.append(seconds)
+        scanner.second_bucket._tokens = scanner.second_bucket.capacity
+        await real_sleep(0)
+
+    monkeypatch.setattr(realm_scanner.asyncio, "sleep", fake_sleep)
+    await scanner.scan()
+    assert len(api.calls) == 3 and any(w > 0.5 for w in waits)
+
+
+@pytest.mark.asyncio
+async def test_due_at_follows_last_modified_without_drift():
+    from email.utils import formatdate
+
+    clock = Clock(50_000.0)
+    published = {"t": 49_900.0}
+    latency = 7.0
+
+    class API:
+        async def get_auctions(self, realm):
+            clock.now += latency  # la descarga tarda
+            return SimpleNamespace(
+                version=str(published["t"]), meta={"last_modified": formatdate(published["t"], usegmt=True)}
+            )
+
+    scanner = RealmScanner(realms=["1"], api=API(), clock=clock)
+    for cycle in range(5):
+        await scanner.scan()
+        expected = published["t"] + realm_scanner.UPDATE_PERIOD + realm_scanner.UPDATE_GRACE
+        assert scanner.due_at("1") == expected
+        # Blizzard publica a su hora y el escáner pide cuando toca
+        published["t"] += realm_scanner.UPDATE_PERIOD
+        clock.now = scanner.due_at("1")
+    assert scanner.stats["1"].changes == 5
+
+    # Sin cabecera se usa el momento de la descarga
+    stats = realm_scanner.RealmStats("x")
+    stats.record(1.0, "v", now=10.0)
+    assert stats.changed_at == 10.0
@@ -23,7 +23,7 @@ async def test_realtime_start_stop_one_loop(monkeypatch):
     monkeypatch.setattr(mon, "update_auction_data", wrapped_update, raising=True)
     mon.update_interval = 0
     await mon.start_monitoring(dummy, realm="X")
-    assert mon.last_update and 5 in mon.current_data
+    assert mon.last_update and 5 in mon.index
 
     await mon.stop_monitoring()
     assert mon.is_monitoring is False
@@ -1,4 +1,5 @@
 import asyncio
+from dataclasses import replace
 from datetime import datetime, timedelta
 
 import pytest
@@ -22,8 +23,67 @@ async def test_snapshot_has_age_and_timestamp(monkeypatch):
     mon.update_interval = 0
     await mon.update_auction_data(DummyAPI(), "x")
     # simulate older last_update to ensure age_seconds > 0
-    mon.last_update = mon.last_update - timedelta(seconds=2)
+    mon.view = replace(mon.view, updated_at=mon.last_update - timedelta(seconds=2))
     snap = mon.get_market_snapshot([1, 2])
     assert 1 in snap and 2 in snap
-    assert snap[1]["age_seconds"] >= 0
+    assert snap[1]["age_seconds"] >= 2
     assert isinstance(snap[1]["timestamp"], str)
+
+
+@pytest.mark.asyncio
+async def test_readers_see_previous_view_until_swap(monkeypatch):
+    from kezan import realtime_monitor
+    from kezan.snapshot import Snapshot
+
+    mon = RealTimeAuctionMonitor()
+    mon._load_snapshot(Snapshot.from_columns(item_id=[1], quantity=[1], unit_price=[10.0], version="v1"))
+    first = mon.view
+    assert first.sequence == 1 and first.version == "v1"
+
+    building = asyncio.Event()
+    release = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    original = realtime_monitor.PriceIndex.from_snapshot
+
+    def slow_index(snapshot):
+        # Construcción en el hilo: avisa al bucle y espera a que lea
+        loop.call_soon_threadsafe(building.set)
+        asyncio.run_coroutine_threadsafe(release.wait(), loop).result()
+        return original(snapshot)
+
+    monkeypatch.setattr(realtime_monitor.PriceIndex, "from_snapshot", staticmethod(slow_index))
+
+    class API:
+        async def get_auctions(self, realm):
+            return Snapshot.from_columns(item_id=[1, 2], quantity=[1, 1], unit_price=[8.0, 3.0], version="v2")
+
+    update = asyncio.create_task(mon.update_auction_data(API(), "x"))
+    await building.wait()
+    # El bucle sigue libre y el libro publicado es el anterior, completo
+    assert mon.view is first and mon.get_current_price(1)["price"] == 10.0
+    release.set()
+    assert await update is True
+    assert mon.view.sequence == 2 and mon.snapshot_version == "v2"
+    assert mon.get_current_price(2)["price"] == 3.0
+    assert mon.last_diff.changed_items.tolist() == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_unchanged_snapshot_refreshes_view_timestamp():
+    from kezan.snapshot import Snapshot
+
+    snap = Snapshot.from_columns(item_id=[1], quantity=[1], unit_price=[10.0], version="v1")
+
+    class API:
+        async def get_auctions(self, realm):
+            return snap
+
+    mon = RealTimeAuctionMonitor()
+    await mon.update_auction_data(API(), "x")
+    mon.view = replace(mon.view, updated_at=datetime(2020, 1, 1))
+    stale = mon.view
+    # 304: mismo snapshot e índice, nueva vista con la hora de confirmación
+    assert await mon.update_auction_data(API(), "x") is True
+    assert mon.view is not stale and mon.view.index is stale.index
+    assert mon.view.sequence == stale.sequence and mon.last_update > stale.updated_at
+    assert mon.get_current_price(1)["timestamp"] == mon.view.updated_at.isoformat()
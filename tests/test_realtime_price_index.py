@@ -0,0 +1,64 @@
+"""Pruebas para el índice de precios por item del monitor en tiempo real."""
+
+import math
+
+import pytest
+
+from kezan.realtime_monitor import PriceIndex, RealTimeAuctionMonitor
+from kezan.snapshot import Snapshot
+
+SNAP = Snapshot.from_columns(
+    item_id=[1, 1, 1, 1, 2, 3],
+    quantity=[5, 2, 3, 10, 1, 4],
+    unit_price=[12.0, 10.0, 10.0, 20.0, 7.0, float("nan")],
+    time_left=[2, 0, 1, 3, 1, 0],
+    buyout=[60, 20, 30, 200, 7, 0],
+    version="v1",
+)
+
+
+def test_index_ladder_queries():
+    index = PriceIndex.from_snapshot(SNAP)
+    assert len(index) == 2 and 3 not in index  # item sin precio descartado
+    assert index.lowest(1) == {"price": 10.0, "quantity": 5, "time_left": "SHORT"}
+    assert index.summary(1) == {"lowest_price": 10.0, "highest_price": 20.0, "available_quantity": 20, "num_auctions": 4}
+    assert index.lowest(99) is None and index.summary(99) is None
+
+    # Comprar N unidades recorre la escalera desde el precio más bajo
+    assert index.cost_to_buy(1, 5) == 50.0
+    assert index.cost_to_buy(1, 7) == 50.0 + 2 * 12.0
+    assert index.cost_to_buy(1, 20) == 50.0 + 60.0 + 200.0
+    assert index.cost_to_buy(1, 21) is None and index.cost_to_buy(99, 1) is None
+    assert index.cost_to_buy(2, 0) == 0.0
+
+    assert index.depth(1, 9.99) == 0 and index.depth(1, 10.0) == 5 and index.depth(1, 15) == 10
+    assert index.depth(2, 100) == 1 and index.depth(99, 100) == 0
+
+
+def test_cost_matches_bruteforce():
+    index = PriceIndex.from_snapshot(SNAP)
+    units = sorted(
+        (float(p), int(q)) for i, p, q in zip(SNAP.item_id, SNAP.unit_price, SNAP.quantity) if i == 1
+    )
+    ladder = [p for p, q in units for _ in range(q)]
+    for n in range(len(ladder) + 1):
+        assert math.isclose(index.cost_to_buy(1, n), sum(ladder[:n]))
+
+
+@pytest.mark.asyncio
+async def test_monitor_uses_index_and_lots():
+    class API:
+        async def get_auctions(self, realm):
+            return SNAP
+
+    mon = RealTimeAuctionMonitor()
+    assert await mon.update_auction_data(API(), "1")
+    assert mon.get_current_price(1)["quantity"] == 5
+    assert mon.get_market_snapshot([1, 2, 9])[2]["num_auctions"] == 1
+    assert mon.cost_to_buy(1, 7) == 74.0 and mon.depth(1, 12) == 10
+
+    # Lotes materializados bajo demanda, con la hora de la vista publicada
+    lots = mon.lots(1)
+    assert [lot.current_price for lot in lots] == [10.0, 10.0, 12.0, 20.0]
+    assert lots[0].is_buyout and lots[0].time_left == "SHORT"
+    assert lots[0].timestamp == mon.view.updated_at and mon.lots(9) == []
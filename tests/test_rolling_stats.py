@@ -0,0 +1,106 @@
+"""Pruebas para las estadísticas móviles del detector de gangas."""
+
+import math
+
+from kezan.bargain_detector import Config, detect_bargains, lots_from_snapshot
+from kezan.rolling_stats import HOURS_7D, HOURS_30D, RollingStats
+from kezan.snapshot import Snapshot
+
+
+def _snap(rows):
+    return Snapshot.from_columns(
+        item_id=[r[0] for r in rows],
+        unit_price=[r[1] for r in rows],
+        quantity=[r[2] for r in rows],
+    )
+
+
+def test_medians_mad_and_volume(tmp_path):
+    rs = RollingStats(path=str(tmp_path / "rs.pkl"))
+    base = 1000
+    for h in range(48):
+        qty = 100 if h % 2 == 0 else 60  # caen 40 unidades cada dos horas
+        updated = rs.ingest(_snap([(1, 100.0, qty), (1, 120.0, 10), (2, 5.0, 1)]), scope="eu", hour=base + h)
+        assert updated == 2
+    stats = rs.get_stats(("eu", 1, None))
+    assert math.isclose(stats.P50_7d, 100.0, rel_tol=0.01)
+    assert math.isclose(stats.P50_30d, 100.0, rel_tol=0.01)
+    assert stats.MAD_7d < 1.0
+    assert stats.vol_7d == 24 * 40  # 24 caídas de 40 unidades
+    assert stats.rot > 0
+    # Hora repetida: no se vuelve a contar
+    assert rs.ingest(_snap([(1, 1.0, 1)]), scope="eu", hour=base + 47) == 0
+    assert rs.get_stats(("eu", 99, None)) is None
+
+
+def test_windows_evict_and_memory_is_bounded(tmp_path):
+    rs = RollingStats(path=str(tmp_path / "rs.pkl"))
+    for h in range(HOURS_30D + 200):
+        price = 100.0 if h < HOURS_30D else 200.0
+        rs.ingest_item("eu", 7, [price], [10], hour=h)
+    series = rs._series[("eu", 7, None)]
+    assert len(series.window30) == HOURS_30D and len(series.window7) == HOURS_7D
+    stats = rs.get_stats(("eu", 7, None))
+    # Las últimas 200 horas (>7d) a 200 dominan la mediana de 7d
+    assert math.isclose(stats.P50_7d, 200.0, rel_tol=0.01)
+    assert math.isclose(stats.P50_30d, 100.0, rel_tol=0.01)
+    # Claves sin datos en 30 días se descartan
+    rs.ingest(_snap([(8, 1.0, 1)]), scope="eu", hour=HOURS_30D * 3)
+    assert ("eu", 7, None) not in rs._series
+
+
+def test_absent_items_sell_out_and_age_out(tmp_path):
+    rs = RollingStats(path=str(tmp_path / "rs.pkl"))
+    for h in range(3):
+        rs.ingest(_snap([(1, 100.0, 50), (2, 10.0, 5)]), scope="eu", hour=h)
+    # El item 1 se agota: su hora vacía registra las 50 unidades vendidas
+    rs.ingest(_snap([(2, 10.0, 5)]), scope="eu", hour=3)
+    assert rs.get_stats(("eu", 1, None)).vol_7d == 50
+    assert rs._series[("eu", 1, None)].window7[-1].listed == 0
+
+    # Vuelve días después: las ventanas ya no contienen las horas antiguas
+    rs.ingest(_snap([(2, 10.0, 5)]), scope="eu", hour=HOURS_7D + 5)
+    assert rs.get_stats(("eu", 1, None)) is None
+    rs.ingest(_snap([(1, 300.0, 20), (2, 10.0, 5)]), scope="eu", hour=HOURS_7D + 6)
+    stats = rs.get_stats(("eu", 1, None))
+    assert math.isclose(stats.P50_7d, 300.0, rel_tol=0.01) and stats.vol_7d == 0
+    # Otros scopes no se tocan
+    rs.ingest(_snap([(9, 1.0, 1)]), scope="us", hour=HOURS_7D + 7)
+    assert rs.get_stats(("eu", 1, None)) == stats
+
+
+def test_persistence_roundtrip_and_history_protocol(tmp_path):
+    path = tmp_path / "rs.pkl"
+    rs = RollingStats(path=str(path))
+    for h in range(30):
+        rs.ingest(_snap([(5, 100.0, 300 - h * 5), (5, 130.0, 50)]), scope="eu", hour=h)
+    rs.save()
+    loaded = RollingStats(path=str(path))
+    assert loaded.get_stats(("eu", 5, None)) == rs.get_stats(("eu", 5, None))
+    assert loaded.last_hour == 29 and len(loaded) == 1
+
+    # Alimenta directamente a detect_bargains
+    cheap = _snap([(5, 60.0, 3)])
+    cfg = Config(min_vol_commodity=1)
+    recs = detect_bargains(lots_from_snapshot(cheap, "eu", True), loaded, capital=100000.0, cfg=cfg)
+    assert recs and recs[0]["item_id"] == 5
+
+    path.write_bytes(b"corrupt")
+    assert len(RollingStats(path=str(path))) == 0
+
+
+def test_monitor_ingests_and_persists_each_hour(tmp_path, monkeypatch):
+    from kezan import rolling_stats
+    from kezan.auction_analyzer import AuctionAnalyzer
+
+    hour = [500]
+    monkeypatch.setattr(rolling_stats.time, "time", lambda: hour[0] * 3600.0)
+    analyzer = AuctionAnalyzer()
+    monitor = analyzer.realtime_monitor
+    monitor._load_snapshot(Snapshot.from_columns(item_id=[4], quantity=[30], unit_price=[50.0], scope=[1080], version="a"))
+    hour[0] += 1
+    monitor._load_snapshot(Snapshot.from_columns(item_id=[4], quantity=[10], unit_price=[50.0], scope=[1080], version="b"))
+    stats = analyzer.rolling_stats.get_stats(("1080", 4, None))
+    assert stats.vol_7d == 20 and math.isclose(stats.P50_7d, 50.0, rel_tol=0.01)
+    # Estado guardado en disco tras cada hora nueva
+    assert RollingStats().get_stats(("1080", 4, None)) == stats
@@ -0,0 +1,93 @@
+"""Pruebas para el snapshot columnar de subastas."""
+
+import math
+
+import pytest
+
+from kezan.analyzer import get_top_items
+from kezan.bargain_detector import lots_from_snapshot
+from kezan.realtime_monitor import RealTimeAuctionMonitor
+from kezan.snapshot import TIME_LEFT_UNKNOWN, Snapshot
+
+PAYLOAD = {
+    "auctions": [
+        {"id": 1, "item": {"id": 20}, "quantity": 2, "unit_price": 30, "time_left": "SHORT"},
+        {"id": 2, "item": {"id": 10}, "quantity": 1, "buyout": 500, "bid": 400, "time_left": "LONG"},
+        {"id": 3, "item": {"id": 20}, "quantity": 5, "unit_price": 10, "time_left": "VERY_LONG"},
+        {"id": 4, "item": {}, "quantity": 1, "buyout": 1},
+        {"id": 5, "item": {"id": 10}, "quantity": 4, "bid": 100},
+        {"id": 6, "item": {"id": 10}, "quantity": 4, "buyout": 800, "time_left": "???"},
+    ]
+}
+
+
+def test_from_payload_sorts_and_indexes():
+    snap = Snapshot.from_payload(PAYLOAD, scope=1080)
+    assert len(snap) == 5
+    assert snap.items.tolist() == [10, 20]
+    assert snap.starts.tolist() == [0, 3, 5]
+    # Precios por unidad ordenados dentro de cada item; sin buyout -> NaN al final
+    prices10 = snap.prices(10)
+    assert prices10[:2].tolist() == [200.0, 500.0] and math.isnan(prices10[2])
+    assert snap.prices(20).tolist() == [10.0, 30.0]
+    assert snap.quantities(20).tolist() == [5, 2]
+    assert snap.min_prices()[1] == 10.0
+    assert (snap.scope == 1080).all()
+    assert snap.time_left[snap.auction_id == 6][0] == TIME_LEFT_UNKNOWN
+    assert 10 in snap and 99 not in snap
+    assert snap.rows(99) == slice(0, 0)
+    assert snap.select([20]).sum() == 2
+
+
+def test_from_columns_validates_and_roundtrips():
+    with pytest.raises(ValueError):
+        Snapshot.from_columns(item_id=[1, 2], quantity=[1], unit_price=[1.0, 2.0])
+    snap = Snapshot.from_columns(item_id=[3, 3], quantity=[1, 2], unit_price=[5.0, 4.0])
+    rows = snap.to_auctions()
+    assert [r["unit_price"] for r in rows] == [4.0, 5.0]
+    assert rows[0]["time_left"] == "UNKNOWN"
+    assert len(snap.to_auctions(limit=1)) == 1
+    empty = Snapshot.from_payload({})
+    assert len(empty) == 0 and empty.min_prices().size == 0
+
+
+@pytest.mark.asyncio
+async def test_analyzers_accept_snapshot(monkeypatch, tmp_path):
+    from kezan import analyzer
+    from kezan import cache as kezan_cache
+    from kezan.market_optimizer import MarketDataProcessor
+
+    snap = Snapshot.from_payload(PAYLOAD)
+    monkeypatch.setattr(kezan_cache, "get", lambda k: None)
+    monkeypatch.setattr(kezan_cache, "set", lambda k, v, ttl, **kw: None)
+
+    async def fake_fetch():
+        return snap
+
+    monkeypatch.setattr(analyzer, "fetch_auction_data", fake_fetch)
+    res = await get_top_items(limit=10, min_margin=0.3)
+    # Las filas sin precio se descartan
+    assert len(res["items"]) == 4
+
+    processed = MarketDataProcessor(cache_dir=str(tmp_path / "c")).preprocess_auction_data(
+        Snapshot.from_columns(item_id=[1, 1, 2], quantity=[1, 3, 2], unit_price=[4.0, 6.0, 9.0])
+    )
+    assert processed["summary"][1]["median_price"] == 5.0
+    assert processed["summary"][1]["total_quantity"] == 4
+
+    mon = RealTimeAuctionMonitor()
+
+    class API:
+        async def get_auctions(self, realm):
+            return snap
+
+    assert await mon.update_auction_data(API(), "r") is True
+    assert mon.get_current_price(20)["price"] == 10.0
+    assert mon.get_market_snapshot([10])[10]["num_auctions"] == 2
+
+
+def test_lots_from_snapshot_skips_missing_prices():
+    snap = Snapshot.from_payload(PAYLOAD)
+    lots = list(lots_from_snapshot(snap, scope="1080", is_commodity=False))
+    assert [lot.price_u for lot in lots] == [200.0, 500.0, 10.0, 30.0]
+    assert all(lot.scope == "1080" and not lot.is_commodity for lot in lots)
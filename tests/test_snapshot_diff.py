@@ -0,0 +1,123 @@
+"""Pruebas del diff entre snapshots consecutivos."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from kezan.auction_analyzer import AuctionAnalyzer
+from kezan.profile_manager import GameVersion
+from kezan.realtime_monitor import RealTimeAuctionMonitor
+from kezan.snapshot import Snapshot, diff_snapshots
+
+
+def _snap(rows, version=""):
+    """``rows``: tuplas ``(auction_id, item_id, quantity, unit_price)``."""
+    auction_id, item_id, quantity, unit_price = zip(*rows)
+    return Snapshot.from_columns(
+        auction_id=auction_id, item_id=item_id, quantity=quantity, unit_price=unit_price, version=version
+    )
+
+
+OLD = _snap([(1, 10, 1, 100.0), (2, 10, 2, 120.0), (3, 20, 5, 7.0), (4, 30, 1, 50.0)])
+NEW = _snap([(1, 10, 1, 100.0), (2, 10, 2, 110.0), (3, 20, 3, 7.0), (5, 40, 1, 9.0)])
+
+
+def test_diff_classifies_lots_by_auction_id():
+    diff = diff_snapshots(OLD, NEW)
+    assert diff.added.tolist() == [5]
+    assert diff.removed.tolist() == [4]
+    assert diff.repriced.tolist() == [2]
+    # 20: compra parcial (cambia la cantidad); 30: vendido; 40: nuevo
+    assert diff.changed_items.tolist() == [10, 20, 30, 40]
+    assert diff.counts() == {"added": 1, "removed": 1, "repriced": 1, "changed_items": 4}
+    assert 20 in diff and 99 not in diff
+
+
+def test_diff_identical_and_first_snapshot():
+    assert not diff_snapshots(OLD, OLD)
+    first = diff_snapshots(None, NEW)
+    assert first.added.tolist() == [1, 2, 3, 5]
+    assert first.changed_items.tolist() == NEW.items.tolist()
+
+
+def test_diff_without_auction_ids_compares_books():
+    old = Snapshot.from_columns(item_id=[1, 2], quantity=[1, 1], unit_price=[5.0, float("nan")])
+    new = Snapshot.from_columns(item_id=[1, 2, 3], quantity=[1, 1, 1], unit_price=[6.0, float("nan"), 1.0])
+    diff = diff_snapshots(old, new)
+    assert diff.changed_items.tolist() == [1, 3]
+    assert diff.added.size == 0
+
+
+def test_monitor_tracks_changed_items():
+    mon = RealTimeAuctionMonitor()
+    assert mon.changed_items() is None
+    mon._load_snapshot(OLD)
+    mon._load_snapshot(NEW)
+    assert mon.changed_items() == [10, 20, 30, 40]
+    assert mon.snapshot is NEW
+
+
+@pytest.mark.asyncio
+async def test_thresholds_and_llm_only_for_changed_items():
+    aa = AuctionAnalyzer()
+    prefs = SimpleNamespace(watched_items=[10, 30, 99], price_thresholds={10: 200, 20: 10, 99: 1000})
+    aa.profile_manager = SimpleNamespace(
+        get_profile=lambda gv: SimpleNamespace(preferences=prefs, auction_history={})
+    )
+    snaps = iter([OLD, _snap([(1, 10, 1, 90.0), (2, 10, 2, 120.0), (3, 20, 5, 7.0), (4, 30, 1, 50.0)])])
+
+    async def get_auctions(realm):
+        return next(snaps)
+
+    aa.blizzard_api = SimpleNamespace(get_auctions=get_auctions)
+    first = await aa.monitor_price_thresholds(GameVersion.RETAIL, "r", changed_only=True)
+    assert {a["item_id"] for a in first} == {10, 20}
+    second = await aa.monitor_price_thresholds(GameVersion.RETAIL, "r", changed_only=True)
+    assert [a["item_id"] for a in second] == [10]
+
+    analysed = []
+
+    async def analyze_market_opportunity(item_data, historical_prices):
+        analysed.append(item_data["item"]["id"])
+        return {}
+
+    aa.llm = SimpleNamespace(analyze_market_opportunity=analyze_market_opportunity)
+    mon = aa.realtime_monitor
+    mon.is_monitoring = True
+    mon.get_current_price = lambda item_id: {"item": {"id": item_id}}
+    mon._load_snapshot(OLD)
+    await aa.analyze_watched_items(GameVersion.RETAIL, "r", changed_only=True, batched=False)
+    assert sorted(analysed) == [10, 30, 99]  # sin base previa se analiza todo
+
+    # Dos ticks entre llamadas: el 30 sólo cambia en el primero
+    analysed.clear()
+    mon._load_snapshot(_snap([(1, 10, 1, 100.0), (2, 10, 2, 120.0), (3, 20, 5, 7.0)]))
+    mon._load_snapshot(NEW)
+    assert mon.changed_items() == [10, 20, 40]
+    results = await aa.analyze_watched_items(GameVersion.RETAIL, "r", changed_only=True, batched=False)
+    assert sorted(analysed) == [10, 30] and len(results) == 2
+
+    # Sin ticks nuevos no se repite el análisis
+    analysed.clear()
+    assert await aa.analyze_watched_items(GameVersion.RETAIL, "r", changed_only=True, batched=False) == []
+    assert analysed == []
+
+
+@pytest.mark.asyncio
+async def test_changed_only_thresholds_skip_streaming():
+    aa = AuctionAnalyzer()
+    prefs = SimpleNamespace(watched_items=[10], price_thresholds={10: 200})
+    aa.profile_manager = SimpleNamespace(
+        get_profile=lambda gv: SimpleNamespace(preferences=prefs, auction_history={})
+    )
+    snaps = iter([OLD, OLD])
+
+    async def get_auctions(realm):
+        return next(snaps)
+
+    def stream_auctions(realm, item_ids=None):
+        raise AssertionError("changed_only necesita el snapshot completo")
+
+    aa.blizzard_api = SimpleNamespace(get_auctions=get_auctions, stream_auctions=stream_auctions)
+    assert [a["item_id"] for a in await aa.monitor_price_thresholds(GameVersion.RETAIL, "r", changed_only=True)] == [10]
+    assert await aa.monitor_price_thresholds(GameVersion.RETAIL, "r", changed_only=True) == []
@@ -1,5 +1,3 @@
-import json
-import types
 import pytest
 
 from kezan.llm_interface import LLMInterface
@@ -31,7 +29,7 @@ async def test_post_async_ollama(monkeypatch):
             return await fake_post(self, url, json=json, headers=headers, timeout=timeout)
 
     import kezan.llm_interface as mod
-    monkeypatch.setattr(mod, "httpx", types.SimpleNamespace(AsyncClient=FakeClient, post=lambda *a, **k: DummyResp({"response": "hola"})))
+    monkeypatch.setattr(mod.http_client, "get_async_client", lambda url: FakeClient())
 
     out = await llm._post_async("hola")
     assert out == "hola"
@@ -59,7 +57,7 @@ async def test_post_async_openai(monkeypatch):
             return await fake_post(self, url, json=json, headers=headers, timeout=timeout)
 
     import kezan.llm_interface as mod
-    monkeypatch.setattr(mod, "httpx", types.SimpleNamespace(AsyncClient=FakeClient, post=lambda *a, **k: DummyResp(openai_like)))
+    monkeypatch.setattr(mod.http_client, "get_async_client", lambda url: FakeClient())
 
     out = await llm._post_async("hola")
     assert out == "respuesta"
@@ -82,7 +80,7 @@ async def test_analyze_intent_fallback(monkeypatch):
             return await fake_post(self, url, json=json, headers=headers, timeout=timeout)
 
     import kezan.llm_interface as mod
-    monkeypatch.setattr(mod, "httpx", types.SimpleNamespace(AsyncClient=FakeClient, post=lambda *a, **k: DummyResp({"response": "texto plano"})))
+    monkeypatch.setattr(mod.http_client, "get_async_client", lambda url: FakeClient())
 
     intent = await llm.analyze_intent("haz algo")
     assert isinstance(intent, dict)